@@ -1,14 +1,53 @@
 import dspy
 import os
+import time
+
+from utils.llm_scheduler import SCHEDULER
 
 api_key = os.environ.get("GEMINI_API_KEY")
 
-dspy.configure(
-    lm=dspy.LM(
-        model="gemini/gemini-2.5-flash",
-        api_key=api_key,
-        max_output_tokens=4096
+if os.getenv("LLM_PROVIDER", "").lower() == "fake":
+    # Offline runs (scripts/bench_e2e.py): canned answers after the fake provider's latency
+    from dspy.utils.dummies import DummyLM
+    from utils.llm_providers import FAKE_LLM_LATENCY_MS
+
+    class FakeLM(DummyLM):
+        def _call(self, *args, **kwargs):
+            time.sleep(FAKE_LLM_LATENCY_MS / 1000.0)
+            return super(FakeLM, self).__call__(*args, **kwargs)
+
+        def __call__(self, *args, **kwargs):
+            return SCHEDULER.run_sync("gemini", lambda: self._call(*args, **kwargs))
+
+    # keyed by an output-field marker that only that module's prompt asks for (checked in order)
+    dspy.configure(lm=FakeLM({
+        "[[ ## diagnosis ## ]]": {
+            "reasoning": "Symptoms are compared with the retrieved cases.",
+            "diagnosis": "Viral upper respiratory infection",
+            "recommendations": "Rest, fluids, paracetamol for fever; see a doctor if it persists beyond a week.",
+            "danger_signs": "Shortness of breath, chest pain, confusion",
+            "next_questions": "How long have you had the symptoms?",
+            "is_emergency": "False",
+        },
+        "[[ ## questions ## ]]": {
+            "questions": "1. How long have you had the symptoms?\n2. Any fever?\n3. Any chronic conditions?",
+        },
+        "[[ ## is_emergency ## ]]": {"is_emergency": "no"},
+    }))
+    print("✔️ DSPy configured with a fake LM (LLM_PROVIDER=fake)")
+else:
+    class ScheduledLM(dspy.LM):
+        """Gemini calls share utils/llm_scheduler's slots, rate limit and retries with the REST client."""
+        def __call__(self, *args, **kwargs):
+            return SCHEDULER.run_sync("gemini", lambda: super(ScheduledLM, self).__call__(*args, **kwargs))
+
+    dspy.configure(
+        lm=ScheduledLM(
+            model="gemini/gemini-2.5-flash",
+            api_key=api_key,
+            max_output_tokens=4096,
+            num_retries=0  # retried by the scheduler
+        )
     )
-)
 
-print("✔️ DSPy configured with Gemini 2.5 Flash")
+    print("✔️ DSPy configured with Gemini 2.5 Flash")
@@ -1,6 +1,9 @@
 # backend/main.py
-from fastapi import FastAPI
+import time
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 # Optional DSPy config (non-fatal)
 try:
@@ -12,6 +15,8 @@ except Exception:
 from routes.chat import router as chat_router
 from routes.system import router as system_router
 from routes.medical import router as medical_router
+from utils.llm_providers import close_providers
+from utils.metrics import HTTP_SECONDS, end_request, render_metrics, server_timing_header, start_request
 
 app = FastAPI(title="MedSage API — Memory-First Medical Reasoning")
 
@@ -22,13 +27,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Per-stage breakdown of this request (utils/metrics.timed) as a Server-Timing header."""
+    timings, token = start_request()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        end_request(token)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(elapsed, method=request.method, route=getattr(route, "path", "unmatched"),
+                         status=response.status_code)
+    response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
 # Mount routers under /api
 app.include_router(chat_router, prefix="/api/chat", tags=["chat"])
 app.include_router(system_router, prefix="/api/system", tags=["system"])
 app.include_router(medical_router, prefix="/api/medical", tags=["medical"])
 
+@app.on_event("shutdown")
+async def shutdown():
+    # release pooled LLM connections
+    await close_providers()
+
 @app.get("/")
 def root():
     return {"message": "MedSage API Running", "status": "ok"}
@@ -36,3 +65,8 @@ def root():
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
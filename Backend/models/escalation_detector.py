@@ -1,14 +1,47 @@
+import os
 import dspy
+from utils.metrics import TRIAGE_DECISIONS, timed
+from utils.triage import triage
+
+# 0 sends every consult to the LLM (the old behaviour, and the benchmark baseline)
+ESCALATION_FASTPATH = os.getenv("ESCALATION_FASTPATH", "1") != "0"
+
+URGENT_WORDS = ["emergency", "urgent", "critical", "danger"]
+
+
+def parse_is_emergency(value) -> bool:
+    """LLM field → bool: "yes"/"true" first, then "no"/"false", then urgency words."""
+    text = str(value or "").strip().lower()
+    if text.startswith(("yes", "true")):
+        return True
+    if text.startswith(("no", "false")):
+        return False
+    return any(k in text for k in URGENT_WORDS) and "not " not in text
+
 
 class EscalationDetector(dspy.Module):
-    def __init__(self):
+    def __init__(self, fastpath: bool = ESCALATION_FASTPATH):
         super().__init__()
         self.checker = dspy.Predict("symptoms -> is_emergency")
+        self.fastpath = fastpath
 
-    def check(self, symptoms):
-        res = self.checker(symptoms=symptoms)
-        text = (str(res).lower())
+    def check_llm(self, symptoms):
+        with timed("dspy_escalation"):
+            res = self.checker(symptoms=symptoms)
+        # the field itself, not str(res): that always contains "is_emergency"
+        return parse_is_emergency(res.is_emergency)
 
-        return any(k in text for k in [
-            "emergency", "urgent", "critical", "danger"
-        ])
+    def check(self, symptoms, query_vector=None):
+        """
+        query_vector: the symptoms' retrieval embedding, if already computed.
+        Red-flag phrases / embedding centroids decide confident cases locally;
+        only the ambiguous band costs an LLM call.
+        """
+        if self.fastpath:
+            local = triage(symptoms, query_vector)
+            if local.emergency is not None:
+                TRIAGE_DECISIONS.inc(stage=local.stage, emergency=local.emergency)
+                return local.emergency
+        emergency = self.check_llm(symptoms)
+        TRIAGE_DECISIONS.inc(stage="llm", emergency=emergency)
+        return emergency
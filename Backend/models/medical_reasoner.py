@@ -1,5 +1,6 @@
 import dspy
 from signatures.diagnose import DiagnoseSignature
+from utils.metrics import timed
 
 class MedicalReasoner(dspy.Module):
     def __init__(self):
@@ -7,7 +8,8 @@ class MedicalReasoner(dspy.Module):
         self.predict_step = dspy.ChainOfThought(DiagnoseSignature)
 
     def forward(self, symptoms, retrieved_cases):
-        return self.predict_step(
-            symptoms=symptoms,
-            retrieved_cases=retrieved_cases
-        )
+        with timed("dspy_diagnose"):
+            return self.predict_step(
+                symptoms=symptoms,
+                retrieved_cases=retrieved_cases
+            )
@@ -1,4 +1,5 @@
 import dspy
+from utils.metrics import timed
 
 class NextQuestions(dspy.Module):
     def __init__(self):
@@ -6,5 +7,6 @@ class NextQuestions(dspy.Module):
         self.generate = dspy.Predict("symptoms -> questions")
 
     def forward(self, symptoms):
-        res = self.generate(symptoms=symptoms)
+        with timed("dspy_next_questions"):
+            res = self.generate(symptoms=symptoms)
         return res
@@ -1,56 +1,122 @@
 # --- 1. Standard Library ---
 import os
-import uuid
-from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct
-from fastembed import TextEmbedding
 
-from utils.qdrant_connection import CLIENT, COLLECTION_NAME, EMBEDDING
+from utils.qdrant_connection import (
+    CLIENT, COLLECTION_NAME, EMBEDDING, QDRANT_MODE, create_client, origin_filter
+)
+from utils.cache import cached_query_embedding, cached_search
+from utils.documents import chunk_ids, drop_stale_chunks
+from utils.indexing import index_chunks
+from utils.quantization import search_params
+from utils.record_store import RECORD_FIELDS, MissingRecords, get_record_store
+from utils.metrics import timed
+
+# Only what ranking + display need; long fields come from the record store for the final hits
+HIT_PAYLOAD = ["text", "entry_hash", "source", "domain", "chunk_idx"]
+# Over-fetch so that keeping one chunk per QA entry still leaves top_k distinct cases
+GROUP_OVERFETCH = int(os.getenv("GROUP_OVERFETCH", "3"))
+# Store holding the Health QA dataset: the Qdrant server by default (see qdrant.py);
+# `local` / `memory` reuse the app's own store (offline benchmarks)
+QDRANT_QA_MODE = os.getenv("QDRANT_QA_MODE", "remote").lower()
 
 
 COLLECTION_NAME = "Health_QA_CoT"
-EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+
+# /api/system uploads are tagged so the shared store can be searched / cleared per router
+ORIGIN = "system"
+ORIGIN_FILTER = origin_filter(ORIGIN)
 
 # backend/models/semantic_memory.py
 
-def upsert_chunks_to_qdrant(chunks, filename, ext):
-    points = []
-    for c in chunks:
-        vec = list(EMBEDDING.embed([c]))[0].tolist()
-        points.append(
-            PointStruct(
-                id=str(uuid.uuid4()),
-                vector=vec,
-                payload={"text": c, "file": filename, "type": ext.upper()},
-            )
-        )
-    CLIENT.upsert(collection_name=COLLECTION_NAME, points=points)
-    return len(points)
+def upsert_chunks_to_qdrant(chunks, filename, ext, timings=None, file_hash=""):
+    """Index one upload under deterministic ids, then drop the file's chunks from older versions."""
+    payloads = [{"text": c, "file": filename, "type": ext.upper(), "origin": ORIGIN, "file_hash": file_hash}
+                for c in chunks]
+    n = index_chunks(CLIENT, COLLECTION_NAME, chunks, payloads, ids=chunk_ids(ORIGIN, filename, file_hash, chunks),
+                     timings=timings)
+    drop_stale_chunks(CLIENT, COLLECTION_NAME, ORIGIN, filename, file_hash)
+    return n
 
 def search_qdrant(question, top=5):
-    vec = list(EMBEDDING.embed([question]))[0]
+    vec = cached_query_embedding(question)
     # 1.7.x search API expects query_vector param
-    results = CLIENT.search(collection_name=COLLECTION_NAME, query_vector=vec, limit=top)
+    results = cached_search(CLIENT, COLLECTION_NAME, vec, limit=top, query_filter=ORIGIN_FILTER,
+                            query_text=question)
     return results  # list of scored points
 
 
+def best_per_entry(results, limit):
+    """Highest-ranked chunk of each dataset entry, in rank order (grouped search, client-side)."""
+    seen, kept = set(), []
+    for hit in results:
+        entry = (hit.payload or {}).get("entry_hash") or hit.id
+        if entry not in seen:
+            seen.add(entry)
+            kept.append(hit)
+            if len(kept) >= limit:
+                break
+    return kept
+
+
 class SemanticMedicalMemory:
     def __init__(self):
-        self.embedder = TextEmbedding(model_name=EMBEDDING_MODEL)
+        self.embedder = EMBEDDING
 
-        # New-style Qdrant client (v1.16+)
-        self.client = QdrantClient(
-            url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY")
-        )
+        # The Health QA dataset lives on the Qdrant server (see qdrant.py);
+        # reuse the shared client when the app itself runs against that store
+        self.client = CLIENT if QDRANT_MODE == QDRANT_QA_MODE else create_client(QDRANT_QA_MODE)
 
         self.collection = COLLECTION_NAME
+        self.records = get_record_store()
+        if self.records.count() == 0:
+            print(f"WARNING: record store {self.records.path} is empty; searches over a slimmed "
+                  f"{self.collection} will fail until it is deployed (RECORD_STORE)")
+
+    def fetch_records(self, results):
+        """
+        Full record per hit id, fetched only for the final hits.  Points indexed
+        before payload slimming have no record yet and still carry the fields;
+        a slimmed point without a record raises MissingRecords instead of
+        answering from empty fields.
+        """
+        stored = self.records.get_many((hit.payload or {}).get("entry_hash") for hit in results)
+        records, legacy = {}, []
+        for hit in results:
+            record = stored.get((hit.payload or {}).get("entry_hash"))
+            if record is None:
+                legacy.append(hit.id)
+            else:
+                records[hit.id] = record
+        if legacy:
+            missing = 0
+            for point in self.client.retrieve(collection_name=self.collection, ids=legacy,
+                                              with_payload=list(RECORD_FIELDS), with_vectors=False):
+                if not point.payload:
+                    missing += 1
+                records[point.id] = point.payload or {}
+            if missing:
+                raise MissingRecords(f"{missing} of {len(results)} hits have no record in {self.records.path} "
+                                     f"({self.records.count():,} records); deploy the record store built "
+                                     f"with {self.collection} or re-run qdrant.py")
+        return records
 
     def get_embedding(self, text: str):
-        return list(self.embedder.embed(text))[0]
-
-    def query(self, query_text: str, top_k: int = 5, domain_filter: str = "Healthcare"):
+        return cached_query_embedding(text)
+
+    def query(self, query_text: str, top_k: int = 5, domain_filter: str = "Healthcare",
+              rescore: bool = None, oversampling: float = None, ignore_quantization: bool = False,
+              exact: bool = False, group_by_entry: bool = True):
+        """
+        Quantization knobs (only used when the collection is quantized, see utils/quantization.py):
+          rescore              re-rank candidates with the float32 originals (default QDRANT_RESCORE)
+          oversampling         fetch top_k * oversampling quantized candidates before rescoring
+          ignore_quantization  search the original vectors only
+          exact                brute-force search (ground truth, slow)
+        group_by_entry keeps only the best chunk of each QA entry.
+        """
         vector = self.get_embedding(query_text)
+        params = search_params(hnsw_ef=64, rescore=rescore, oversampling=oversampling,
+                               ignore=ignore_quantization, exact=exact)
 
         query_filter = {
             "must": [
@@ -59,25 +125,34 @@ class SemanticMedicalMemory:
         }
 
         # ✔ Correct search method for qdrant-client v1.16+
-        results = self.client.search(
-            collection_name=self.collection,
-            query_vector=vector,
-            limit=top_k,
+        results = cached_search(
+            self.client,
+            self.collection,
+            vector,
+            limit=top_k * GROUP_OVERFETCH if group_by_entry else top_k,
             query_filter=query_filter,
-            search_params={"hnsw_ef": 64}   # IMPORTANT
+            query_text=query_text,   # dense + sparse (RRF) on hybrid collections
+            search_params=params,   # IMPORTANT
+            with_payload=HIT_PAYLOAD
         )
+        if group_by_entry:
+            results = best_per_entry(results, top_k)
+        with timed("record_store"):
+            records = self.fetch_records(results)
 
         hits = []
         for hit in results:
             payload = hit.payload or {}
+            record = records.get(hit.id, {})
             hits.append({
                 "score": float(getattr(hit, "score", None)),
                 "text": payload.get("text", ""),
-                "response": payload.get("response", ""),
-                "complex_cot": payload.get("complex_cot", ""),
+                "response": record.get("response", "")[:2000],
+                "complex_cot": record.get("complex_cot", "")[:3000],
                 "source": payload.get("source", ""),
                 "domain": payload.get("domain", ""),
-                "chunk_idx": payload.get("chunk_idx", "")
+                "chunk_idx": payload.get("chunk_idx", ""),
+                "entry_hash": payload.get("entry_hash", str(hit.id))
             })
 
         return hits
@@ -1,12 +1,27 @@
+import hashlib
 import json
 import os
+import queue
+import threading
+import time
 import uuid
-import gc
+from collections import deque
 from dotenv import load_dotenv
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
+from qdrant_client.http.models import (
+    Distance, VectorParams, Filter, FieldCondition, MatchValue, PointIdsList
+)
 from fastembed import TextEmbedding
 from tqdm import tqdm
+import numpy as np
+
+from utils.json_stream import streaming_json
+from utils.chunking import CHUNKER_ID, chunk_text, use_model_tokenizer
+from utils.record_store import RecordStore, RECORD_STORE_PATH, entry_record
+from utils.hybrid import (
+    HYBRID, dense_vectors_config, is_hybrid, point_vectors, sparse_embed, sparse_vectors_config
+)
+from utils.quantization import QUANTIZATION, apply_quantization, originals_on_disk, quantization_config
 
 # ==================== CONFIG ====================
 load_dotenv()
@@ -14,26 +29,37 @@ load_dotenv()
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION_NAME = "Health_QA_CoT"
-JSON_FILE_PATH = "./Medical/medical-o1-reasoning-SFT_train_formatted.json"
-
-if not QDRANT_URL or not QDRANT_API_KEY:
-    raise EnvironmentError("Set QDRANT_URL and QDRANT_API_KEY in .env")
+JSON_FILE_PATH = os.getenv("INGEST_FILE", "./Medical/medical-o1-reasoning-SFT_train_formatted.json")  # .json/.jsonl, optionally .gz
+SOURCE_NAME = os.path.basename(JSON_FILE_PATH)
+CHECKPOINT_PATH = os.getenv("INGEST_CHECKPOINT", JSON_FILE_PATH + ".checkpoint.json")
 
 EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
 
-# ===============================================
-print("Connecting to Qdrant Cloud...")
-client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, timeout=120)
-print("Connected!")
 
-# ------------------- Initialize FastEmbed -------------------
-print(f"Loading embedding model: {EMBEDDING_MODEL}")
-embedding_model = TextEmbedding(model_name=EMBEDDING_MODEL)
+def _env_int(name, default):
+    value = os.getenv(name, "").strip().lower()
+    if value in ("", "none"):
+        return default
+    return int(value)
+
+
+# Pipeline tuning (all overridable from .env)
+EMBED_BATCH_SIZE = _env_int("INGEST_EMBED_BATCH", 256)        # texts per ONNX call, across entries
+EMBED_PARALLEL = _env_int("INGEST_EMBED_PARALLEL", None)      # fastembed data-parallel: None = off, 0 = all cores
+UPLOAD_BATCH_SIZE = _env_int("INGEST_UPLOAD_BATCH", 256)      # points per upload request
+UPLOAD_WORKERS = _env_int("INGEST_UPLOAD_WORKERS", 4)         # concurrent upload requests
+QUEUE_DEPTH = _env_int("INGEST_QUEUE_DEPTH", 8)               # batches buffered between stages
+DEDUPE_BATCH = _env_int("INGEST_DEDUPE_BATCH", 256)           # entries per "already indexed?" lookup
+CHECKPOINT_EVERY_S = _env_int("INGEST_CHECKPOINT_EVERY", 10)  # seconds between checkpoint writes
+PRUNE_STALE = os.getenv("INGEST_PRUNE", "0") == "1"           # delete points whose entry left the dataset
+
+# Fixed namespace so the same entry chunk always maps to the same point id
+POINT_NAMESPACE = uuid.UUID("6f1c1e2a-4b7d-5e0a-9c3f-8d2b1a7e4c55")
+
+_DONE = object()
+
+# ===============================================
 
-print("Generating test embedding...")
-test_embeddings = list(embedding_model.embed(["test sentence"]))
-vector_size = len(test_embeddings[0])
-print(f"Embedding dimension: {vector_size}")
 
 # ------------------- Create / Reuse Collection (FIXED) -------------------
 def collection_exists(client, name):
@@ -43,14 +69,26 @@ def collection_exists(client, name):
     except Exception:
         return False
 
-if not collection_exists(client, COLLECTION_NAME):
-    print(f"Creating collection '{COLLECTION_NAME}'...")
-    client.create_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
-    )
-else:
-    print(f"Collection '{COLLECTION_NAME}' already exists → will upsert")
+
+def ensure_collection(client, vector_size):
+    if not collection_exists(client, COLLECTION_NAME):
+        print(f"Creating collection '{COLLECTION_NAME}'...")
+        client.create_collection(
+            collection_name=COLLECTION_NAME,
+            vectors_config=dense_vectors_config(VectorParams(size=vector_size, distance=Distance.COSINE,
+                                                             on_disk=originals_on_disk())),
+            sparse_vectors_config=sparse_vectors_config(),
+            quantization_config=quantization_config(),
+        )
+    else:
+        print(f"Collection '{COLLECTION_NAME}' already exists → will upsert")
+        if HYBRID and not is_hybrid(client, COLLECTION_NAME):
+            print("ℹ Collection has a single unnamed vector: dense-only search. "
+                  "Recreate it to index dense + sparse vectors.")
+        current = client.get_collection(COLLECTION_NAME).config.quantization_config
+        if current is None and apply_quantization(client, COLLECTION_NAME):
+            print(f"Enabled {QUANTIZATION} quantization on '{COLLECTION_NAME}'")
+
 
 # ------------------- Helper Functions -------------------
 def combine_entry(entry):
@@ -63,82 +101,402 @@ def combine_entry(entry):
         parts.append(f"Answer: {entry['Response'].strip()}")
     return "\n\n".join(parts)
 
-def streaming_json(file_path):
-    """Handles both normal JSON and huge ndjson-style files safely"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        # Try loading as full JSON first
-        try:
-            data = json.load(f)
-            if isinstance(data, list):
-                for item in data:
-                    yield item
-            else:
-                yield data
-            return
-        except json.JSONDecodeError:
-            pass  # Expected for large ndjson
-
-        # Fallback: read line by line (common in medical datasets)
-        print("Large JSON detected → switching to line-by-line streaming...")
-        f.seek(0)
-        for line in f:
-            line = line.strip()
-            if line and line.startswith('{'):
-                # Remove trailing comma if present (common in exported JSONL)
-                if line.endswith(','):
-                    line = line[:-1]
-                try:
-                    yield json.loads(line)
-                except json.JSONDecodeError as e:
-                    print(f"Skipping invalid line: {e}")
-                    continue
+def entry_hash(entry):
+    """Content hash of a dataset entry (key order independent)."""
+    raw = json.dumps(entry, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-# ------------------- Main Upload Loop -------------------
-batch_size = 64
-buffer = []
-total_chunks = 0
+def point_id(ehash, chunk_idx):
+    """
+    Deterministic point id: re-running over the same entry overwrites, never duplicates.
+    The chunker settings are part of the id, so re-chunking re-embeds instead of skipping.
+    """
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{ehash}:{CHUNKER_ID}:{chunk_idx}"))
 
-print("\nStarting upload to Qdrant...\n")
-for entry in tqdm(streaming_json(JSON_FILE_PATH), desc="Processing entries"):
+def entry_chunks(entry, ehash=None):
+    """Split one dataset entry into (point_id, text, payload) triples ready for embedding."""
+    ehash = ehash or entry_hash(entry)
     full_text = combine_entry(entry)
     if not full_text.strip():
-        continue
+        return []
 
-    # Split only extremely long reasoning (medical CoT can be huge)
-    if len(full_text) > 3000:
-        texts = [full_text[i:i+2500] for i in range(0, len(full_text), 2500)]
-    else:
-        texts = [full_text]
-
-    # Embed batch
-    embeddings = list(embedding_model.embed(texts))
-
-    for idx, (text, vector) in enumerate(zip(texts, embeddings)):
-        point = PointStruct(
-            id=str(uuid.uuid4()),
-            vector=vector.tolist(),
-            payload={
-                "text": text,
-                "question": entry.get("Question", "")[:2000],
-                "response": entry.get("Response", "")[:2000],
-                "complex_cot": entry.get("Complex_Cot", "")[:3000],
-                "source": "medical-o1-reasoning-SFT_train_formatted.json",
-                "domain": "Healthcare",
-                "chunk_idx": idx
-            }
-        )
-        buffer.append(point)
-        total_chunks += 1
+    # Token-bounded so long reasoning is never truncated by the 512-token model window
+    texts = chunk_text(full_text)
+
+    # question / response / CoT live once per entry in the record store, keyed by entry_hash
+    return [
+        (point_id(ehash, idx), text, {
+            "text": text,
+            "source": SOURCE_NAME,
+            "domain": "Healthcare",
+            "chunk_idx": idx,
+            "chunker": CHUNKER_ID,
+            "entry_hash": ehash
+        })
+        for idx, text in enumerate(texts)
+    ]
+
+
+# ------------------- Checkpoint -------------------
+class Checkpoint:
+    """
+    Persisted low-watermark into JSON_FILE_PATH: every entry before
+    `watermark` is fully uploaded.  Upload workers finish out of order, so
+    entries are tracked until all of their chunks have landed.
+    """
+
+    def __init__(self, path, data_path):
+        self.path = path
+        stat = os.stat(data_path)
+        self.fingerprint = {"file": os.path.abspath(data_path), "size": stat.st_size,
+                            "mtime": int(stat.st_mtime), "chunker": CHUNKER_ID}
+        self.lock = threading.Lock()
+        self.remaining = {}        # entry index -> chunks still in flight
+        self.order = deque()       # registered entry indexes, oldest first
+        self.watermark = 0
+        self.last_saved = time.monotonic()
+
+    def load(self):
+        """Return the entry index to resume from (0 if the dataset or chunker changed)."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return 0
+        if {k: saved.get(k) for k in self.fingerprint} != self.fingerprint:
+            print("Dataset or chunker changed since last checkpoint → incremental pass over all entries")
+            return 0
+        self.watermark = int(saved.get("entry_index", 0))
+        print(f"Resuming from checkpoint: skipping {self.watermark:,} entries "
+              f"(delete {self.path} to force a full pass)")
+        return self.watermark
+
+    def register(self, idx, n_chunks):
+        with self.lock:
+            self.remaining[idx] = n_chunks
+            self.order.append(idx)
+            self._advance()
+
+    def chunks_done(self, entry_indexes):
+        with self.lock:
+            for idx in entry_indexes:
+                self.remaining[idx] -= 1
+            self._advance()
+
+    def _advance(self):
+        while self.order and self.remaining[self.order[0]] <= 0:
+            idx = self.order.popleft()
+            del self.remaining[idx]
+            self.watermark = idx + 1
+
+    def save(self, force=False):
+        with self.lock:
+            if not force and time.monotonic() - self.last_saved < CHECKPOINT_EVERY_S:
+                return
+            self.last_saved = time.monotonic()
+            data = dict(self.fingerprint, entry_index=self.watermark)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+def prune_stale(client, collection_name, seen_hashes, resumed_hashes=(), source=SOURCE_NAME):
+    """
+    Delete points from `source` whose entry is no longer in the dataset (incl. legacy
+    uuid4 points) or that were cut by a different chunker configuration.
+
+    `seen_hashes` are the entries this run re-chunked; `resumed_hashes` the ones it
+    skipped from the checkpoint.  Skipped entries were not re-indexed, so their points
+    are kept whatever chunker cut them.
+    """
+    source_filter = Filter(must=[FieldCondition(key="source", match=MatchValue(value=source))])
+    offset, removed = None, 0
+    while True:
+        points, offset = client.scroll(collection_name=collection_name, scroll_filter=source_filter,
+                                       limit=1024, offset=offset, with_payload=["entry_hash", "chunker"],
+                                       with_vectors=False)
+        stale = []
+        for p in points:
+            payload = p.payload or {}
+            ehash = payload.get("entry_hash", "")[:32]
+            if ehash in resumed_hashes:
+                continue
+            if ehash not in seen_hashes or payload.get("chunker") != CHUNKER_ID:
+                stale.append(p.id)
+        if stale:
+            client.delete(collection_name=collection_name,
+                          points_selector=PointIdsList(points=stale))
+            removed += len(stale)
+        if offset is None:
+            return removed
+
+
+# ------------------- Pipeline -------------------
+class IngestStats:
+    """Thread-safe counters for the throughput report."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.entries = 0
+        self.skipped = 0
+        self.embedded = 0
+        self.uploaded = 0
+
+    def add(self, field, n):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "entries": self.entries,
+            "unchanged": self.skipped,
+            "vectors": self.uploaded,
+            "entries_per_s": round(self.entries / elapsed, 1),
+            "vectors_per_s": round(self.uploaded / elapsed, 1),
+        }
+
+
+class IngestPipeline:
+    """
+    reader → embedder → N upload workers, connected by bounded queues.
+
+    The reader flattens entries into chunks and drops the ones whose
+    deterministic id is already in the collection, the embedder feeds one continuous
+    stream of texts to fastembed (so batches span entries and the data-parallel
+    pool is started once), and the upload workers push finished batches with
+    upload_collection concurrently.  Queue bounds keep memory flat.
+    """
+
+    def __init__(self, client, embedding_model, collection_name=COLLECTION_NAME,
+                 embed_batch_size=EMBED_BATCH_SIZE, embed_parallel=EMBED_PARALLEL,
+                 upload_batch_size=UPLOAD_BATCH_SIZE, upload_workers=UPLOAD_WORKERS,
+                 queue_depth=QUEUE_DEPTH, checkpoint=None, start_index=0,
+                 dedupe_batch=DEDUPE_BATCH, track_seen=PRUNE_STALE, records=None):
+        self.client = client
+        self.embedding_model = embedding_model
+        self.collection_name = collection_name
+        self.embed_batch_size = embed_batch_size
+        self.embed_parallel = embed_parallel
+        self.upload_batch_size = upload_batch_size
+        self.upload_workers = upload_workers
+        self.checkpoint = checkpoint
+        self.start_index = start_index
+        self.dedupe_batch = dedupe_batch
+        self.seen = set() if track_seen else None          # entries chunked this run
+        self.resumed = set() if track_seen else None       # entries skipped by the checkpoint
+        self.records = records
+        self.hybrid = is_hybrid(client, collection_name)
+
+        self.chunk_queue = queue.Queue(maxsize=embed_batch_size * queue_depth)
+        self.upload_queue = queue.Queue(maxsize=upload_workers * queue_depth)
+        self.stats = IngestStats()
+        self.errors = []
+        self.stop = threading.Event()
+
+    # ---- stage 1: reader ----
+    def _read(self, entries):
+        group = []
+        try:
+            for idx, entry in enumerate(tqdm(entries, desc="Processing entries")):
+                if self.stop.is_set():
+                    break
+                if idx < self.start_index:
+                    if self.resumed is not None:
+                        self.resumed.add(entry_hash(entry)[:32])
+                    continue
+                group.append((idx, entry))
+                if len(group) >= self.dedupe_batch:
+                    self._flush_group(group)
+                    group = []
+            if group and not self.stop.is_set():
+                self._flush_group(group)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(self.chunk_queue, _DONE, force=True)
+
+    def _flush_group(self, group):
+        """Queue only the chunks of this group that are not indexed yet."""
+        items, records = [], []
+        for idx, entry in group:
+            ehash = entry_hash(entry)
+            if self.seen is not None:
+                self.seen.add(ehash[:32])
+            items.append((idx, entry_chunks(entry, ehash)))
+            records.append((ehash, entry_record(entry)))
+        if self.records is not None:
+            # written before the chunks are queued, so a searchable chunk always has its record
+            self.records.put_many(records)
+
+        existing = self._existing_ids([pid for _, chunks in items for pid, _, _ in chunks])
+        for idx, chunks in items:
+            todo = [c for c in chunks if c[0] not in existing]
+            if self.checkpoint:
+                self.checkpoint.register(idx, len(todo))
+            if chunks and not todo:
+                self.stats.add("skipped", 1)
+            for pid, text, payload in todo:
+                self._put(self.chunk_queue, (pid, idx, text, payload))
+            self.stats.add("entries", 1)
+
+    def _existing_ids(self, ids):
+        if not ids:
+            return set()
+        found = self.client.retrieve(collection_name=self.collection_name, ids=ids,
+                                     with_payload=False, with_vectors=False)
+        return {str(p.id) for p in found}
+
+    # ---- stage 2: embedder ----
+    def _embed(self):
+        pending = deque()
+
+        def texts():
+            while True:
+                item = self.chunk_queue.get()
+                if item is _DONE:
+                    return
+                pid, idx, text, payload = item
+                pending.append((pid, idx, payload))
+                yield text
+
+        ids, entry_idxs, payloads, vectors = [], [], [], []
+        try:
+            for vector in self.embedding_model.embed(texts(), batch_size=self.embed_batch_size,
+                                                     parallel=self.embed_parallel):
+                pid, idx, payload = pending.popleft()
+                ids.append(pid)
+                entry_idxs.append(idx)
+                payloads.append(payload)
+                vectors.append(vector)
+                if len(ids) >= self.upload_batch_size:
+                    self.stats.add("embedded", len(ids))
+                    self._put(self.upload_queue, (ids, entry_idxs, payloads, np.vstack(vectors)))
+                    ids, entry_idxs, payloads, vectors = [], [], [], []
+                if self.stop.is_set():
+                    break
+            if ids and not self.stop.is_set():
+                self.stats.add("embedded", len(ids))
+                self._put(self.upload_queue, (ids, entry_idxs, payloads, np.vstack(vectors)))
+        except Exception as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.upload_workers):
+                self._put(self.upload_queue, _DONE, force=True)
+
+    # ---- stage 3: uploaders ----
+    def _upload(self):
+        while True:
+            item = self.upload_queue.get()
+            if item is _DONE:
+                return
+            if self.stop.is_set():
+                continue
+            ids, entry_idxs, payloads, vectors = item
+            try:
+                if self.hybrid:
+                    # sparse vectors are cheap (BM25), so they are computed per upload batch
+                    named = point_vectors(vectors, sparse_embed(p["text"] for p in payloads))
+                    vectors = [{name: named[name][i] for name in named} for i in range(len(ids))]
+                self.client.upload_collection(
+                    collection_name=self.collection_name,
+                    vectors=vectors,
+                    payload=payloads,
+                    ids=ids,
+                    batch_size=len(ids),
+                    max_retries=3,
+                    wait=True,  # the checkpoint below may only count points the server has applied
+                )
+                self.stats.add("uploaded", len(ids))
+                if self.checkpoint:
+                    self.checkpoint.chunks_done(entry_idxs)
+                    self.checkpoint.save()
+            except Exception as e:
+                self._fail(e)
+
+    # ---- plumbing ----
+    def _put(self, q, item, force=False):
+        """Blocking put that gives up once another stage has failed."""
+        while True:
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if self.stop.is_set() and not force:
+                    return
+                if self.stop.is_set():
+                    # drain one slot so shutdown sentinels always get through
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def _fail(self, error):
+        print(f"Pipeline error: {error}")
+        self.errors.append(error)
+        self.stop.set()
+
+    def run(self, entries):
+        threads = [threading.Thread(target=self._read, args=(entries,), name="ingest-reader", daemon=True),
+                   threading.Thread(target=self._embed, name="ingest-embedder", daemon=True)]
+        threads += [threading.Thread(target=self._upload, name=f"ingest-upload-{i}", daemon=True)
+                    for i in range(self.upload_workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if self.checkpoint:
+            self.checkpoint.save(force=True)
+        if self.errors:
+            raise RuntimeError(f"Ingestion failed: {self.errors[0]}") from self.errors[0]
+        return self.stats.report()
+
+
+# ------------------- Main Upload -------------------
+def main():
+    if not QDRANT_URL or not QDRANT_API_KEY:
+        raise EnvironmentError("Set QDRANT_URL and QDRANT_API_KEY in .env")
+
+    print("Connecting to Qdrant Cloud...")
+    client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, timeout=120)
+    print("Connected!")
+
+    # ------------------- Initialize FastEmbed -------------------
+    print(f"Loading embedding model: {EMBEDDING_MODEL}")
+    embedding_model = TextEmbedding(model_name=EMBEDDING_MODEL)
+    use_model_tokenizer(embedding_model)  # chunk by the model's own token counts
+
+    print("Generating test embedding...")
+    test_embeddings = list(embedding_model.embed(["test sentence"]))
+    vector_size = len(test_embeddings[0])
+    print(f"Embedding dimension: {vector_size}")
+
+    ensure_collection(client, vector_size)
+
+    print(f"\nStarting upload to Qdrant (embed batch {EMBED_BATCH_SIZE}, parallel {EMBED_PARALLEL}, "
+          f"{UPLOAD_WORKERS} upload workers × {UPLOAD_BATCH_SIZE} points)...\n")
+    checkpoint = Checkpoint(CHECKPOINT_PATH, JSON_FILE_PATH)
+    records = RecordStore(RECORD_STORE_PATH)
+    pipeline = IngestPipeline(client, embedding_model, checkpoint=checkpoint,
+                              start_index=checkpoint.load(), records=records)
+    report = pipeline.run(streaming_json(JSON_FILE_PATH))
+
+    if PRUNE_STALE:
+        removed = prune_stale(client, COLLECTION_NAME, pipeline.seen, pipeline.resumed)
+        print(f"Pruned {removed:,} stale points no longer in {SOURCE_NAME}")
+        print(f"Pruned {records.prune(pipeline.seen | pipeline.resumed):,} stale records")
+    print(f"Record store: {records.count():,} entries in {RECORD_STORE_PATH}")
+    records.close()
 
-    # Upload when batch is full
-    if len(buffer) >= batch_size:
-        client.upsert(collection_name=COLLECTION_NAME, points=buffer)
-        buffer.clear()
-        gc.collect()
+    print(f"\nSUCCESS! Uploaded {report['vectors']:,} medical QA chunks to Qdrant "
+          f"({report['unchanged']:,} entries already up to date)!")
+    print(f"Throughput: {report['entries_per_s']:,} entries/s, {report['vectors_per_s']:,} vectors/s "
+          f"({report['elapsed_s']}s total)")
+    print(f"Dashboard → {QDRANT_URL}/collections/{COLLECTION_NAME}")
 
-# Final upload
-if buffer:
-    client.upsert(collection_name=COLLECTION_NAME, points=buffer)
 
-print(f"\nSUCCESS! Uploaded {total_chunks:,} medical QA chunks to Qdrant!")
-print(f"Dashboard → {QDRANT_URL}/collections/{COLLECTION_NAME}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,28 @@
+import asyncio
+import os
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
 from schema.request import ConsultRequest
 from models.semantic_memory import SemanticMedicalMemory, search_qdrant
 from models.medical_reasoner import MedicalReasoner
 from models.next_questions import NextQuestions
 from models.escalation_detector import EscalationDetector
 from models.request_models import AskRequest
-from utils.genai_wrapper import ask_perplexity
+from utils.genai_wrapper import aask_perplexity, astream_perplexity
 from utils.qdrant_connection import COLLECTION_NAME
+from utils.cache import acached_query_embedding
+from utils.answer_cache import ANSWER_CACHE, sources_key
+from utils.context_builder import (
+    ASK_CONTEXT_TOKENS, CONSULT_CASE_TOKENS, CONSULT_COT_TOKENS, SUGGEST_CONTEXT_TOKENS,
+    build_context, select_passages
+)
+from utils.sse import sse_event, sse_response
 
 router = APIRouter()
 
+# "concurrent" (default) overlaps the independent DSPy calls; "sequential" is the old behaviour
+CONSULT_MODE = os.getenv("CONSULT_MODE", "concurrent").lower()
+
 memory = SemanticMedicalMemory()
 reasoner = MedicalReasoner()
 questioner = NextQuestions()
@@ -19,25 +32,26 @@ escalation = EscalationDetector()
 def format_retrieved_cases(hits):
     """
     Convert Qdrant vector search results into clean strings
-    that can be used in DSPy prompting.
+    that can be used in DSPy prompting.  One case per dataset entry,
+    near-duplicates dropped, each block packed into its token budget.
     """
 
     if not hits:
         return "No similar medical cases found."
 
-    visible = []
-    internal = []
+    def entry(h):
+        return h.get("entry_hash") or h["text"]
 
-    for h in hits:
-        # visible high-level case summary
-        visible.append(f"Case: {h['text']}")
+    # visible high-level case summaries
+    cases = select_passages(hits, CONSULT_CASE_TOKENS, key=entry)
 
-        # internal reasoning (not shown to patient directly)
-        if h.get("complex_cot"):
-            internal.append(h["complex_cot"])
+    # internal reasoning (not shown to patient directly), once per entry
+    reasoning = select_passages(
+        [dict(h, text=h.get("complex_cot", "")) for h in hits], CONSULT_COT_TOKENS, key=entry
+    )
 
-    visible_block = "\n\n".join(visible)
-    internal_block = "\n\n".join(internal)
+    visible_block = "\n\n".join(f"Case: {c['text']}" for c in cases)
+    internal_block = "\n\n".join(r["text"] for r in reasoning)
 
     final_text = (
         "Relevant medical cases:\n" + visible_block +
@@ -52,24 +66,101 @@ def format_retrieved_cases(hits):
 async def consult(req: ConsultRequest):
     symptoms = req.symptoms
 
-    # Retrieve from Qdrant
-    hits = memory.query(symptoms)
-
-    # Convert retrievals for LLM input
-    retrieved_cases = format_retrieved_cases(hits)
+    if CONSULT_MODE == "sequential":
+        return await run_in_threadpool(consult_sequential, symptoms)
 
-    # DSPy Reasoner
-    result = reasoner(
-        symptoms=symptoms,
-        retrieved_cases=retrieved_cases
+    # NextQuestions and EscalationDetector only need the symptoms, so they
+    # start right away on worker threads and overlap retrieval + reasoning.
+    # The query embedding comes first: escalation triages on it locally and
+    # memory.query then finds it in the cache.
+    qvec = await acached_query_embedding(symptoms)
+    side_calls = asyncio.gather(
+        run_in_threadpool(questioner, symptoms=symptoms),
+        run_in_threadpool(escalation.check, symptoms, qvec),
     )
 
-    # Next questions
+    try:
+        # Retrieve from Qdrant
+        hits = await run_in_threadpool(memory.query, symptoms)
+
+        # Convert retrievals for LLM input
+        retrieved_cases = format_retrieved_cases(hits)
+
+        # DSPy Reasoner
+        result = await run_in_threadpool(
+            reasoner,
+            symptoms=symptoms,
+            retrieved_cases=retrieved_cases
+        )
+    except Exception:
+        side_calls.cancel()
+        raise
+
+    next_q, emergency = await side_calls
+    return consult_response(result, next_q, emergency)
+
+
+def consult_sequential(symptoms):
+    """Original one-after-another flow (CONSULT_MODE=sequential), run on a worker thread."""
+    hits = memory.query(symptoms)
+    retrieved_cases = format_retrieved_cases(hits)
+    result = reasoner(symptoms=symptoms, retrieved_cases=retrieved_cases)
     next_q = questioner(symptoms=symptoms)
+    emergency = escalation.check(symptoms, memory.get_embedding(symptoms))
+    return consult_response(result, next_q, emergency)
+
+
+@router.post("/consult/stream")
+async def consult_stream(req: ConsultRequest):
+    """
+    SSE variant of /consult.  DSPy modules return whole fields, so each one is
+    sent as soon as its call finishes: `sources`, then `next_questions`,
+    `emergency` and `diagnosis` in completion order, then `done`.
+    """
+    symptoms = req.symptoms
+    qvec = await acached_query_embedding(symptoms)
+    next_q = asyncio.ensure_future(run_in_threadpool(questioner, symptoms=symptoms))
+    emergency = asyncio.ensure_future(run_in_threadpool(escalation.check, symptoms, qvec))
+
+    try:
+        hits = await run_in_threadpool(memory.query, symptoms)
+    except Exception:
+        next_q.cancel()
+        emergency.cancel()
+        raise
+
+    async def diagnose():
+        result = await run_in_threadpool(reasoner, symptoms=symptoms, retrieved_cases=format_retrieved_cases(hits))
+        return "diagnosis", {
+            "reasoning": result.reasoning,
+            "diagnosis": result.diagnosis,
+            "recommendations": result.recommendations,
+            "danger_signs": result.danger_signs,
+        }
 
-    # Emergency check
-    emergency = escalation.check(symptoms)
+    async def labelled(event, task, build):
+        return event, build(await task)
 
+    async def events():
+        yield sse_event("sources", {"cases": [
+            {"text": h["text"][:500], "score": round(h.get("score") or 0.0, 4)} for h in hits
+        ]})
+        pending = [diagnose(),
+                   labelled("next_questions", next_q, lambda r: {"next_questions": r.questions}),
+                   labelled("emergency", emergency, lambda e: {"is_emergency": e})]
+        try:
+            for done in asyncio.as_completed(pending):
+                event, data = await done
+                yield sse_event(event, data)
+        finally:
+            next_q.cancel()
+            emergency.cancel()
+        yield sse_event("done", {})
+
+    return sse_response(events())
+
+
+def consult_response(result, next_q, emergency):
     return {
         "reasoning": result.reasoning,
         "diagnosis": result.diagnosis,
@@ -81,18 +172,31 @@ async def consult(req: ConsultRequest):
 
 
 
-@router.post("/ask/")
-async def ask(req: AskRequest):
-    # search returns list of points (1.7.3)
-    results = search_qdrant(req.question, top=req.n_results or 5)
+def ask_sources(results):
+    sources = []
+    for p in results:
+        payload = getattr(p, "payload", {}) or {}
+        text_preview = payload.get("text", "")
+        if len(text_preview) > 500:
+            text_preview = text_preview[:500] + "..."
+        sources.append({
+            "text": text_preview,
+            "file": payload.get("file"),
+            "type": payload.get("type"),
+            "score": round(getattr(p, "score", 0.0), 4)
+        })
+    return sources
 
-    if not results:
-        return {"answer": "No files yet!", "suggested_questions": ["Upload something!"]}
 
-    context = "\n\n".join((getattr(p, "payload", {}).get("text", "") for p in results))
-    answer = ask_perplexity(f"Context:\n{context}\n\nQuestion: {req.question}\nAnswer clearly:")
+def ask_prompts(question, results):
+    """(answer prompt, follow-up suggestions prompt), each context within its token budget."""
+    context = build_context(results, ASK_CONTEXT_TOKENS)
+    suggest_context = build_context(results, SUGGEST_CONTEXT_TOKENS)
+    return (f"Context:\n{context}\n\nQuestion: {question}\nAnswer clearly:",
+            f"Give exactly 3 smart follow-up very short questions for:\n\nUser: {question}\nContent: {suggest_context}")
+
 
-    raw = ask_perplexity(f"Give exactly 3 smart follow-up very short questions for:\n\nUser: {req.question}\nContent: {context[:6000]}")
+def parse_suggested(raw):
     suggested = []
     for line in raw.split("\n"):
         line = line.strip()
@@ -104,23 +208,79 @@ async def ask(req: AskRequest):
                 suggested.append(q)
     if len(suggested) < 3:
         suggested = ["Can you explain more?", "What else should I know?", "Summarize the key points?"]
+    return suggested
 
-    sources = []
-    for p in results:
-        payload = getattr(p, "payload", {}) or {}
-        text_preview = payload.get("text", "")
-        if len(text_preview) > 500:
-            text_preview = text_preview[:500] + "..."
-        sources.append({
-            "text": text_preview,
-            "file": payload.get("file"),
-            "type": payload.get("type"),
-            "score": round(getattr(p, "score", 0.0), 4)
-        })
 
-    return {
-        "question": req.question,
-        "answer": answer,
-        "sources": sources,
-        "suggested_questions": suggested
-    }
+@router.post("/ask/")
+async def ask(req: AskRequest):
+    # search returns list of points (1.7.3)
+    results = await run_in_threadpool(search_qdrant, req.question, top=req.n_results or 5)
+
+    if not results:
+        return {"answer": "No files yet!", "suggested_questions": ["Upload something!"]}
+
+    sources = ask_sources(results)
+
+    # Near-identical question over the same sources → reuse the cached answer
+    qvec = await acached_query_embedding(req.question)
+    skey = sources_key(results)
+    cached = await run_in_threadpool(ANSWER_CACHE.lookup, "chat.ask", qvec, skey)
+    if cached:
+        return {"question": req.question, "sources": sources, **cached}
+
+    answer_prompt, suggest_prompt = ask_prompts(req.question, results)
+    # answer and follow-up suggestions are independent → issue both at once
+    answer, raw = await asyncio.gather(aask_perplexity(answer_prompt), aask_perplexity(suggest_prompt))
+    suggested = parse_suggested(raw)
+
+    response = {"answer": answer, "suggested_questions": suggested}
+    if answer != "Answer generation failed.":
+        await run_in_threadpool(ANSWER_CACHE.store, "chat.ask", req.question, qvec, skey, response)
+
+    return {"question": req.question, "sources": sources, **response}
+
+
+@router.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """
+    SSE variant of /ask/: `sources` right after retrieval, Perplexity answer
+    `token` deltas, then `suggestions` and `done`.
+    """
+    results = await run_in_threadpool(search_qdrant, req.question, top=req.n_results or 5)
+    sources = ask_sources(results)
+    cached = qvec = skey = None
+    if results:
+        qvec = await acached_query_embedding(req.question)
+        skey = sources_key(results)
+        cached = await run_in_threadpool(ANSWER_CACHE.lookup, "chat.ask", qvec, skey)
+
+    async def events():
+        yield sse_event("sources", {"question": req.question, "sources": sources})
+        if not results or cached:
+            reply = cached or {"answer": "No files yet!", "suggested_questions": ["Upload something!"]}
+            yield sse_event("token", {"text": reply["answer"]})
+            yield sse_event("suggestions", {"suggested_questions": reply["suggested_questions"]})
+            yield sse_event("done", {"cached": bool(cached)})
+            return
+
+        answer_prompt, suggest_prompt = ask_prompts(req.question, results)
+        suggestions = asyncio.create_task(aask_perplexity(suggest_prompt))
+        try:
+            # a provider error mid-answer raises here: sse_response sends `error`, nothing is cached
+            parts = []
+            async for delta in astream_perplexity(answer_prompt):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+            suggested = parse_suggested(await suggestions)
+        finally:
+            suggestions.cancel()  # no-op unless the client went away mid-stream
+
+        yield sse_event("suggestions", {"suggested_questions": suggested})
+        yield sse_event("done", {"cached": False})
+
+        answer = "".join(parts).strip()
+        if answer != "Answer generation failed.":
+            await run_in_threadpool(ANSWER_CACHE.store, "chat.ask", req.question, qvec, skey,
+                                    {"answer": answer, "suggested_questions": suggested})
+
+    return sse_response(events())
@@ -1,47 +1,36 @@
 import os
 import io
-import uuid
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException
+import time
+import asyncio
+from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from PIL import Image
-import PyPDF2
-from docx import Document
 from typing import List
 
-# ---------- Gemini ----------
-import google.generativeai as genai
-
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
-if not GOOGLE_API_KEY:
-    raise RuntimeError("Set GOOGLE_API_KEY first")
-
-genai.configure(api_key=GOOGLE_API_KEY)
-GEMINI = genai.GenerativeModel("gemini-2.5-flash")
-
 # ---------- Qdrant 1.7.3 + FastEmbed ----------
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from fastembed import TextEmbedding
-
-COLLECTION_NAME = "Health_QA_CoT"
-DIM = 384
-
-EMBEDDING = TextEmbedding(model_name="BAAI/bge-small-en-v1.5")
-
-CLIENT = QdrantClient(":memory:")
-
-def collection_exists(name):
-    try:
-        CLIENT.get_collection(name)
-        return True
-    except:
-        return False
-
-if not collection_exists(COLLECTION_NAME):
-    CLIENT.create_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config=VectorParams(size=DIM, distance=Distance.COSINE)
-    )
+from utils.qdrant_connection import CLIENT, COLLECTION_NAME, clear_origin, origin_filter
+from utils.cache import acached_query_embedding, cached_search, invalidate_collection
+# Gemini: SDK for images (configured on first use), pooled REST client for text
+from utils.genai_wrapper import agemini_generate_text, astream_gemini_text, gemini_sdk_text
+from utils.llm_providers import LLMError
+from utils.answer_cache import ANSWER_CACHE, sources_key
+from utils.indexing import index_chunks
+from utils.medical_gate import gate_chunks, has_medical_terms
+from utils.documents import (
+    ChunkIds, chunk_ids, drop_stale_chunks, get_document_registry, sha256_bytes, sha256_file, stored_response
+)
+from utils.extract_pool import extract_document
+from utils.chunking import chunk_text
+from utils.context_builder import (
+    ASK_CONTEXT_TOKENS, FALLBACK_CONTEXT_TOKENS, SUGGEST_CONTEXT_TOKENS, build_context
+)
+from utils.streaming_ingest import StreamRejected, iter_document_text, spool_to_disk, stream_index
+from utils.sse import sse_event, sse_response
+
+# Medical uploads share the persistent store with /api/system, tagged by origin
+ORIGIN = "medical"
+ORIGIN_FILTER = origin_filter(ORIGIN)
 
 # ---------- Router ----------
 router = APIRouter()
@@ -54,11 +43,7 @@ PREDEFINED_SUGGESTIONS = [
     "What are the key findings from the document?"
 ]
 
-MEDICAL_KEYWORDS = [
-    "patient","diagnosis","scan","mri","ct","xray","symptom","treatment",
-    "doctor","medication","blood","report","prescription","test","clinic"
-]
-
+DOCUMENTS = get_document_registry()
 
 # ---------- Models ----------
 class AskRequest(BaseModel):
@@ -70,27 +55,27 @@ class AskRequest(BaseModel):
 def extract_text_from_image(data: bytes):
     try:
         image = Image.open(io.BytesIO(data))
-        resp = GEMINI.generate_content([
+        return gemini_sdk_text([
             "Extract ALL medical text from this image. Return ONLY the text.",
             image
         ])
-        return resp.text.strip() if resp and resp.text else ""
+    except LLMError:
+        raise  # → 503 in upload_file
     except:
         return ""
 
 
 def extract_text_from_pdf(data: bytes):
+    # page ranges parsed in parallel in the extraction process pool
     try:
-        reader = PyPDF2.PdfReader(io.BytesIO(data))
-        return "\n".join([(p.extract_text() or "") for p in reader.pages])
+        return extract_document(data, "pdf")
     except:
         return ""
 
 
 def extract_text_from_docx(data: bytes):
     try:
-        doc = Document(io.BytesIO(data))
-        return "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
+        return extract_document(data, "docx")
     except:
         return ""
 
@@ -106,99 +91,111 @@ def extract_text(file_bytes: bytes, ext: str):
     return ""
 
 
-# ---------- HELPERS ----------
-def is_medical(text: str):
-    text = text.lower()
-    return any(k in text for k in MEDICAL_KEYWORDS)
-
-
-def chunk_text(text: str, chunk=350, step=300) -> List[str]:
-    words = text.split()
-    chunks = []
-    i = 0
-    while i < len(words):
-        c = " ".join(words[i:i+chunk])
-        if c.strip():
-            chunks.append(c)
-        i += step
-    return chunks or ["[EMPTY]"]
-
-
 # ---------------------------- UPLOAD --------------------------------
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(file: UploadFile = File(...), mode: str = Query("sync", pattern="^(sync|stream)$")):
     ext = file.filename.lower().split(".")[-1]
     if ext not in ALLOWED_EXTS:
         raise HTTPException(400, "Only pdf, docx, png, jpg, jpeg, webp allowed.")
 
+    if mode == "stream":
+        return await run_in_threadpool(stream_upload, file.file, file.filename, ext)
+
     raw = await file.read()
-    text = extract_text(raw, ext)
+    # identical content was already OCR'd / parsed and indexed
+    file_hash = sha256_bytes(raw)
+    stored = await run_in_threadpool(DOCUMENTS.find_indexed, CLIENT, COLLECTION_NAME, ORIGIN, file.filename, file_hash)
+    if stored:
+        return stored_response(stored, file.filename)
+
+    start = time.perf_counter()
+    try:
+        text = await run_in_threadpool(extract_text, raw, ext)
+    except LLMError as e:
+        raise HTTPException(503, f"Text extraction model is unavailable, retry later ({e})")
+    timings = {"extract_ms": round((time.perf_counter() - start) * 1000, 1)}
 
     if not text.strip():
         raise HTTPException(400, "Unable to extract text from file.")
 
-    if not is_medical(text):
+    # keyword pre-filter, then a sampled embedding check; the sample's vectors are reused below
+    chunks = chunk_text(text) or ["[EMPTY]"]
+    verdict = await run_in_threadpool(gate_chunks, chunks, text)
+    if not verdict.accepted:
         raise HTTPException(400, "Document does not appear medical. Only medical files allowed.")
 
-    chunks = chunk_text(text)
-    points = []
-
-    for c in chunks:
-        vec = list(EMBEDDING.embed([c]))[0].tolist()
-        points.append(PointStruct(
-            id=str(uuid.uuid4()),
-            vector=vec,
-            payload={"text": c, "file": file.filename}
-        ))
-
-    CLIENT.upsert(collection_name=COLLECTION_NAME, points=points)
+    payloads = [{"text": c, "file": file.filename, "origin": ORIGIN, "file_hash": file_hash} for c in chunks]
+    await run_in_threadpool(index_chunks, CLIENT, COLLECTION_NAME, chunks, payloads,
+                            ids=chunk_ids(ORIGIN, file.filename, file_hash, chunks), timings=timings, known=verdict.vectors)
+    await run_in_threadpool(drop_stale_chunks, CLIENT, COLLECTION_NAME, ORIGIN, file.filename, file_hash)
+    await run_in_threadpool(ANSWER_CACHE.invalidate, "medical.ask")
+    DOCUMENTS.put(ORIGIN, file.filename, file_hash, len(chunks), {"suggested_questions": PREDEFINED_SUGGESTIONS})
 
     return {
         "status": "success",
         "file": file.filename,
         "chunks": len(chunks),
-        "suggested_questions": PREDEFINED_SUGGESTIONS
+        "suggested_questions": PREDEFINED_SUGGESTIONS,
+        "timings_ms": timings
     }
 
 
-# ---------------------------- ASK --------------------------------
-@router.post("/ask")
-async def ask(req: AskRequest):
-    qvec = list(EMBEDDING.embed([req.question]))[0]
-    results = CLIENT.search(
-        collection_name=COLLECTION_NAME,
-        query_vector=qvec,
-        limit=req.n_results
-    )
+def stream_upload(fileobj, filename, ext):
+    """
+    Streaming variant of /upload: chunks are indexed window by window once a
+    medical keyword has been seen; nothing is indexed for rejected files.
+    """
+    path = spool_to_disk(fileobj, "." + ext)
+    file_hash = sha256_file(path)
+    stored = DOCUMENTS.find_indexed(CLIENT, COLLECTION_NAME, ORIGIN, filename, file_hash)
+    if stored:
+        os.remove(path)
+        return stored_response(stored, filename)
 
-    # If no retrieved results → fallback LLM
-    if not results:
-        resp = GEMINI.generate_content([
-            "You are a safe medical assistant. "
-            "Answer cautiously using general medical knowledge. Recommend clinical verification.",
-            req.question
-        ])
-        answer = resp.text.strip() if resp and resp.text else "Unable to answer."
-        
-        # Generate dynamic suggestions even for no results
-        context = "No documents available."
-        sugg_resp = GEMINI.generate_content([
-            "Generate exactly 3 smart short follow-up questions based on this medical question.",
-            f"Original question: {req.question}"
-        ])
-        suggested = parse_suggestions(sugg_resp.text)
-        
-        return {
-            "question": req.question,
-            "answer": answer,
-            "sources": [],
-            "source_type": "LLM",
-            "suggested_questions": suggested
-        }
-
-    # Build context
+    def whole_file(p):
+        with open(p, "rb") as f:
+            return extract_text(f.read(), ext)
+
+    try:
+        stats, _ = stream_index(CLIENT, COLLECTION_NAME, iter_document_text(path, ext, whole_file),
+                                lambda c: {"text": c, "file": filename, "origin": ORIGIN, "file_hash": file_hash},
+                                gate=has_medical_terms, vector_gate=gate_chunks, make_id=ChunkIds(ORIGIN, filename, file_hash))
+    except LLMError as e:
+        DOCUMENTS.forget(ORIGIN, filename)
+        raise HTTPException(503, f"Text extraction model is unavailable, retry later ({e})")
+    except StreamRejected as e:
+        if e.reason == "empty":
+            raise HTTPException(400, "Unable to extract text from file.")
+        raise HTTPException(400, "Document does not appear medical. Only medical files allowed.")
+    except Exception:
+        # stream_index rolled back what it wrote; don't vouch for this file any more
+        DOCUMENTS.forget(ORIGIN, filename)
+        raise
+    finally:
+        os.remove(path)
+    drop_stale_chunks(CLIENT, COLLECTION_NAME, ORIGIN, filename, file_hash)
+    ANSWER_CACHE.invalidate("medical.ask")
+    DOCUMENTS.put(ORIGIN, filename, file_hash, stats["chunks"], {"suggested_questions": PREDEFINED_SUGGESTIONS})
+
+    return {
+        "status": "success",
+        "file": filename,
+        "chunks": stats["chunks"],
+        "suggested_questions": PREDEFINED_SUGGESTIONS,
+        "timings_ms": {k: v for k, v in stats.items() if k.endswith("_ms")}
+    }
+
+
+# ---------------------------- ASK --------------------------------
+async def retrieve(question: str, n_results: int):
+    """Query embedding, hits and the client-facing source previews for an ask request."""
+    qvec = await acached_query_embedding(question)
+    # on a miss this is the Qdrant round-trip plus the sparse query embedding
+    results = await run_in_threadpool(cached_search, CLIENT, COLLECTION_NAME, qvec, limit=n_results,
+                                      query_filter=ORIGIN_FILTER, query_text=question)
+
+    # Build sources (context is assembled per prompt, within its token budget)
     sources = []
-    context = ""
     max_score = 0
 
     for r in results:
@@ -211,51 +208,117 @@ async def ask(req: AskRequest):
             "file": r.payload.get("file"),
             "score": round(score, 4)
         })
+    return qvec, results, sources, max_score
 
-        context += text + "\n\n"
 
-    # Generate dynamic suggestions FIRST (works for all cases)
-    sugg_resp = GEMINI.generate_content([
+def ask_prompts(question: str, results, max_score: float):
+    """(source_type, answer prompt parts, suggestion prompt parts) for the retrieval outcome."""
+    # If no retrieved results → fallback LLM
+    if not results:
+        return "LLM", [
+            "You are a safe medical assistant. "
+            "Answer cautiously using general medical knowledge. Recommend clinical verification.",
+            question
+        ], [
+            "Generate exactly 3 smart short follow-up questions based on this medical question.",
+            f"Original question: {question}"
+        ]
+
+    # Dynamic suggestions (works for all cases)
+    suggestion_parts = [
         "Generate exactly 3 smart, specific follow-up short questions for this medical query. "
         "Make them relevant to the context and question. Number them 1., 2., 3.",
-        f"Context (from medical documents):\n{context[:4000]}",
-        f"User Question: {req.question}"
-    ])
-    suggested_questions = parse_suggestions(sugg_resp.text)
+        f"Context (from medical documents):\n{build_context(results, SUGGEST_CONTEXT_TOKENS)}",
+        f"User Question: {question}"
+    ]
 
-    # Weak retrieval → fallback LLM
     if max_score < 0.15:
-        resp = GEMINI.generate_content([
+        # Weak retrieval → fallback LLM
+        return "LLM_FALLBACK", [
             "You are a cautious medical assistant. Retrieved documents are weak. "
             "Use content only if clearly relevant. Otherwise answer using safe medical knowledge.",
-            f"Documents:\n{context[:3000]}",
-            f"Question:\n{req.question}"
-        ])
-        answer = resp.text.strip() if resp and resp.text else "Unable to answer."
-        return {
-            "question": req.question,
-            "answer": answer,
-            "sources": sources,
-            "source_type": "LLM_FALLBACK",
-            "suggested_questions": suggested_questions
-        }
+            f"Documents:\n{build_context(results, FALLBACK_CONTEXT_TOKENS)}",
+            f"Question:\n{question}"
+        ], suggestion_parts
 
     # Strong retrieval → RAG answer
-    resp = GEMINI.generate_content([
+    return "DOCUMENT", [
         "You are a medical assistant. Use ONLY the context below. "
         "Do NOT hallucinate. If answer is unclear, say so.",
-        f"Context:\n{context[:8000]}",
-        f"Question:\n{req.question}"
-    ])
-    answer = resp.text.strip() if resp and resp.text else "Unable to answer."
+        f"Context:\n{build_context(results, ASK_CONTEXT_TOKENS)}",
+        f"Question:\n{question}"
+    ], suggestion_parts
 
-    return {
-        "question": req.question,
+
+@router.post("/ask")
+async def ask(req: AskRequest):
+    qvec, results, sources, max_score = await retrieve(req.question, req.n_results)
+
+    # Near-identical question over the same sources → reuse the cached answer
+    skey = sources_key(results)
+    cached = await run_in_threadpool(ANSWER_CACHE.lookup, "medical.ask", qvec, skey)
+    if cached:
+        return {"question": req.question, "sources": sources, **cached}
+
+    source_type, answer_parts, suggestion_parts = ask_prompts(req.question, results, max_score)
+    # answer and dynamic suggestions are independent → run both at once
+    answer, sugg_text = await asyncio.gather(
+        agemini_generate_text(answer_parts, fallback="Unable to answer."),
+        agemini_generate_text(suggestion_parts, fallback="")
+    )
+
+    response = {
         "answer": answer,
-        "sources": sources,
-        "source_type": "DOCUMENT",
-        "suggested_questions": suggested_questions
+        "source_type": source_type,
+        "suggested_questions": parse_suggestions(sugg_text)
     }
+    if answer != "Unable to answer.":
+        await run_in_threadpool(ANSWER_CACHE.store, "medical.ask", req.question, qvec, skey, response)
+
+    return {"question": req.question, "sources": sources, **response}
+
+
+@router.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """
+    SSE variant of /ask: `sources` as soon as retrieval is done, then answer
+    `token` deltas from Gemini, then `suggestions` and `done`.
+    """
+    qvec, results, sources, max_score = await retrieve(req.question, req.n_results)
+    skey = sources_key(results)
+    cached = await run_in_threadpool(ANSWER_CACHE.lookup, "medical.ask", qvec, skey)
+
+    async def events():
+        yield sse_event("sources", {"question": req.question, "sources": sources})
+        if cached:
+            yield sse_event("token", {"text": cached["answer"]})
+            yield sse_event("suggestions", {"suggested_questions": cached["suggested_questions"]})
+            yield sse_event("done", {"source_type": cached.get("source_type"), "cached": True})
+            return
+
+        source_type, answer_parts, suggestion_parts = ask_prompts(req.question, results, max_score)
+        # suggestions generate in the background while the answer streams
+        suggestions = asyncio.create_task(agemini_generate_text(suggestion_parts, fallback=""))
+        try:
+            # a provider error mid-answer raises here: sse_response sends `error`, nothing is cached
+            parts = []
+            async for delta in astream_gemini_text(answer_parts, fallback="Unable to answer."):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+            suggested = parse_suggestions(await suggestions)
+        finally:
+            suggestions.cancel()  # no-op unless the client went away mid-stream
+
+        yield sse_event("suggestions", {"suggested_questions": suggested})
+        yield sse_event("done", {"source_type": source_type, "cached": False})
+
+        answer = "".join(parts).strip()
+        if answer != "Unable to answer.":
+            await run_in_threadpool(ANSWER_CACHE.store, "medical.ask", req.question, qvec, skey, {
+                "answer": answer, "source_type": source_type, "suggested_questions": suggested
+            })
+
+    return sse_response(events())
 
 def parse_suggestions(raw_text: str) -> List[str]:
     """Parse Gemini response to extract exactly 3 clean questions."""
@@ -281,11 +344,11 @@ def parse_suggestions(raw_text: str) -> List[str]:
 # ---------------------------- CLEAR --------------------------------
 @router.post("/clear")
 async def clear():
-    CLIENT.delete_collection(collection_name=COLLECTION_NAME)
-    CLIENT.create_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config=VectorParams(size=DIM, distance=Distance.COSINE)
-    )
+    # only this router's uploads; /api/system documents stay
+    clear_origin(CLIENT, ORIGIN)
+    DOCUMENTS.clear(ORIGIN)
+    invalidate_collection(CLIENT, COLLECTION_NAME)
+    await run_in_threadpool(ANSWER_CACHE.invalidate, "medical.ask")
     return {"status": "cleared"}
 
 
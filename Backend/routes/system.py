@@ -1,28 +1,36 @@
 # backend/routes/system.py
-from fastapi import APIRouter, File, UploadFile, HTTPException
+import os
+import time
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from utils.extractors import extract_text, chunk_text
-from models.semantic_memory import upsert_chunks_to_qdrant
+from models.semantic_memory import ORIGIN, upsert_chunks_to_qdrant
 from utils.genai_wrapper import gemini_generate_text
-from utils.qdrant_connection import COLLECTION_NAME
+from utils.llm_providers import LLMError
+from utils.llm_scheduler import SCHEDULER
+from utils.qdrant_connection import CLIENT, COLLECTION_NAME, clear_origin
+from utils.cache import cache_stats, invalidate_collection
+from utils.answer_cache import ANSWER_CACHE
+from utils.indexing import embed_chunks, index_chunks, write_chunks
+from utils.documents import (
+    ChunkIds, chunk_ids, drop_stale_chunks, get_document_registry, sha256_bytes, sha256_file, stored_response
+)
+from utils.jobs import JOBS, Job, QueueFull
+from utils.streaming_ingest import StreamRejected, iter_document_text, spool_to_disk, stream_index
 
 router = APIRouter()
 
-@router.post("/upload/")
-async def upload(file: UploadFile = File(...)):
-    allowed = ["pdf","docx","pptx","ppt","xlsx","xls","csv","txt","json","png","jpg","jpeg","webp","mp3","wav","m4a","ogg"]
-    ext = file.filename.lower().split(".")[-1]
-    if ext not in allowed:
-        raise HTTPException(400, "Unsupported file")
-
-    content = await file.read()
-    text = extract_text(content, file.filename, ext)
-    chunks = chunk_text(text)
+ALLOWED_EXTS = ["pdf","docx","pptx","ppt","xlsx","xls","csv","txt","json","png","jpg","jpeg","webp","mp3","wav","m4a","ogg"]
+DEFAULT_SUMMARY = "File processed."
+DEFAULT_QUESTIONS = ["What is this about?", "Can you summarize it?", "What are the key points?"]
+DOCUMENTS = get_document_registry()
 
-    uploaded = upsert_chunks_to_qdrant(chunks, file.filename, ext)
 
-    # summary via Gemini
-    summary = "File processed."
-    suggested_questions = ["What is this about?", "Can you summarize it?", "What are the key points?"]
+def summarize_document(text):
+    """Gemini summary + 3 suggested questions (falls back to defaults)."""
+    summary = DEFAULT_SUMMARY
+    suggested_questions = list(DEFAULT_QUESTIONS)
 
     if text.strip() and len(text.strip()) > 20:
         prompt = [
@@ -53,23 +61,176 @@ async def upload(file: UploadFile = File(...)):
         elif questions:
             suggested_questions = questions + ["Tell me more?", "Any key insights?"]
 
+    return summary, suggested_questions
+
+
+def check_ext(filename):
+    ext = filename.lower().split(".")[-1]
+    if ext not in ALLOWED_EXTS:
+        raise HTTPException(400, "Unsupported file")
+    return ext
+
+
+@router.post("/upload/")
+async def upload(file: UploadFile = File(...), mode: str = Query("sync", pattern="^(sync|async|stream)$")):
+    ext = check_ext(file.filename)
+
+    if mode == "stream":
+        return await run_in_threadpool(stream_upload, file.file, file.filename, ext)
+
+    content = await file.read()
+    # identical content was already extracted, indexed and summarized
+    file_hash = sha256_bytes(content)
+    stored = await run_in_threadpool(DOCUMENTS.find_indexed, CLIENT, COLLECTION_NAME, ORIGIN, file.filename, file_hash)
+    if stored:
+        return stored_response(stored, file.filename)
+
+    if mode == "async":
+        job = Job(file.filename, INGEST_STAGES)
+        job.content = content
+        try:
+            JOBS.submit(job, run_ingest_job, file.filename, ext, file_hash)
+        except QueueFull as e:
+            raise HTTPException(503, f"Ingestion queue is full, retry later ({e})")
+        return JSONResponse(status_code=202, content={
+            "status": "accepted",
+            "job_id": job.id,
+            "file": file.filename,
+            "status_url": f"/api/system/jobs/{job.id}"
+        })
+
+    start = time.perf_counter()
+    try:
+        text = await run_in_threadpool(extract_text, content, file.filename, ext)
+    except LLMError as e:
+        raise HTTPException(503, f"Text extraction model is unavailable, retry later ({e})")
+    timings = {"extract_ms": round((time.perf_counter() - start) * 1000, 1)}
+    chunks = chunk_text(text)
+
+    uploaded = await run_in_threadpool(upsert_chunks_to_qdrant, chunks, file.filename, ext, timings, file_hash)
+    await run_in_threadpool(ANSWER_CACHE.invalidate, "chat.ask")
+
+    # summary via Gemini
+    summary, suggested_questions = await run_in_threadpool(summarize_document, text)
+    DOCUMENTS.put(ORIGIN, file.filename, file_hash, len(chunks),
+                  {"summary": summary, "suggested_questions": suggested_questions})
+
     return {
         "status": "success",
         "file": file.filename,
         "chunks": len(chunks),
         "summary": summary,
-        "suggested_questions": suggested_questions
+        "suggested_questions": suggested_questions,
+        "timings_ms": timings
     }
 
+
+# ---------- streaming ingestion (mode=stream) ----------
+def stream_upload(fileobj, filename, ext):
+    """Spool → page-wise extraction → windowed embed + upsert; never holds the whole file."""
+    path = spool_to_disk(fileobj, "." + ext)
+    file_hash = sha256_file(path)
+    stored = DOCUMENTS.find_indexed(CLIENT, COLLECTION_NAME, ORIGIN, filename, file_hash)
+    if stored:
+        os.remove(path)
+        return stored_response(stored, filename)
+
+    def whole_file(p):
+        with open(p, "rb") as f:
+            return extract_text(f.read(), filename, ext)
+
+    def payload(chunk):
+        return {"text": chunk, "file": filename, "type": ext.upper(), "origin": ORIGIN, "file_hash": file_hash}
+
+    try:
+        stats, head = stream_index(CLIENT, COLLECTION_NAME, iter_document_text(path, ext, whole_file),
+                                   payload, make_id=ChunkIds(ORIGIN, filename, file_hash))
+    except LLMError as e:
+        DOCUMENTS.forget(ORIGIN, filename)
+        raise HTTPException(503, f"Text extraction model is unavailable, retry later ({e})")
+    except StreamRejected:
+        # nothing extractable → same "[Empty]" placeholder as chunk_text
+        head = ""
+        stats = {"chunks": index_chunks(CLIENT, COLLECTION_NAME, ["[Empty]"], [payload("[Empty]")],
+                                        ids=chunk_ids(ORIGIN, filename, file_hash, ["[Empty]"]))}
+    except Exception:
+        # stream_index rolled back what it wrote; don't vouch for this file any more
+        DOCUMENTS.forget(ORIGIN, filename)
+        raise
+    finally:
+        os.remove(path)
+    drop_stale_chunks(CLIENT, COLLECTION_NAME, ORIGIN, filename, file_hash)
+    ANSWER_CACHE.invalidate("chat.ask")
+
+    summary, suggested_questions = summarize_document(head)
+    DOCUMENTS.put(ORIGIN, filename, file_hash, stats["chunks"],
+                  {"summary": summary, "suggested_questions": suggested_questions})
+    return {
+        "status": "success",
+        "file": filename,
+        "chunks": stats["chunks"],
+        "summary": summary,
+        "suggested_questions": suggested_questions,
+        "timings_ms": {k: v for k, v in stats.items() if k.endswith("_ms")}
+    }
+
+
+# ---------- async ingestion (mode=async) ----------
+INGEST_STAGES = ["extraction", "embedding", "indexing", "summarization"]
+
+
+def run_ingest_job(job, filename, ext, file_hash):
+    """Runs on an ingestion worker; the summary is handed to the follow-up pool once indexed."""
+    with job.stage("extraction"):
+        content, job.content = job.content, None
+        text = extract_text(content, filename, ext)
+        chunks = chunk_text(text)
+        del content
+
+    with job.stage("embedding") as stage:
+        vectors = embed_chunks(chunks)
+        stage["chunks"] = len(chunks)
+
+    with job.stage("indexing"):
+        payloads = [{"text": c, "file": filename, "type": ext.upper(), "origin": ORIGIN, "file_hash": file_hash}
+                    for c in chunks]
+        write_chunks(CLIENT, COLLECTION_NAME, chunk_ids(ORIGIN, filename, file_hash, chunks), vectors, payloads)
+        drop_stale_chunks(CLIENT, COLLECTION_NAME, ORIGIN, filename, file_hash)
+        ANSWER_CACHE.invalidate("chat.ask")
+    job.searchable = True
+    job.result.update({"chunks": len(chunks)})
+
+    JOBS.run_followup(job, run_summary_stage, text, filename, file_hash, len(chunks))
+
+
+def run_summary_stage(job, text, filename, file_hash, n_chunks):
+    with job.stage("summarization"):
+        summary, suggested_questions = summarize_document(text)
+    DOCUMENTS.put(ORIGIN, filename, file_hash, n_chunks,
+                  {"summary": summary, "suggested_questions": suggested_questions})
+    job.finish(summary=summary, suggested_questions=suggested_questions)
+
+
+@router.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown job id")
+    return job.to_dict()
+
 @router.post("/clear/")
 async def clear():
-    from utils.qdrant_connection import CLIENT, DIM
-    # delete & recreate collection (1.7.3 style)
-    CLIENT.delete_collection(collection_name=COLLECTION_NAME)
-    CLIENT.create_collection(collection_name=COLLECTION_NAME,
-                             vectors_config={"size": DIM, "distance": "Cosine"} )
+    # only this router's uploads; the collection itself is shared and persistent
+    clear_origin(CLIENT, ORIGIN)
+    DOCUMENTS.clear(ORIGIN)
+    invalidate_collection(CLIENT, COLLECTION_NAME)
+    await run_in_threadpool(ANSWER_CACHE.invalidate, "chat.ask")
     return {"status": "cleared"}
 
+@router.get("/cache-stats/")
+def cache_stats_endpoint():
+    return dict(cache_stats(), answers=ANSWER_CACHE.stats(), ingest_jobs=JOBS.stats(), llm=SCHEDULER.stats())
+
 @router.get("/")
 def home():
     return {"message": "GEMINI FULL MULTIMODAL RAG – Images + Audio PERFECT!"}
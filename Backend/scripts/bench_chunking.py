@@ -0,0 +1,124 @@
+# backend/scripts/bench_chunking.py
+"""
+Chunker comparison: the old splitters vs utils/chunking.py.
+
+    python scripts/bench_chunking.py --entries 2000 --k 1 5
+
+For the first N dataset entries the reasoning + answer text is chunked by
+each splitter and embedded with bge-small; every entry's Question is then
+used as a query against that splitter's chunks.  Reported per splitter:
+chunk count, tokens per chunk, share of chunks over the model's 512-token
+window (the tail of those is silently truncated), embedding time and
+entry-level hit@k / MRR.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastembed import TextEmbedding
+
+from qdrant import EMBEDDING_MODEL, JSON_FILE_PATH
+from utils import chunking
+from utils.json_stream import streaming_json
+
+MODEL_WINDOW = 510  # 512 minus [CLS] / [SEP]
+
+
+def words(chunk_words, step):
+    """The old word-window chunk_text (extractors 400/350, medical 350/300)."""
+    def split(text):
+        w = text.split()
+        return [" ".join(w[i:i + chunk_words]) for i in range(0, len(w), step)]
+    return split
+
+
+def legacy_chars(text):
+    """The old qdrant.py slicing."""
+    return [text[i:i + 2500] for i in range(0, len(text), 2500)] if len(text) > 3000 else [text]
+
+
+SPLITTERS = {
+    "chars_2500": legacy_chars,
+    "words_400_350": words(400, 350),
+    "words_350_300": words(350, 300),
+    "tokens": chunking.chunk_text,
+}
+
+
+def load(n):
+    docs, questions = [], []
+    for entry in streaming_json(JSON_FILE_PATH):
+        body = "\n\n".join(p for p in (f"Reasoning: {entry.get('Complex_Cot', '').strip()}",
+                                       f"Answer: {entry.get('Response', '').strip()}") if p.strip())
+        if entry.get("Question") and body:
+            docs.append(body)
+            questions.append(entry["Question"].strip())
+        if len(docs) >= n:
+            break
+    return docs, questions
+
+
+def evaluate(model, docs, q_vecs, split, ks):
+    chunks, owners = [], []
+    for i, doc in enumerate(docs):
+        for c in split(doc):
+            if c.strip():
+                chunks.append(c)
+                owners.append(i)
+    tokens = np.array(chunking.count_tokens(chunks))
+
+    start = time.perf_counter()
+    vecs = np.array(list(model.embed(chunks, batch_size=256)), dtype=np.float32)
+    embed_s = time.perf_counter() - start
+
+    owners = np.array(owners)
+    sims = q_vecs @ vecs.T
+    hits = {k: 0 for k in ks}
+    rr = 0.0
+    for qi in range(len(q_vecs)):
+        order = np.argsort(-sims[qi])
+        ranked = list(dict.fromkeys(owners[order[:max(ks) * 8]]))  # entries in rank order
+        if qi in ranked:
+            rank = ranked.index(qi) + 1
+            rr += 1 / rank
+            for k in ks:
+                hits[k] += rank <= k
+    n = len(q_vecs)
+    return {
+        "chunks": len(chunks),
+        "tokens_per_chunk": round(float(tokens.mean()), 1),
+        "over_window_pct": round(float((tokens > MODEL_WINDOW).mean() * 100), 2),
+        "truncated_tokens_pct": round(float(np.clip(tokens - MODEL_WINDOW, 0, None).sum() / tokens.sum() * 100), 2),
+        "embed_s": round(embed_s, 2),
+        **{f"hit@{k}": round(hits[k] / n, 4) for k in ks},
+        "mrr": round(rr / n, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--splitters", nargs="+", default=list(SPLITTERS), choices=list(SPLITTERS))
+    args = parser.parse_args()
+
+    model = TextEmbedding(model_name=EMBEDDING_MODEL)
+    chunking.use_model_tokenizer(model)
+    docs, questions = load(args.entries)
+    q_vecs = np.array(list(model.query_embed(questions)), dtype=np.float32)
+
+    report = {"entries": len(docs), "chunker": chunking.CHUNKER_ID, "results": {}}
+    for name in args.splitters:
+        report["results"][name] = evaluate(model, docs, q_vecs, SPLITTERS[name], args.k)
+        print(f"{name}: done", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
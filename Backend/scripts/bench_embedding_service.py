@@ -0,0 +1,77 @@
+# backend/scripts/bench_embedding_service.py
+"""
+Concurrent query-embedding load: one-text-per-call vs the micro-batching service.
+
+    python scripts/bench_embedding_service.py --concurrency 32 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastembed import TextEmbedding
+from utils.embedding_service import EMBEDDING_MODEL, EmbeddingService
+
+QUERIES = [
+    "What are the treatment options?",
+    "Summarize the given document.",
+    "chest pain radiating to the left arm with sweating",
+    "What are the key findings from the document?",
+    "fever and stiff neck in a child",
+]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def drive(embed_one, concurrency, total):
+    latencies = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            await embed_one(QUERIES[i % len(QUERIES)] + f" #{i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"qps": round(total / elapsed, 1), "p50_ms": round(statistics.median(latencies), 2),
+            "p99_ms": round(percentile(latencies, 99), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    # baseline: what the routes used to do — a single-text embed per request on a worker thread
+    model = TextEmbedding(model_name=EMBEDDING_MODEL)
+
+    async def direct(text):
+        return await asyncio.to_thread(lambda: list(model.embed([text]))[0])
+
+    service = EmbeddingService(max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+
+    results = {
+        "per_request": asyncio.run(drive(direct, args.concurrency, args.requests)),
+        "micro_batched": asyncio.run(drive(service.aembed_one, args.concurrency, args.requests)),
+        "service": service.stats(),
+        "config": vars(args),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# backend/scripts/bench_escalation.py
+"""
+Escalation triage on a labelled set: local fast path vs the LLM.
+
+    python scripts/bench_escalation.py
+    python scripts/bench_escalation.py --llm --sweep --out escalation.json
+
+data/escalation_labelled.json holds symptom descriptions labelled
+emergency / routine (written independently of the prototype sentences in
+utils/triage.py).  Reported per strategy: precision / recall / F1 for the
+emergency class, share of cases it decided, and per-case latency.
+  phrase     red-flag phrases only (no hit = routine)
+  local      utils/triage.triage on the query embedding; scored on the cases
+             it decides, ambiguous ones are counted under "deferred"
+  local+safe local, ambiguous treated as emergency (no LLM at all)
+  cascade    local, ambiguous cases sent to the LLM (--llm)
+  llm        every case to the LLM, the pre-fast-path behaviour (--llm)
+--llm uses the DSPy LM from dspy_config (Gemini, or the canned FakeLM with
+LLM_PROVIDER=fake, which always answers "no").  --sweep grids the two
+margins and reports coverage / precision / recall of the local decisions.
+Embedding time is reported separately: the consult route reuses the
+retrieval embedding, so it isn't part of the triage cost.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastembed import TextEmbedding
+
+from utils.cache import normalize_query
+from utils.centroids import Centroids
+from utils.embedding_service import EMBEDDING_MODEL
+from utils.triage import EMERGENCY_PROTOTYPES, ROUTINE_PROTOTYPES, red_flag, triage
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "escalation_labelled.json")
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]  # nearest rank
+
+
+def scores(labels, predictions):
+    pairs = [(y, p) for y, p in zip(labels, predictions) if p is not None]
+    tp = sum(1 for y, p in pairs if y and p)
+    fp = sum(1 for y, p in pairs if not y and p)
+    fn = sum(1 for y, p in pairs if y and not p)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "decided": len(pairs),
+        "deferred": len(labels) - len(pairs),
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        "accuracy": round(sum(1 for y, p in pairs if y == p) / len(pairs), 4) if pairs else 0.0,
+    }
+
+
+def latency(samples_s):
+    ms = sorted(s * 1000 for s in samples_s)
+    return {"p50_ms": round(percentile(ms, 50), 3), "p95_ms": round(percentile(ms, 95), 3),
+            "mean_ms": round(sum(ms) / len(ms), 3)}
+
+
+def timed_map(fn, items):
+    out, took = [], []
+    for item in items:
+        start = time.perf_counter()
+        out.append(fn(item))
+        took.append(time.perf_counter() - start)
+    return out, took
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=DATA)
+    parser.add_argument("--llm", action="store_true", help="also run the LLM and the cascade")
+    parser.add_argument("--sweep", action="store_true", help="grid the emergency / routine margins")
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    with open(args.data) as f:
+        rows = json.load(f)
+    texts = [r["text"] for r in rows]
+    labels = [bool(r["emergency"]) for r in rows]
+
+    model = TextEmbedding(model_name=EMBEDDING_MODEL)
+    centroids = Centroids(EMERGENCY_PROTOTYPES, ROUTINE_PROTOTYPES, embed=lambda sentences: list(model.embed(sentences)))
+    start = time.perf_counter()
+    vectors = list(model.embed([normalize_query(t) for t in texts]))
+    embed_s = time.perf_counter() - start
+    centroids.margin(vectors[0])  # build the centroids outside the timed loop
+
+    report = {"cases": len(rows), "emergencies": sum(labels), "embed_ms_per_case": round(embed_s / len(rows) * 1000, 3),
+              "strategies": {}}
+
+    phrase, took = timed_map(lambda i: red_flag(texts[i]) is not None, range(len(rows)))
+    report["strategies"]["phrase"] = dict(scores(labels, phrase), **latency(took))
+
+    local, took = timed_map(lambda i: triage(texts[i], vectors[i], centroids=centroids), range(len(rows)))
+    decisions = [t.emergency for t in local]
+    report["strategies"]["local"] = dict(scores(labels, decisions), **latency(took),
+                                         by_stage={s: sum(1 for t in local if t.stage == s)
+                                                   for s in ("phrase", "embedding", "ambiguous")})
+    report["strategies"]["local+safe"] = dict(scores(labels, [True if d is None else d for d in decisions]),
+                                              **latency(took))
+
+    if args.llm:
+        import dspy_config  # noqa: F401  configures the DSPy LM
+        from models.escalation_detector import EscalationDetector
+        detector = EscalationDetector(fastpath=False)
+        llm, llm_took = timed_map(lambda i: detector.check_llm(texts[i]), range(len(rows)))
+        report["strategies"]["llm"] = dict(scores(labels, llm), **latency(llm_took))
+        cascade = [llm[i] if d is None else d for i, d in enumerate(decisions)]
+        cascade_took = [t + (llm_took[i] if decisions[i] is None else 0.0) for i, t in enumerate(took)]
+        report["strategies"]["cascade"] = dict(scores(labels, cascade), **latency(cascade_took),
+                                               llm_calls=sum(1 for d in decisions if d is None))
+
+    if args.sweep:
+        margins = [t.margin for t in local if t.margin is not None]
+        report["margins"] = {"min": round(min(margins), 4), "max": round(max(margins), 4)} if margins else {}
+        grid = []
+        for hi in (0.0, 0.02, 0.04, 0.06, 0.08, 0.1):
+            for lo in (-0.1, -0.06, -0.04, -0.02, 0.0):
+                if lo > hi:
+                    continue
+                d = [triage(texts[i], vectors[i], hi, lo, centroids).emergency for i in range(len(rows))]
+                grid.append(dict(scores(labels, d), emergency_margin=hi, routine_margin=lo))
+        report["sweep"] = grid
+
+    out = json.dumps(report, indent=2)
+    print(out)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out + "\n")
+
+
+if __name__ == "__main__":
+    main()
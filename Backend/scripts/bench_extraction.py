@@ -0,0 +1,84 @@
+# backend/scripts/bench_extraction.py
+"""
+PDF extraction benchmark: in-process PyPDF2 vs the page-parallel process pool.
+
+    python scripts/bench_extraction.py --pages 300 500 --workers 4
+
+A synthetic text PDF is generated for each page count (no extra deps).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.extract_pool import ExtractionPool, parse_bytes
+
+LINE = "Patient presents with intermittent chest pain; troponin negative, ECG shows sinus rhythm."
+
+
+def make_pdf(pages: int, lines_per_page: int = 50) -> bytes:
+    """Minimal multi-page PDF with one Helvetica text stream per page."""
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]  # 1 catalog, 2 pages, 3 font
+    page_ids = []
+    for p in range(pages):
+        text = "".join(f"({LINE} p{p} l{i}) '\n" for i in range(lines_per_page))
+        stream = f"BT /F1 9 Tf 40 800 Td 14 TL\n{text}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[200, 500])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    args = parser.parse_args()
+
+    pool = ExtractionPool(workers=args.workers, pages_per_task=args.pages_per_task)
+    _, warmup = timed(pool.extract, make_pdf(args.workers), "pdf")  # spawn workers once
+
+    results = []
+    for pages in args.pages:
+        data = make_pdf(pages)
+        serial_text, serial_s = timed(parse_bytes, data, "pdf")
+        pool_text, pool_s = timed(pool.extract, data, "pdf")
+        results.append({
+            "pages": pages,
+            "pdf_mb": round(len(data) / (1 << 20), 2),
+            "serial_s": round(serial_s, 3),
+            "pool_s": round(pool_s, 3),
+            "speedup": round(serial_s / pool_s, 2) if pool_s else None,
+            "pages_per_s_pool": round(pages / pool_s, 1) if pool_s else None,
+            "same_text": serial_text == pool_text,
+        })
+    print(json.dumps({"workers": args.workers, "pool_warmup_s": round(warmup, 3), "runs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# backend/scripts/bench_medical_gate.py
+"""
+Medical upload gate on large synthetic documents: old keyword scan vs
+utils/medical_gate.py.
+
+    python scripts/bench_medical_gate.py --sizes-kb 100 1000 5000
+    python scripts/bench_medical_gate.py --full-embed --out gate.json
+
+Documents are built from sentence pools: clinical notes / lab results
+(medical), and business, legal, technical and a business report that
+mentions "test" and "report" (non-medical; the old gate accepted it).
+Per document and size:
+  old        lower() + `any(k in text for k in MEDICAL_KEYWORDS)` — time, MB/s, verdict
+  prefilter  the single-pass term matcher — time, MB/s
+  gate       gate_chunks (pre-filter + sampled embedding) — time, verdict,
+             margin, chunks embedded
+  chunks     chunks in the document, i.e. what the old path embedded and
+             upserted before any rejection was possible
+--full-embed also embeds every chunk, to put the gate's cost next to the
+work a rejection now saves.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastembed import TextEmbedding
+
+from utils import chunking
+from utils.centroids import Centroids
+from utils.embedding_service import EMBEDDING_MODEL
+from utils.medical_gate import MEDICAL_PROTOTYPES, NON_MEDICAL_PROTOTYPES, gate_chunks, medical_terms
+
+# the keyword list routes/medical.py used before the gate
+OLD_KEYWORDS = ["patient", "diagnosis", "scan", "mri", "ct", "xray", "symptom", "treatment",
+                "doctor", "medication", "blood", "report", "prescription", "test", "clinic"]
+
+POOLS = {
+    "clinical": (True, [
+        "The patient was admitted with shortness of breath and a productive cough.",
+        "On examination the temperature was 38.4 C, pulse 104 and blood pressure 132/84.",
+        "Haemoglobin 10.9 g/dL, white cell count 13,200 per microlitre, CRP 86 mg/L.",
+        "Chest radiograph showed right lower lobe consolidation.",
+        "She was started on intravenous ceftriaxone and oral azithromycin.",
+        "Past medical history includes type 2 diabetes and hypertension controlled on ramipril.",
+        "Follow-up in the respiratory clinic in six weeks with a repeat chest X-ray.",
+    ]),
+    "lab_panel": (True, [
+        "Sodium 138 mmol/L, potassium 4.1 mmol/L, urea 6.2 mmol/L, creatinine 88 umol/L.",
+        "HbA1c 58 mmol/mol, fasting glucose 7.9 mmol/L.",
+        "Total cholesterol 5.8 mmol/L, LDL 3.9 mmol/L, HDL 1.1 mmol/L.",
+        "Urinalysis positive for leucocytes and nitrites; culture sent.",
+        "TSH 2.1 mU/L, free T4 within the reference range.",
+    ]),
+    "business": (False, [
+        "Revenue for the quarter rose to 4.2 million, up 9 percent on the prior year.",
+        "Operating margin improved as logistics costs fell across the region.",
+        "The board approved a dividend of 12 cents per share.",
+        "Headcount grew by 35 people, mostly in sales and customer success.",
+        "Inventory turnover slowed in the second half because of supplier delays.",
+    ]),
+    "legal": (False, [
+        "The lessee shall maintain the premises in good repair at its own cost.",
+        "Either party may terminate this agreement with ninety days written notice.",
+        "Any dispute shall be referred to arbitration in accordance with the rules in force.",
+        "Nothing in this clause limits liability for fraud or wilful misconduct.",
+    ]),
+    "technical": (False, [
+        "Run the migration before deploying the new version of the service.",
+        "The cache is invalidated whenever the configuration file changes.",
+        "Requests are retried three times with exponential backoff.",
+        "Logs are rotated daily and kept for thirty days.",
+    ]),
+    "qa_report": (False, [
+        "This report summarises the load test of the checkout service.",
+        "Each test ran for ten minutes at 500 requests per second.",
+        "The regression test suite passed on all supported browsers.",
+        "Test coverage of the payment module rose to 84 percent.",
+        "The next report will include the results of the soak test.",
+    ]),
+}
+
+
+def build(pool, size_kb, rng):
+    sentences, out, n = POOLS[pool][1], [], 0
+    while n < size_kb * 1024:
+        para = " ".join(rng.choice(sentences) for _ in range(rng.randint(3, 7)))
+        out.append(para)
+        n += len(para) + 2
+    return "\n\n".join(out)
+
+
+def old_gate(text):
+    text = text.lower()
+    return any(k in text for k in OLD_KEYWORDS)
+
+
+def clock(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--pools", nargs="+", default=list(POOLS), choices=list(POOLS))
+    parser.add_argument("--full-embed", action="store_true", help="also embed every chunk (the old path's cost)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    model = TextEmbedding(model_name=EMBEDDING_MODEL)
+    chunking.use_model_tokenizer(model)
+
+    def embed(texts):
+        return list(model.embed(texts, batch_size=256))
+
+    centroids = Centroids(MEDICAL_PROTOTYPES, NON_MEDICAL_PROTOTYPES, embed=embed)
+    centroids.margins(embed(["warm-up"]))  # build the centroids outside the timings
+
+    rng = random.Random(args.seed)
+    results, correct_old, correct_new = [], 0, 0
+    for size_kb in args.sizes_kb:
+        for pool in args.pools:
+            medical = POOLS[pool][0]
+            text = build(pool, size_kb, rng)
+            mb = len(text.encode("utf-8")) / 1e6
+            old, old_s = clock(old_gate, text)
+            _, pre_s = clock(medical_terms, text)
+            chunks = chunking.chunk_text(text)
+            verdict, gate_s = clock(gate_chunks, chunks, text, embed=embed, centroids=centroids)
+            row = {
+                "doc": pool, "size_kb": size_kb, "medical": medical, "chunks": len(chunks),
+                "old": {"accepted": old, "ms": round(old_s * 1000, 2), "mb_s": round(mb / old_s, 1)},
+                "prefilter": {"ms": round(pre_s * 1000, 3), "mb_s": round(mb / pre_s, 1)},
+                "gate": {"accepted": verdict.accepted, "stage": verdict.stage, "ms": round(gate_s * 1000, 1),
+                         "margin": round(verdict.score, 4) if verdict.score is not None else None,
+                         "embedded": len(verdict.vectors)},
+            }
+            if args.full_embed:
+                _, full_s = clock(embed, chunks)
+                row["full_embed_ms"] = round(full_s * 1000, 1)
+            correct_old += old == medical
+            correct_new += verdict.accepted == medical
+            results.append(row)
+            print(f"{pool} {size_kb} KB: done", file=sys.stderr)
+
+    n = len(results)
+    report = {"documents": n, "accuracy": {"old": round(correct_old / n, 4), "gate": round(correct_new / n, 4)},
+              "results": results}
+    out = json.dumps(report, indent=2)
+    print(out)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out + "\n")
+
+
+if __name__ == "__main__":
+    main()
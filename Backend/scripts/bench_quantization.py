@@ -0,0 +1,147 @@
+# backend/scripts/bench_quantization.py
+"""
+Quantization report: recall@k vs search latency vs vector RAM, against exact search.
+
+    python scripts/bench_quantization.py --points 100000 --source dataset
+    python scripts/bench_quantization.py --url http://localhost:6333 --points 200000 --k 5 10
+
+Needs a Qdrant server (the embedded local mode ignores quantization).
+Three collections are built from the same vectors (none / scalar int8 /
+binary); ground truth is brute-force float32 search (exact=True).  Each
+quantized collection is queried with rescoring on and off over a range of
+oversampling factors.  `vector_ram_mb` is the size of what stays in RAM:
+float32 for `none`, the quantized codes otherwise (originals are on disk).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Batch, Distance, VectorParams
+
+from utils.quantization import quantization_config, search_params
+
+DIM = 384
+PREFIX = "bench_quant_"
+KINDS = ["none", "scalar", "binary"]
+
+
+def dataset_vectors(n):
+    """Embed the first n entries of the ingestion dataset (same text as qdrant.py)."""
+    from fastembed import TextEmbedding
+    from qdrant import JSON_FILE_PATH, EMBEDDING_MODEL, combine_entry
+    from utils.json_stream import streaming_json
+
+    texts = []
+    for entry in streaming_json(JSON_FILE_PATH):
+        text = combine_entry(entry)
+        if text:
+            texts.append(text[:3000])
+        if len(texts) >= n:
+            break
+    model = TextEmbedding(model_name=EMBEDDING_MODEL)
+    return np.array(list(model.embed(texts, batch_size=256)), dtype=np.float32)
+
+
+def random_vectors(n, rng, clusters=256):
+    """Clustered unit vectors; uniform random vectors make every method look equally bad."""
+    centers = rng.standard_normal((clusters, DIM), dtype=np.float32)
+    vecs = centers[rng.integers(0, clusters, n)] + 0.35 * rng.standard_normal((n, DIM), dtype=np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def build(client, kind, vectors, batch=1024):
+    name = PREFIX + kind
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=DIM, distance=Distance.COSINE, on_disk=kind != "none"),
+        quantization_config=quantization_config(kind),
+    )
+    for offset in range(0, len(vectors), batch):
+        chunk = vectors[offset:offset + batch]
+        client.upsert(name, points=Batch(ids=list(range(offset, offset + len(chunk))), vectors=chunk.tolist()))
+    while client.get_collection(name).status != "green":  # HNSW + quantized index built
+        time.sleep(1)
+    return name
+
+
+def run(client, name, queries, k, params):
+    ids, times = [], []
+    for q in queries:
+        start = time.perf_counter()
+        hits = client.search(collection_name=name, query_vector=q.tolist(), limit=k, search_params=params)
+        times.append((time.perf_counter() - start) * 1000)
+        ids.append([h.id for h in hits])
+    times.sort()
+    return ids, {"p50_ms": round(times[len(times) // 2], 2), "p95_ms": round(times[int(len(times) * 0.95)], 2)}
+
+
+def recall(found, truth):
+    return round(float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth) if t])), 4)
+
+
+def vector_ram_mb(kind, n):
+    bytes_per_vector = {"none": DIM * 4, "scalar": DIM, "binary": DIM // 8}[kind]
+    return round(n * bytes_per_vector / (1 << 20), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL", "http://localhost:6333"))
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--source", choices=["random", "dataset"], default="random")
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    parser.add_argument("--keep", action="store_true", help="leave the benchmark collections in place")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    client = QdrantClient(url=args.url, api_key=os.getenv("QDRANT_API_KEY"), timeout=300)
+    vectors = dataset_vectors(args.points + args.queries) if args.source == "dataset" \
+        else random_vectors(args.points + args.queries, rng)
+    vectors, queries = vectors[:args.points], vectors[args.points:]
+
+    names = {}
+    for kind in KINDS:
+        start = time.perf_counter()
+        names[kind] = build(client, kind, vectors)
+        print(f"built {kind} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    report = {"points": len(vectors), "queries": len(queries), "source": args.source, "results": []}
+    for k in args.k:
+        truth, exact_latency = run(client, names["none"], queries, k, search_params(exact=True, kind="none"))
+        report["results"].append({"k": k, "kind": "exact", "recall": 1.0, **exact_latency,
+                                  "vector_ram_mb": vector_ram_mb("none", len(vectors))})
+        found, latency = run(client, names["none"], queries, k, search_params(hnsw_ef=64, kind="none"))
+        report["results"].append({"k": k, "kind": "none", "recall": recall(found, truth), **latency,
+                                  "vector_ram_mb": vector_ram_mb("none", len(vectors))})
+        for kind in ("scalar", "binary"):
+            for rescore in (False, True):
+                for oversampling in args.oversampling:
+                    params = search_params(hnsw_ef=64, rescore=rescore, oversampling=oversampling, kind=kind)
+                    found, latency = run(client, names[kind], queries, k, params)
+                    report["results"].append({
+                        "k": k, "kind": kind, "rescore": rescore, "oversampling": oversampling,
+                        "recall": recall(found, truth), **latency,
+                        "vector_ram_mb": vector_ram_mb(kind, len(vectors)),
+                    })
+
+    if not args.keep:
+        for name in names.values():
+            client.delete_collection(name)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
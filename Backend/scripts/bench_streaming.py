@@ -0,0 +1,162 @@
+# backend/scripts/bench_streaming.py
+"""
+Streaming harness: /api/medical/ask vs /api/medical/ask/stream against a
+fake streaming LLM (utils/llm_providers.FakeProvider, no network, no keys).
+
+    python scripts/bench_streaming.py --requests 10 --latency-ms 800 --token-ms 25
+    python scripts/bench_streaming.py --router chat   # /api/chat/ask/ (needs the chat router's config)
+
+The app runs in-process on uvicorn with an in-memory Qdrant seeded with a
+few medical passages.  For every request the client records time to first
+byte, time to the first answer token and total time; the streamed events
+are checked for order (sources → token… → suggestions → done) and the
+tokens must reassemble to the blocking endpoint's answer.  The answer cache is
+disabled so every request reaches the LLM.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SEED = [
+    "Patient presented with fever and productive cough for five days. Chest xray showed right lower lobe "
+    "consolidation; diagnosis community-acquired pneumonia, treatment with amoxicillin.",
+    "Blood test report: HbA1c 8.2%, fasting glucose 160 mg/dL. Diagnosis type 2 diabetes; medication "
+    "metformin, follow-up at the clinic in three months.",
+    "MRI scan of the lumbar spine shows L4-L5 disc herniation. Symptom: radiating leg pain. Treatment: "
+    "physiotherapy, NSAIDs, doctor review if weakness develops.",
+]
+QUESTIONS = ["What was the pneumonia treatment?", "Which medication was prescribed for diabetes?",
+             "What did the MRI show?"]
+
+
+def configure(args):
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_TOKEN_MS"] = str(args.token_ms)
+    os.environ.setdefault("QDRANT_MODE", "memory")
+    os.environ["ANSWER_CACHE_THRESHOLD"] = "1.01"  # never hit
+
+
+def build_app(router_name):
+    from fastapi import FastAPI
+    from utils.qdrant_connection import CLIENT, COLLECTION_NAME
+    from utils.indexing import index_chunks
+
+    if router_name == "chat":
+        from routes.chat import router
+        from models.semantic_memory import ORIGIN
+        payload = {"file": "seed.txt", "type": "TXT", "origin": ORIGIN}
+    else:
+        from routes.medical import router, ORIGIN
+        payload = {"file": "seed.txt", "origin": ORIGIN}
+    index_chunks(CLIENT, COLLECTION_NAME, SEED, [dict(payload, text=t) for t in SEED])
+
+    app = FastAPI()
+    app.include_router(router, prefix=f"/api/{router_name}")
+    return app
+
+
+def serve(app, port):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def sse_events(lines):
+    event = None
+    async for line in lines:
+        if line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[5:])
+
+
+async def blocking(client, url, question):
+    start = time.perf_counter()
+    r = await client.post(url, json={"question": question})
+    r.raise_for_status()
+    total = time.perf_counter() - start
+    return {"ttfb": total, "first_token": total, "total": total, "answer": r.json()["answer"]}
+
+
+async def streaming(client, url, question):
+    start = time.perf_counter()
+    ttfb = first_token = None
+    events, tokens = [], []
+    async with client.stream("POST", url, json={"question": question}) as r:
+        r.raise_for_status()
+
+        async def lines():
+            nonlocal ttfb
+            async for line in r.aiter_lines():
+                ttfb = ttfb or time.perf_counter() - start
+                yield line
+
+        async for event, data in sse_events(lines()):
+            events.append(event)
+            if event == "token":
+                first_token = first_token or time.perf_counter() - start
+                tokens.append(data["text"])
+    order = [e for i, e in enumerate(events) if i == 0 or e != events[i - 1]]
+    assert order == ["sources", "token", "suggestions", "done"], f"unexpected event order {order}"
+    return {"ttfb": ttfb, "first_token": first_token, "total": time.perf_counter() - start,
+            "answer": "".join(tokens)}
+
+
+def summary(rows):
+    out = {}
+    for key in ("ttfb", "first_token", "total"):
+        values = sorted(r[key] * 1000 for r in rows)
+        out[f"{key}_p50_ms"] = round(statistics.median(values), 1)
+        out[f"{key}_max_ms"] = round(values[-1], 1)
+    return out
+
+
+async def run(port, router_name, n):
+    import httpx
+
+    base = f"http://127.0.0.1:{port}/api/{router_name}"
+    ask_url = f"{base}/ask/" if router_name == "chat" else f"{base}/ask"
+    results = {"blocking": [], "streaming": []}
+    async with httpx.AsyncClient(timeout=60) as client:
+        for i in range(n):
+            q = QUESTIONS[i % len(QUESTIONS)] + f" (run {i})"
+            results["blocking"].append(await blocking(client, ask_url, q))
+            results["streaming"].append(await streaming(client, f"{base}/ask/stream", q))
+    # same prompt → same fake answer, so streamed tokens must reassemble to the blocking answer
+    same = all(a["answer"] == b["answer"].strip() for a, b in zip(results["blocking"], results["streaming"]))
+    return {mode: summary(rows) for mode, rows in results.items()}, same
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--token-ms", type=float, default=25)
+    parser.add_argument("--router", choices=["medical", "chat"], default="medical")
+    parser.add_argument("--port", type=int, default=8901)
+    args = parser.parse_args()
+
+    configure(args)
+    server = serve(build_app(args.router), args.port)
+    try:
+        report, same = asyncio.run(run(args.port, args.router, args.requests))
+    finally:
+        server.should_exit = True
+    report.update(router=args.router, requests=args.requests, llm_latency_ms=args.latency_ms,
+                  token_ms=args.token_ms, answers_match=same)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
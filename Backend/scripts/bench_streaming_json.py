@@ -0,0 +1,105 @@
+# backend/scripts/bench_streaming_json.py
+"""
+Benchmark the dataset reader: peak RSS and time-to-first-entry on a large
+synthetic file, old json.load() reader vs utils.json_stream.
+
+    python scripts/bench_streaming_json.py --size-gb 2 --format json
+    python scripts/bench_streaming_json.py --size-gb 2 --format jsonl --gzip --skip-legacy
+
+Each reader runs in its own subprocess so ru_maxrss is not polluted.
+"""
+import argparse
+import gzip
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENTRY = {
+    "Question": "A 45-year-old presents with chest pain radiating to the left arm. " * 4,
+    "Complex_Cot": "Considering the risk factors and ECG findings, the differential includes " * 20,
+    "Response": "The most likely diagnosis is acute coronary syndrome; obtain troponins. " * 6,
+}
+
+
+def generate(path, size_bytes, fmt, compress):
+    opener = gzip.open if compress else open
+    written, i = 0, 0
+    with opener(path, "wt", encoding="utf-8") as f:
+        if fmt == "json":
+            f.write("[\n")
+        while written < size_bytes:
+            line = json.dumps(dict(ENTRY, id=i))
+            sep = ",\n" if fmt == "json" else "\n"
+            f.write((sep if (fmt == "json" and i) else "") + line + ("" if fmt == "json" else sep))
+            written += len(line) + 2
+            i += 1
+        if fmt == "json":
+            f.write("\n]\n")
+    return i
+
+
+def legacy_reader(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    yield from data
+
+
+def run_reader(name, path):
+    if name == "legacy":
+        entries = legacy_reader(path)
+    else:
+        from utils.json_stream import streaming_json
+        entries = streaming_json(path)
+
+    start = time.perf_counter()
+    first, count = None, 0
+    for _ in entries:
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    total = time.perf_counter() - start
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"reader": name, "entries": count, "time_to_first_entry_s": round(first or 0, 4),
+                      "total_s": round(total, 2), "entries_per_s": round(count / total, 1),
+                      "peak_rss_mb": round(rss_mb, 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-gb", type=float, default=2.0)
+    parser.add_argument("--format", choices=["json", "jsonl"], default="json")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--skip-legacy", action="store_true", help="json.load needs several × file size in RAM")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic file")
+    parser.add_argument("--run", nargs=2, metavar=("READER", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_reader(*args.run)
+        return
+
+    suffix = "." + args.format + (".gz" if args.gzip else "")
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        print(f"Generating {args.size_gb} GB synthetic {suffix} file → {path}")
+        n = generate(path, int(args.size_gb * (1 << 30)), args.format, args.gzip)
+        print(f"{n:,} entries, {os.path.getsize(path) / (1 << 20):,.0f} MB on disk")
+
+        readers = ["streaming"] if args.skip_legacy or args.format == "jsonl" else ["streaming", "legacy"]
+        for name in readers:
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--run", name, path], check=False)
+    finally:
+        if not args.keep:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# backend/scripts/bench_vector_store.py
+"""
+Vector store benchmark: RSS and search latency per QDRANT_MODE.
+
+    python scripts/bench_vector_store.py --points 1000000 --modes memory local
+    QDRANT_URL=http://localhost:6333 python scripts/bench_vector_store.py --modes memory remote
+
+Each mode runs in its own subprocess so RSS numbers don't bleed into each
+other.  Vectors are random unit vectors (no embedding model needed); the
+payload mimics an uploaded chunk.  `local` is measured twice: right after
+loading and after reopening the directory (restart cost, no re-embedding).
+
+Note: qdrant-client's embedded local mode keeps vectors in RAM and persists
+to disk; memory-mapped segments (on_disk vectors/payloads) need the Qdrant
+server, i.e. QDRANT_MODE=remote.  For the server, RSS of this process only
+covers the client, so the server's own memory is reported from its telemetry.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIM = 384
+COLLECTION = "bench_vector_store"
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_client(mode, path):
+    from qdrant_client import QdrantClient
+    if mode == "memory":
+        return QdrantClient(":memory:")
+    if mode == "local":
+        return QdrantClient(path=path)
+    return QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"), timeout=300)
+
+
+def search_latency(client, queries, limit=5):
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        client.search(collection_name=COLLECTION, query_vector=q.tolist(), limit=limit)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {"p50_ms": round(times[len(times) // 2], 2), "p95_ms": round(times[int(len(times) * 0.95)], 2)}
+
+
+def run_mode(mode, points, batch, queries, path):
+    import numpy as np
+    from qdrant_client.models import Batch, Distance, VectorParams
+
+    rng = np.random.default_rng(0)
+    base_rss = rss_mb()
+    client = make_client(mode, path)
+    try:
+        client.delete_collection(COLLECTION)
+    except Exception:
+        pass
+    client.create_collection(
+        collection_name=COLLECTION,
+        vectors_config=VectorParams(size=DIM, distance=Distance.COSINE, on_disk=mode == "remote"),
+        on_disk_payload=mode == "remote",
+    )
+
+    start = time.perf_counter()
+    for offset in range(0, points, batch):
+        n = min(batch, points - offset)
+        vecs = rng.standard_normal((n, DIM), dtype=np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        client.upsert(COLLECTION, points=Batch(
+            ids=list(range(offset, offset + n)),
+            vectors=vecs.tolist(),
+            payloads=[{"text": f"chunk {offset + i} " + "lorem ipsum " * 40, "file": "bench.pdf",
+                       "origin": "system"} for i in range(n)],
+        ), wait=True)
+    load_s = time.perf_counter() - start
+
+    qs = rng.standard_normal((queries, DIM), dtype=np.float32)
+    result = {
+        "mode": mode,
+        "points": points,
+        "load_s": round(load_s, 1),
+        "rss_mb": round(rss_mb() - base_rss, 1),
+        "search": search_latency(client, qs),
+    }
+
+    if mode == "local":
+        client.close()
+        del client
+        start = time.perf_counter()
+        client = make_client(mode, path)
+        reopen_s = time.perf_counter() - start
+        result["reopen"] = {"open_s": round(reopen_s, 2), "count": client.count(COLLECTION).count,
+                            "search": search_latency(client, qs)}
+    if mode == "remote":
+        try:
+            telemetry = client.http.service_api.telemetry(details_level=1).result
+            result["server_memory"] = getattr(telemetry, "memory", None) and telemetry.memory.dict()
+        except Exception as e:
+            result["server_memory"] = f"unavailable: {e}"
+        client.delete_collection(COLLECTION)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=2048)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--modes", nargs="+", default=["memory", "local"], choices=["memory", "local", "remote"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.points, args.batch, args.queries, args.path)))
+        return
+
+    results = []
+    for mode in args.modes:
+        path = tempfile.mkdtemp(prefix="qdrant_bench_")
+        try:
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--path", path, "--points", str(args.points),
+                 "--batch", str(args.batch), "--queries", str(args.queries)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,11 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from qdrant_client import QdrantClient
+from utils.quantization import QUANTIZATION, apply_quantization
 
 COLLECTION_NAME = "Health_QA_CoT"
 
@@ -27,6 +31,13 @@ def main():
     except Exception as e:
         print("ℹ Already exists or cloud locked index:", e)
 
+    print(f"Quantization: {QUANTIZATION} (set QDRANT_QUANTIZATION=scalar|binary to enable)")
+    try:
+        if apply_quantization(client, COLLECTION_NAME):
+            print("✔ Quantized vectors in RAM, originals moved to disk (index rebuilds in background).")
+    except Exception as e:
+        print("ℹ Could not update quantization:", e)
+
     print("✔ Setup complete.")
 
 if __name__ == "__main__":
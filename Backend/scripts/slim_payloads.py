@@ -0,0 +1,51 @@
+# backend/scripts/slim_payloads.py
+"""
+One-off migration: move question / response / complex_cot out of existing
+Health_QA_CoT chunk payloads into the record store.
+
+    python qdrant.py                  # (re)writes full, untruncated records for every entry
+    python scripts/slim_payloads.py   # then strips the fields from the points
+
+Records already present are kept (INSERT OR IGNORE), so running qdrant.py
+first means the store holds the full text rather than the truncated payload
+copies.  Safe to re-run; points without the fields are skipped.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from qdrant_client import QdrantClient
+from utils.record_store import RECORD_FIELDS, RecordStore
+
+COLLECTION_NAME = "Health_QA_CoT"
+
+
+def main():
+    client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"), timeout=120)
+    records = RecordStore()
+    offset, scanned, slimmed = None, 0, 0
+    while True:
+        points, offset = client.scroll(collection_name=COLLECTION_NAME, limit=512, offset=offset,
+                                       with_payload=["entry_hash", *RECORD_FIELDS], with_vectors=False)
+        scanned += len(points)
+        fat = [p for p in points if p.payload and p.payload.get("entry_hash")
+               and any(f in p.payload for f in RECORD_FIELDS)]
+        if fat:
+            records.put_many((p.payload["entry_hash"], {f: p.payload.get(f, "") for f in RECORD_FIELDS})
+                             for p in fat)
+            client.delete_payload(collection_name=COLLECTION_NAME, keys=list(RECORD_FIELDS),
+                                  points=[p.id for p in fat])
+            slimmed += len(fat)
+        print(f"\rscanned {scanned:,} points, slimmed {slimmed:,}", end="", flush=True)
+        if offset is None:
+            break
+    print(f"\n✔ Done. Record store holds {records.count():,} entries.")
+    records.close()
+
+
+if __name__ == "__main__":
+    main()
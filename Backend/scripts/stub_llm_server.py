@@ -0,0 +1,136 @@
+# backend/scripts/stub_llm_server.py
+"""
+Local stub for the Perplexity and Gemini REST APIs with simulated latency,
+including their server-sent-events streaming variants.
+
+    python scripts/stub_llm_server.py --port 8900 --latency-ms 800
+    export PERPLEXITY_BASE_URL=http://127.0.0.1:8900
+    export GEMINI_BASE_URL=http://127.0.0.1:8900
+
+    python scripts/stub_llm_server.py --selftest   # start, hit both providers concurrently, exit
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from utils.llm_providers import fake_reply
+
+LATENCY_S = float(os.getenv("STUB_LATENCY_MS", "500")) / 1000.0
+TOKEN_S = float(os.getenv("STUB_TOKEN_MS", "20")) / 1000.0
+
+app = FastAPI(title="Stub LLM providers")
+app.state.calls = 0
+
+
+_reply = fake_reply
+
+
+def _sse(events):
+    """Stream `events` (JSON-able dicts) as server-sent events, one word per event."""
+    async def gen():
+        await asyncio.sleep(LATENCY_S)
+        for event in events:
+            yield f"data: {json.dumps(event)}\n\n"
+            await asyncio.sleep(TOKEN_S)
+    return StreamingResponse(gen(), media_type="text/event-stream")
+
+
+def _words(text):
+    words = text.split(" ")
+    return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+
+@app.post("/chat/completions")
+async def perplexity(request: Request):
+    body = await request.json()
+    app.state.calls += 1
+    prompt = body["messages"][-1]["content"]
+    if body.get("stream"):
+        events = [{"choices": [{"delta": {"content": w}}]} for w in _words(_reply(prompt))]
+        return _sse(events + [{"choices": [{"delta": {}, "finish_reason": "stop"}]}])
+    await asyncio.sleep(LATENCY_S)
+    return {"choices": [{"message": {"role": "assistant", "content": _reply(prompt)}}]}
+
+
+def _gemini_prompt(body):
+    return "\n".join(p.get("text", "") for c in body["contents"] for p in c["parts"])
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def gemini(model: str, request: Request):
+    body = await request.json()
+    app.state.calls += 1
+    await asyncio.sleep(LATENCY_S)
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": _reply(_gemini_prompt(body))}]}}]}
+
+
+@app.post("/v1beta/models/{model}:streamGenerateContent")
+async def gemini_stream(model: str, request: Request):
+    body = await request.json()
+    app.state.calls += 1
+    events = [{"candidates": [{"content": {"role": "model", "parts": [{"text": w}]}}]}
+              for w in _words(_reply(_gemini_prompt(body)))]
+    return _sse(events + [{"usageMetadata": {"totalTokenCount": len(events)}}])
+
+
+def selftest(port: int):
+    os.environ["PERPLEXITY_BASE_URL"] = os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{port}"
+    from utils.llm_providers import PerplexityProvider, GeminiProvider
+
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    async def run():
+        providers = [PerplexityProvider(base_url=os.environ["PERPLEXITY_BASE_URL"]),
+                     GeminiProvider(base_url=os.environ["GEMINI_BASE_URL"])]
+        start = time.perf_counter()
+        answers = await asyncio.gather(*(p.generate(f"follow-up for call {i}")
+                                         for i in range(5) for p in providers))
+        elapsed = time.perf_counter() - start
+
+        streamed = []
+        for p in providers:
+            start = time.perf_counter()
+            first, parts = None, []
+            async for delta in p.stream("stream test"):
+                first = first or time.perf_counter() - start
+                parts.append(delta)
+            streamed.append((p.name, first, "".join(parts)))
+        for p in providers:
+            await p.aclose()
+        return answers, elapsed, streamed
+
+    answers, elapsed, streamed = asyncio.run(run())
+    server.should_exit = True
+    print(f"{len(answers)} concurrent calls in {elapsed:.2f}s (per-call latency {LATENCY_S:.2f}s)")
+    assert elapsed < LATENCY_S * 3, "provider calls were not concurrent"
+    for name, first, text in streamed:
+        print(f"{name} stream: first token after {first:.2f}s, {len(text)} chars")
+        assert text == _reply("stream test"), f"{name} stream reassembled incorrectly"
+    print("✔ stub selftest passed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=None)
+    parser.add_argument("--selftest", action="store_true")
+    args = parser.parse_args()
+    if args.latency_ms is not None:
+        LATENCY_S = args.latency_ms / 1000.0
+    if args.selftest:
+        selftest(args.port)
+    else:
+        uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -0,0 +1,51 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QDRANT_MODE", "memory")  # utils.qdrant_connection opens a store on import
+
+DIM = 4
+
+
+class FakeEmbeddingService:
+    """Deterministic stand-in for the fastembed service; records what it was asked to embed."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_bulk(self, texts):
+        texts = list(texts)
+        self.calls.append(texts)
+        return [[float(len(t)), 1.0, 0.0, 0.0] for t in texts]
+
+
+# tests never load the ONNX model: modules that grab the shared service at import get this one
+import utils.embedding_service  # noqa: E402
+utils.embedding_service._SERVICE = FakeEmbeddingService()
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    import utils.indexing
+    service = FakeEmbeddingService()
+    monkeypatch.setattr(utils.indexing, "get_embedding_service", lambda: service)
+    return service
+
+
+@pytest.fixture
+def client():
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Distance, VectorParams
+    c = QdrantClient(":memory:")
+    c.create_collection("docs", vectors_config=VectorParams(size=DIM, distance=Distance.COSINE))
+    return c
+
+
+@pytest.fixture
+def heuristic_tokens(monkeypatch):
+    """Count tokens with the word heuristic instead of loading the embedding model's tokenizer."""
+    import utils.chunking
+    monkeypatch.setattr(utils.chunking, "get_tokenizer", lambda: None)
@@ -0,0 +1,30 @@
+# backend/tests/test_answer_cache.py
+from qdrant_client import QdrantClient
+
+from utils.answer_cache import SemanticAnswerCache
+
+VEC = [0.1, 0.2, 0.3, 0.4]
+
+
+def test_invalidate_one_endpoint_without_rescan(monkeypatch):
+    cache = SemanticAnswerCache(QdrantClient(":memory:"), dim=4)
+    cache.store("chat.ask", "q", VEC, "s", {"answer": "chat"})
+    cache.store("medical.ask", "q", VEC, "s", {"answer": "medical"})
+
+    def no_scroll(*args, **kwargs):
+        raise AssertionError("invalidate must not rescan the collection")
+    monkeypatch.setattr(cache.client, "scroll", no_scroll)
+    cache.invalidate("chat.ask")
+
+    assert cache.lookup("chat.ask", VEC, "s") is None
+    assert cache.lookup("medical.ask", VEC, "s") == {"answer": "medical"}
+    assert cache.stats()["entries"] == 1
+
+
+def test_order_rebuilt_on_restart():
+    client = QdrantClient(":memory:")
+    SemanticAnswerCache(client, dim=4).store("chat.ask", "q", VEC, "s", {"answer": "a"})
+    cache = SemanticAnswerCache(client, dim=4)
+    assert cache.stats()["entries"] == 1
+    cache.invalidate("chat.ask")
+    assert cache.stats()["entries"] == 0
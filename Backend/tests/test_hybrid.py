@@ -0,0 +1,23 @@
+# backend/tests/test_hybrid.py
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, SparseVector, SparseVectorParams, VectorParams
+
+from utils import hybrid
+
+
+def test_local_hybrid_search():
+    # local-mode sparse scoring in qdrant-client 1.7.3 uses np.NINF, removed in numpy 2 (requirements pin numpy<2)
+    client = QdrantClient(":memory:")
+    client.create_collection("docs", vectors_config={hybrid.DENSE: VectorParams(size=2, distance=Distance.COSINE)},
+                             sparse_vectors_config={hybrid.SPARSE: SparseVectorParams()})
+    client.upsert("docs", points=[
+        PointStruct(id=1, vector={hybrid.DENSE: [1.0, 0.0], hybrid.SPARSE: SparseVector(indices=[7], values=[1.0])},
+                    payload={"text": "metformin"}),
+        PointStruct(id=2, vector={hybrid.DENSE: [0.0, 1.0], hybrid.SPARSE: SparseVector(indices=[3], values=[1.0])},
+                    payload={"text": "aspirin"}),
+    ])
+
+    hits = hybrid.search(client, "docs", [0.0, 1.0], limit=2, query_text="metformin",
+                         sparse_vector=SparseVector(indices=[7], values=[1.0]))
+
+    assert {h.id for h in hits} == {1, 2}
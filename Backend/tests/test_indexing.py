@@ -0,0 +1,30 @@
+# backend/tests/test_indexing.py
+from utils.indexing import embed_chunks, index_chunks
+
+
+def test_embed_chunks_reuses_known_vectors(embedder):
+    chunks = ["alpha", "beta beta", "gamma"]
+    known = {0: [9.0, 9.0, 9.0, 9.0], 2: [7.0, 7.0, 7.0, 7.0]}
+    timings = {}
+
+    vectors = embed_chunks(chunks, timings, known)
+
+    assert embedder.calls == [["beta beta"]]
+    assert vectors == [known[0], [9.0, 1.0, 0.0, 0.0], known[2]]
+    assert "embed_ms" in timings
+
+
+def test_embed_chunks_without_known(embedder):
+    assert embed_chunks(["a", "bb"]) == [[1.0, 1.0, 0.0, 0.0], [2.0, 1.0, 0.0, 0.0]]
+
+
+def test_index_chunks_with_gate_vectors(embedder, client):
+    # the medical upload path: the gate embedded a sample, indexing embeds the rest
+    chunks = ["patient admitted", "blood pressure 120/80", "discharged home"]
+    payloads = [{"text": c, "file": "note.pdf"} for c in chunks]
+
+    n = index_chunks(client, "docs", chunks, payloads, known={1: [0.0, 0.0, 1.0, 0.0]})
+
+    assert n == 3
+    assert embedder.calls == [["patient admitted", "discharged home"]]
+    assert client.count("docs", exact=True).count == 3
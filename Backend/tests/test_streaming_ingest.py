@@ -0,0 +1,61 @@
+# backend/tests/test_streaming_ingest.py
+import pytest
+from qdrant_client.models import FieldCondition, Filter, MatchValue
+
+from utils.documents import ChunkIds, DocumentRegistry
+from utils.streaming_ingest import stream_index
+
+V1 = ["Patient one reports a mild cough today.", "Blood pressure was normal on arrival.",
+      "No allergies are recorded in the chart.", "Follow up in the clinic in two weeks."]
+V2 = ["Patient one reports a mild cough today.", "Blood pressure was high on arrival.",
+      "Penicillin allergy recorded in the chart.", "Follow up in the clinic in one week."]
+
+
+def index(client, sentences, file_hash, fail_at=None):
+    calls = []
+
+    def payload(chunk):
+        calls.append(chunk)
+        if len(calls) == fail_at:
+            raise RuntimeError("upsert failed")
+        return {"text": chunk, "file": "note.txt", "origin": "test", "file_hash": file_hash}
+
+    return stream_index(client, "docs", ["\n\n".join(sentences)], payload, max_tokens=10, overlap=0,
+                        window=1, make_id=ChunkIds("test", "note.txt", file_hash))
+
+
+def count(client, file_hash=None):
+    must = [FieldCondition(key="file", match=MatchValue(value="note.txt"))]
+    if file_hash:
+        must.append(FieldCondition(key="file_hash", match=MatchValue(value=file_hash)))
+    return client.count("docs", count_filter=Filter(must=must), exact=True).count
+
+
+@pytest.mark.usefixtures("embedder", "heuristic_tokens")
+def test_failed_reupload_keeps_previous_version(client):
+    n = index(client, V1, "h1")[0]["chunks"]
+    assert n > 3
+
+    with pytest.raises(RuntimeError):
+        index(client, V2, "h2", fail_at=3)
+
+    assert count(client, "h1") == n
+    assert count(client, "h2") == 0
+    assert count(client) == n
+
+
+@pytest.mark.usefixtures("embedder", "heuristic_tokens")
+def test_failed_identical_upload_keeps_existing_points(client):
+    n = index(client, V1, "h1")[0]["chunks"]
+
+    with pytest.raises(RuntimeError):
+        index(client, V1, "h1", fail_at=3)
+
+    assert count(client, "h1") == n
+
+
+def test_registry_forget():
+    registry = DocumentRegistry(":memory:")
+    registry.put("test", "note.txt", "h1", 4, {"summary": "s"})
+    registry.forget("test", "note.txt")
+    assert registry.find("test", "note.txt", "h1") is None
@@ -0,0 +1,30 @@
+# backend/tests/test_triage.py
+import pytest
+
+from utils.triage import red_flag
+
+
+@pytest.mark.parametrize("text", [
+    "crushing chest pain since an hour",
+    "no fever but crushing chest pain",
+    "no cough, struggling to breathe",
+    "I was not eating, then vomiting blood",
+    "I can't breathe",
+    "I think I'm having a stroke",
+    "had a seizure this morning",
+])
+def test_red_flag(text):
+    assert red_flag(text)
+
+
+@pytest.mark.parametrize("text", [
+    "no chest pain",
+    "denies any seizures",
+    "history of seizures",
+    "my grandfather had a stroke last year",
+    "seizure-free for 5 years",
+    "I don't have crushing chest pain",
+    "I can't breathe through my nose",
+])
+def test_no_red_flag(text):
+    assert red_flag(text) is None
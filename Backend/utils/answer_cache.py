@@ -0,0 +1,158 @@
+# backend/utils/answer_cache.py
+"""
+Semantic answer cache for the ask endpoints.
+
+Answered questions are stored as vectors in a small dedicated collection.
+A new question is served from the cache (no LLM call) when
+  * its embedding is within ANSWER_CACHE_THRESHOLD cosine of a cached one,
+  * it retrieved exactly the same source points, and
+  * the cached entry is younger than ANSWER_CACHE_TTL.
+The collection is capped at ANSWER_CACHE_MAX entries (oldest evicted first)
+and is invalidated per endpoint on upload / clear.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, PointIdsList, FilterSelector
+)
+
+from utils.metrics import CACHE_REQUESTS, timed
+from utils.qdrant_connection import CLIENT, DIM, collection_exists
+
+ANSWER_CACHE_COLLECTION = "answer_cache"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX = int(os.getenv("ANSWER_CACHE_MAX", "2000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+
+
+def sources_key(results) -> str:
+    """Order-independent fingerprint of the retrieved point ids."""
+    ids = sorted(str(getattr(p, "id", "")) for p in results or [])
+    return hashlib.sha1("|".join(ids).encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    def __init__(self, client, collection: str = ANSWER_CACHE_COLLECTION, dim: int = DIM,
+                 threshold: float = ANSWER_CACHE_THRESHOLD, max_entries: int = ANSWER_CACHE_MAX,
+                 ttl: float = ANSWER_CACHE_TTL):
+        self.client = client
+        self.collection = collection
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.order = deque()  # (point id, endpoint), oldest first
+        self.metrics = {}
+        self._ensure_collection()
+
+    def _create_collection(self):
+        self.client.create_collection(
+            collection_name=self.collection,
+            vectors_config=VectorParams(size=self.dim, distance=Distance.COSINE),
+        )
+
+    def _ensure_collection(self):
+        if not collection_exists(self.client, self.collection):
+            self._create_collection()
+            return
+        # rebuild eviction order for entries that survived a restart (once, at startup)
+        entries, offset = [], None
+        while True:
+            points, offset = self.client.scroll(collection_name=self.collection, limit=1024, offset=offset,
+                                                with_payload=["created_at", "endpoint"], with_vectors=False)
+            entries += [(p.payload.get("created_at", 0), str(p.id), p.payload.get("endpoint")) for p in points]
+            if offset is None:
+                break
+        self.order.extend((pid, endpoint) for _, pid, endpoint in sorted(entries))
+
+    def _count(self, endpoint: str, outcome: str):
+        with self.lock:
+            counters = self.metrics.setdefault(endpoint, {"hits": 0, "misses": 0})
+            counters[outcome] += 1
+        CACHE_REQUESTS.inc(cache=f"answer:{endpoint}", outcome="hit" if outcome == "hits" else "miss")
+
+    # ---------- lookup / store ----------
+    def lookup(self, endpoint: str, vector, source_key: str):
+        """Return the cached response dict, or None."""
+        with timed("answer_cache"):
+            return self._lookup(endpoint, vector, source_key)
+
+    def _lookup(self, endpoint: str, vector, source_key: str):
+        hits = self.client.search(
+            collection_name=self.collection,
+            query_vector=vector,
+            query_filter=Filter(must=[
+                FieldCondition(key="endpoint", match=MatchValue(value=endpoint)),
+                FieldCondition(key="sources_key", match=MatchValue(value=source_key)),
+            ]),
+            limit=3,
+            score_threshold=self.threshold,
+            with_payload=True,
+        )
+        now = time.time()
+        expired = []
+        for h in hits:
+            if h.payload.get("created_at", 0) + self.ttl > now:
+                self._count(endpoint, "hits")
+                return h.payload.get("response")
+            expired.append(h.id)
+        if expired:
+            self._delete(expired)
+        self._count(endpoint, "misses")
+        return None
+
+    def store(self, endpoint: str, question: str, vector, source_key: str, response: dict):
+        pid = str(uuid.uuid4())
+        self.client.upsert(collection_name=self.collection, points=[PointStruct(
+            id=pid,
+            vector=[float(x) for x in vector],
+            payload={"endpoint": endpoint, "question": question, "sources_key": source_key,
+                     "created_at": time.time(), "response": response},
+        )])
+        with self.lock:
+            self.order.append((pid, endpoint))
+            overflow = [self.order.popleft()[0] for _ in range(max(0, len(self.order) - self.max_entries))]
+        if overflow:
+            self._delete(overflow)
+
+    def _delete(self, ids):
+        self.client.delete(collection_name=self.collection, points_selector=PointIdsList(points=list(ids)))
+        with self.lock:
+            gone = {str(i) for i in ids}
+            self.order = deque(e for e in self.order if e[0] not in gone)
+
+    # ---------- invalidation / metrics ----------
+    def invalidate(self, endpoint: str = None):
+        """Drop cached answers for one endpoint (or all of them); a filtered delete, no rescan."""
+        if endpoint is None:
+            self.client.delete_collection(collection_name=self.collection)
+            self._create_collection()
+            with self.lock:
+                self.order.clear()
+            return
+        self.client.delete(
+            collection_name=self.collection,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="endpoint", match=MatchValue(value=endpoint))
+            ])),
+        )
+        with self.lock:
+            self.order = deque(e for e in self.order if e[1] != endpoint)
+
+    def stats(self):
+        with self.lock:
+            out = {"entries": len(self.order), "max_entries": self.max_entries,
+                   "threshold": self.threshold, "ttl_s": self.ttl}
+            for endpoint, c in self.metrics.items():
+                total = c["hits"] + c["misses"]
+                out[endpoint] = dict(c, hit_rate=round(c["hits"] / total, 4) if total else 0.0)
+        return out
+
+
+ANSWER_CACHE = SemanticAnswerCache(CLIENT)
@@ -0,0 +1,169 @@
+# backend/utils/cache.py
+"""
+Bounded LRU + TTL caches in front of query embedding and vector search.
+
+Two layers:
+  * normalized query text        -> embedding (dense, and sparse for hybrid search)
+  * (client, collection, vector, query text, filter, limit, params) -> search hits
+
+Search entries are tagged with their (client, collection) and a generation
+number, so an upsert or /clear drops just that collection's results and a
+search racing with the invalidation cannot re-insert stale hits.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.embedding_service import get_embedding_service
+from utils import hybrid
+from utils.metrics import CACHE_REQUESTS, timed
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float, name: str = ""):
+        self.name = name  # label in medsage_cache_requests_total
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        value, hit = default, False
+        with self.lock:
+            item = self.data.get(key)
+            if item is not None:
+                expires, cached = item
+                if expires > time.monotonic():
+                    self.data.move_to_end(key)
+                    value, hit = cached, True
+                else:
+                    del self.data[key]
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        CACHE_REQUESTS.inc(cache=self.name, outcome="hit" if hit else "miss")
+        return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def discard_where(self, predicate):
+        with self.lock:
+            for key in [k for k in self.data if predicate(k)]:
+                del self.data[key]
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.data),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+QUERY_EMBEDDINGS = TTLCache(maxsize=int(os.getenv("QUERY_CACHE_SIZE", "4096")),
+                            ttl=float(os.getenv("QUERY_CACHE_TTL", "3600")), name="query_embeddings")
+SPARSE_QUERIES = TTLCache(maxsize=int(os.getenv("QUERY_CACHE_SIZE", "4096")),
+                          ttl=float(os.getenv("QUERY_CACHE_TTL", "3600")), name="sparse_queries")
+SEARCH_RESULTS = TTLCache(maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "1024")),
+                          ttl=float(os.getenv("SEARCH_CACHE_TTL", "300")), name="search_results")
+
+
+def normalize_query(text: str) -> str:
+    # bge-small is uncased, so case and whitespace never change the vector
+    return " ".join(text.lower().split())
+
+
+# ---------- query text -> embedding ----------
+def cached_query_embedding(text: str):
+    key = normalize_query(text)
+    vec = QUERY_EMBEDDINGS.get(key)
+    if vec is None:
+        with timed("embed_query"):
+            vec = get_embedding_service().embed_one(key)
+        QUERY_EMBEDDINGS.set(key, vec)
+    return vec
+
+
+async def acached_query_embedding(text: str):
+    key = normalize_query(text)
+    vec = QUERY_EMBEDDINGS.get(key)
+    if vec is None:
+        with timed("embed_query"):
+            vec = await get_embedding_service().aembed_one(key)
+        QUERY_EMBEDDINGS.set(key, vec)
+    return vec
+
+
+def cached_sparse_query(text: str):
+    key = normalize_query(text)
+    vec = SPARSE_QUERIES.get(key)
+    if vec is None:
+        with timed("sparse_query"):
+            vec = hybrid.sparse_query_vector(key)
+        SPARSE_QUERIES.set(key, vec)
+    return vec
+
+
+# ---------- (collection, vector, filter, limit) -> hits ----------
+_GENERATIONS = {}
+
+
+def _vector_key(vector) -> str:
+    return hashlib.blake2b(np.asarray(vector, dtype=np.float32).tobytes(), digest_size=16).hexdigest()
+
+
+def cached_search(client, collection_name: str, vector, limit: int, query_filter=None, query_text=None,
+                  **search_kwargs):
+    """
+    Vector search with result caching; extra kwargs are passed through and keyed.
+    With `query_text`, hybrid collections use fused dense + sparse search (utils/hybrid.py).
+    """
+    query_text = normalize_query(query_text) if query_text else None
+    key = (id(client), collection_name, _GENERATIONS.get((id(client), collection_name), 0),
+           _vector_key(vector), query_text, repr(query_filter), limit, repr(sorted(search_kwargs.items())))
+    hits = SEARCH_RESULTS.get(key)
+    if hits is None:
+        sparse = None
+        if query_text and hybrid.is_hybrid(client, collection_name):
+            sparse = cached_sparse_query(query_text)
+        with timed("search"):
+            hits = hybrid.search(client, collection_name, vector, limit, query_filter=query_filter,
+                                 query_text=query_text, sparse_vector=sparse, **search_kwargs)
+        SEARCH_RESULTS.set(key, hits)
+    return hits
+
+
+def invalidate_collection(client, collection_name: str):
+    """Drop cached search results for one collection after an upsert/delete/clear."""
+    scope = (id(client), collection_name)
+    _GENERATIONS[scope] = _GENERATIONS.get(scope, 0) + 1
+    SEARCH_RESULTS.discard_where(lambda k: k[0] == id(client) and k[1] == collection_name)
+
+
+def cache_stats():
+    return {
+        "query_embeddings": QUERY_EMBEDDINGS.stats(),
+        "sparse_queries": SPARSE_QUERIES.stats(),
+        "search_results": SEARCH_RESULTS.stats(),
+    }
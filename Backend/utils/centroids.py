@@ -0,0 +1,54 @@
+# backend/utils/centroids.py
+"""
+Prototype-centroid scoring shared by the local classifiers (utils/triage.py,
+utils/medical_gate.py).
+
+Each category of prototype sentences is embedded once (on first use) and
+averaged into a unit centroid.  A vector's margin is its best cosine to a
+positive centroid minus its best cosine to a negative one, so > 0 leans
+positive.
+"""
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+
+def unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    n = np.linalg.norm(v, axis=-1, keepdims=True)
+    return np.divide(v, n, out=np.zeros_like(v), where=n > 0)
+
+
+class Centroids:
+    def __init__(self, positive: Dict[str, List[str]], negative: Dict[str, List[str]], embed=None):
+        self.groups = {"positive": positive, "negative": negative}
+        self.embed = embed
+        self.lock = threading.Lock()
+        self.matrices = None
+
+    def _build(self):
+        embed = self.embed
+        if embed is None:
+            from utils.embedding_service import get_embedding_service
+            embed = get_embedding_service().embed
+        return {
+            group: np.stack([unit(unit(np.array(list(embed(sentences)))).mean(axis=0))
+                             for sentences in categories.values()])
+            for group, categories in self.groups.items()
+        }
+
+    def _matrices(self):
+        with self.lock:
+            if self.matrices is None:
+                self.matrices = self._build()
+            return self.matrices
+
+    def margins(self, vectors) -> np.ndarray:
+        """Margin per row of `vectors` (n x dim)."""
+        m = self._matrices()
+        q = unit(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        return (q @ m["positive"].T).max(axis=1) - (q @ m["negative"].T).max(axis=1)
+
+    def margin(self, vector) -> float:
+        return float(self.margins([vector])[0])
@@ -0,0 +1,197 @@
+# backend/utils/chunking.py
+"""
+Token-aware chunking shared by every ingestion path.
+
+Chunks are packed from whole sentences until CHUNK_MAX_TOKENS (counted with
+the embedding model's own tokenizer) would be exceeded, so nothing is
+silently truncated by bge-small's 512-token window.  Section breaks (blank
+lines, markdown headings) close a chunk once it holds CHUNK_MIN_TOKENS, and
+consecutive chunks share up to CHUNK_OVERLAP_TOKENS of trailing sentences.
+A sentence longer than the budget is cut on token boundaries.
+
+Input is a stream of text pieces (pages, slides, blocks); every sentence is
+tokenized once, so the work is linear in the input and memory is bounded by
+one chunk plus one piece.  Without a tokenizer (model not loaded yet) token
+counts fall back to a word/punctuation heuristic that over-estimates.
+"""
+import os
+import re
+import threading
+from typing import Iterable, Iterator, List
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "500"))       # bge-small: 512 incl. [CLS]/[SEP]
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "128"))       # don't close tiny chunks at section breaks
+MAX_PENDING_CHARS = 20000                                          # force a cut in text without sentence ends
+CHUNKER_ID = f"tok{CHUNK_MAX_TOKENS}-{CHUNK_OVERLAP_TOKENS}-{CHUNK_MIN_TOKENS}"  # stamped on dataset points
+
+_SECTION = re.compile(r"\n[ \t]*\n\s*|\n(?=#{1,6}\s)")
+_SENTENCE = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+_BOUNDARY = re.compile(f"(?P<section>{_SECTION.pattern})|(?P<sentence>{_SENTENCE.pattern})")
+_HEURISTIC = re.compile(r"\w+|[^\w\s]")
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+# ---------- token counting ----------
+def use_model_tokenizer(model) -> bool:
+    """
+    Count with the tokenizer of a fastembed TextEmbedding.  fastembed's copy
+    truncates and pads, so a private copy without either is kept.
+    """
+    global _tokenizer
+    tok = getattr(getattr(model, "model", None), "tokenizer", None)
+    if tok is None:
+        return False
+    from tokenizers import Tokenizer
+    copy = Tokenizer.from_str(tok.to_str())
+    copy.no_truncation()
+    copy.no_padding()
+    with _tokenizer_lock:
+        _tokenizer = copy
+    return True
+
+
+def get_tokenizer():
+    """The shared embedding model's tokenizer, once that model is loaded."""
+    if _tokenizer is None:
+        try:
+            from utils.embedding_service import get_embedding_service
+            use_model_tokenizer(get_embedding_service().model)
+        except Exception:
+            pass
+    return _tokenizer
+
+
+def _heuristic_count(text: str) -> int:
+    # one token per word or symbol, plus one per 6 chars of long words (wordpiece splits them)
+    return sum(1 + len(w) // 6 for w in _HEURISTIC.findall(text))
+
+
+def count_tokens(texts: List[str]) -> List[int]:
+    tok = get_tokenizer()
+    if tok is None:
+        return [_heuristic_count(t) for t in texts]
+    return [len(e.ids) for e in tok.encode_batch(texts, add_special_tokens=False)]
+
+
+def _split_long(text: str, max_tokens: int) -> List[str]:
+    """Cut one over-long sentence into pieces of at most max_tokens tokens."""
+    tok = get_tokenizer()
+    if tok is None:
+        width = 6 * (max_tokens // 2)
+        words = [w[i:i + width] for w in text.split() for i in range(0, len(w), width)]
+        pieces, current, size = [], [], 0
+        for word, n in zip(words, map(_heuristic_count, words)):
+            if current and size + n > max_tokens:
+                pieces.append(" ".join(current))
+                current, size = [], 0
+            current.append(word)
+            size += n
+        return pieces + [" ".join(current)] if current else pieces
+    step = max(1, max_tokens - 8)  # a cut inside a word can re-tokenize slightly longer
+    offsets = tok.encode(text, add_special_tokens=False).offsets
+    return [text[offsets[i][0]:offsets[min(i + step, len(offsets)) - 1][1]]
+            for i in range(0, len(offsets), step)]
+
+
+# ---------- segmentation ----------
+def _segments(block: str, starts_section: bool):
+    """(sentence, starts_section) pairs of a block of complete text."""
+    for s_idx, section in enumerate(_SECTION.split(block)):
+        first = s_idx > 0 or starts_section
+        for sentence in _SENTENCE.split(section):
+            sentence = " ".join(sentence.split())
+            if sentence:
+                yield sentence, first
+                first = False
+
+
+def iter_segments(pieces: Iterable[str]):
+    """Stream complete sentences out of arbitrarily cut text pieces."""
+    pending, section_next = "", False
+    for piece in pieces:
+        scan_from = max(0, len(pending) - 8)  # the remainder itself holds no boundary
+        pending += piece
+        last = None
+        for m in _BOUNDARY.finditer(pending, scan_from):
+            if m.end() < len(pending):  # a match touching the end may still grow ("\n" + "\n", ".  ")
+                last = m
+        if last is not None:
+            block, pending = pending[:last.start()], pending[last.end():]
+            yield from _segments(block, section_next)
+            section_next = last.group("section") is not None
+        while len(pending) > MAX_PENDING_CHARS:
+            cut = pending.rfind(" ", 0, MAX_PENDING_CHARS) + 1 or MAX_PENDING_CHARS
+            block, pending = pending[:cut], pending[cut:]
+            yield from _segments(block, section_next)
+            section_next = False
+    if pending.strip():
+        yield from _segments(pending, section_next)
+
+
+# ---------- packing ----------
+def iter_chunks(pieces: Iterable[str], max_tokens: int = CHUNK_MAX_TOKENS,
+                overlap: int = CHUNK_OVERLAP_TOKENS, min_tokens: int = CHUNK_MIN_TOKENS) -> Iterator[str]:
+    """Yield token-bounded chunks from a stream of text pieces."""
+    current, size = [], 0   # [(sentence, tokens, starts_section)], total tokens
+    batch = []              # sentences waiting to be tokenized together
+
+    def render(items):
+        return "".join(("\n\n" if sec else " ") + s if i else s for i, (s, _, sec) in enumerate(items))
+
+    def carry_over(items):
+        kept, total = [], 0
+        for item in reversed(items[1:]):  # never carry the whole chunk, or nothing would advance
+            if total + item[1] > overlap:
+                break
+            kept.insert(0, item)
+            total += item[1]
+        return kept, total
+
+    def drain():
+        nonlocal current, size
+        for (sentence, sec), n in zip(batch, count_tokens([s for s, _ in batch])):
+            if n <= max_tokens:
+                parts = [(sentence, n)]
+            else:
+                cut = _split_long(sentence, max_tokens)
+                parts = list(zip(cut, count_tokens(cut)))
+            for part, n_part in parts:
+                if current and sec and size >= min_tokens:
+                    yield render(current)
+                    current, size = [], 0
+                elif current and size + n_part > max_tokens:
+                    yield render(current)
+                    current, size = carry_over(current)
+                    while current and size + n_part > max_tokens:
+                        size -= current.pop(0)[1]
+                current.append((part, n_part, sec))
+                size += n_part
+                sec = False
+        batch.clear()
+
+    for segment in iter_segments(pieces):
+        batch.append(segment)
+        if len(batch) >= 64:
+            yield from drain()
+    yield from drain()
+    if current:
+        yield render(current)
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap: int = CHUNK_OVERLAP_TOKENS,
+               min_tokens: int = CHUNK_MIN_TOKENS) -> List[str]:
+    return list(iter_chunks([text], max_tokens, overlap, min_tokens))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """First `max_tokens` tokens of `text` (cut on a token boundary)."""
+    tok = get_tokenizer()
+    if tok is None:
+        return _split_long(text, max_tokens)[0] if text.strip() else ""
+    offsets = tok.encode(text, add_special_tokens=False).offsets
+    if len(offsets) <= max_tokens:
+        return text
+    return text[:offsets[max_tokens - 1][1]] if max_tokens > 0 else ""
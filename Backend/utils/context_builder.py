@@ -0,0 +1,91 @@
+# backend/utils/context_builder.py
+"""
+Token-budgeted context assembly for LLM prompts.
+
+Retrieved passages are taken in retrieval rank order (the order the search
+returned them: RRF-fused on hybrid collections, whose scores aren't
+comparable with cosine) and packed into a token budget
+(counted with the embedding tokenizer, see utils/chunking.py):
+  * at most `per_group` passages per source (QA entry / uploaded file), so
+    several chunks of one dataset entry don't crowd out other cases
+  * a passage whose word 3-grams are mostly contained in an already picked
+    one is dropped (chunk overlaps, near-identical entries)
+  * the last passage that doesn't fit is trimmed to the remaining budget
+
+Budgets are per prompt and configurable from .env.
+"""
+import os
+import re
+from collections import Counter
+from typing import Callable, List, Optional
+
+from utils.chunking import count_tokens, truncate_to_tokens
+
+CONSULT_CASE_TOKENS = int(os.getenv("CONSULT_CASE_TOKENS", "1200"))      # "Relevant medical cases"
+CONSULT_COT_TOKENS = int(os.getenv("CONSULT_COT_TOKENS", "800"))         # internal reasoning snippets
+ASK_CONTEXT_TOKENS = int(os.getenv("ASK_CONTEXT_TOKENS", "2000"))        # answer prompts
+FALLBACK_CONTEXT_TOKENS = int(os.getenv("FALLBACK_CONTEXT_TOKENS", "750"))  # weak-retrieval prompts
+SUGGEST_CONTEXT_TOKENS = int(os.getenv("SUGGEST_CONTEXT_TOKENS", "1000"))   # follow-up question prompts
+MAX_OVERLAP = float(os.getenv("CONTEXT_MAX_OVERLAP", "0.8"))
+MIN_PASSAGE_TOKENS = 48   # don't bother trimming a passage below this
+
+_WORD = re.compile(r"\w+")
+
+
+def _shingles(text: str):
+    words = _WORD.findall(text.lower())
+    return {tuple(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+
+def _containment(a, b) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def select_passages(passages: List[dict], budget: int, key: Optional[Callable[[dict], object]] = None,
+                    per_group: int = 1, max_overlap: float = MAX_OVERLAP) -> List[dict]:
+    """
+    passages: dicts with at least "text", best first.  Returns copies of the
+    picked ones in input order, with "text" possibly trimmed and "tokens" set.
+    """
+    ordered = [p for p in passages if (p.get("text") or "").strip()]
+    picked, seen, per_source, used = [], [], Counter(), 0
+    for p, n in zip(ordered, count_tokens([p["text"] for p in ordered])):
+        room = budget - used
+        if room < MIN_PASSAGE_TOKENS:
+            break
+        group = key(p) if key else None
+        if group is not None and per_source[group] >= per_group:
+            continue
+        shingles = _shingles(p["text"])
+        if any(_containment(shingles, s) > max_overlap for s in seen):
+            continue
+        text = p["text"]
+        if n > room:
+            text, n = truncate_to_tokens(text, room), room
+        picked.append(dict(p, text=text, tokens=n))
+        seen.append(shingles)
+        per_source[group] += 1
+        used += n
+    return picked
+
+
+def point_passages(results) -> List[dict]:
+    """Qdrant ScoredPoints → passages; chunks of one dataset entry share a source, upload chunks don't."""
+    passages = []
+    for r in results:
+        payload = getattr(r, "payload", None) or {}
+        passages.append({
+            "text": payload.get("text", ""),
+            "score": getattr(r, "score", 0.0) or 0.0,
+            "source": payload.get("entry_hash") or str(r.id),
+        })
+    return passages
+
+
+def build_context(results, budget: int = ASK_CONTEXT_TOKENS, per_source: int = 1,
+                  separator: str = "\n\n") -> str:
+    """Prompt context from search hits: best passages first, per-source cap, within `budget` tokens."""
+    picked = select_passages(point_passages(results), budget, key=lambda p: p["source"], per_group=per_source)
+    return separator.join(p["text"] for p in picked)
@@ -0,0 +1,162 @@
+# backend/utils/documents.py
+"""
+Content-addressed uploads.
+
+Every uploaded file is hashed (SHA-256) before extraction and recorded in a
+small SQLite registry per (origin, filename) together with its chunk count
+and the response fields (summary, suggested questions):
+  * same origin + filename + file hash, and the store still holds points
+    for it → nothing is extracted, embedded or summarized; the stored
+    response is returned.  The same content under another filename is
+    indexed again, since its chunks are tagged (and deleted) by filename
+  * same filename, new content → the new chunks are upserted, then the
+    file's chunks from older versions are removed with a filtered delete
+    (origin + file, file_hash != new) — other documents are untouched
+
+Chunk point ids are uuid5(origin, filename, file hash, chunker, chunk
+SHA-256, occurrence), so re-indexing the same version overwrites instead of
+adding a second copy, even when two identical uploads race, while a new
+version never overwrites the points of the one it replaces (a failed
+re-upload leaves the old version whole).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+from qdrant_client.models import FieldCondition, Filter, FilterSelector, MatchValue
+
+from utils.cache import invalidate_collection
+from utils.chunking import CHUNKER_ID
+
+DOCUMENTS_DB = os.getenv("DOCUMENTS_DB", "./documents.sqlite3")
+CHUNK_NAMESPACE = uuid.UUID("0b6f3d2e-9a41-5c87-b1e4-3f7a2c9d8e16")
+HASH_BLOCK = 1 << 20
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ChunkIds:
+    """Deterministic point ids for one document's chunks, in order (stateful: counts repeats)."""
+
+    def __init__(self, origin: str, filename: str, file_hash: str):
+        self.prefix = f"{origin}:{filename}:{file_hash}:{CHUNKER_ID}"
+        self.seen = Counter()
+
+    def __call__(self, chunk: str) -> str:
+        digest = sha256_bytes(chunk.encode("utf-8"))
+        self.seen[digest] += 1
+        return str(uuid.uuid5(CHUNK_NAMESPACE, f"{self.prefix}:{digest}:{self.seen[digest]}"))
+
+
+def chunk_ids(origin: str, filename: str, file_hash: str, chunks):
+    ids = ChunkIds(origin, filename, file_hash)
+    return [ids(c) for c in chunks]
+
+
+def drop_stale_chunks(client, collection_name: str, origin: str, filename: str, file_hash: str):
+    """Delete this file's chunks left over from other versions (after the new ones are upserted)."""
+    client.delete(collection_name=collection_name, points_selector=FilterSelector(filter=Filter(
+        must=[FieldCondition(key="origin", match=MatchValue(value=origin)),
+              FieldCondition(key="file", match=MatchValue(value=filename))],
+        must_not=[FieldCondition(key="file_hash", match=MatchValue(value=file_hash))],
+    )))
+    invalidate_collection(client, collection_name)
+
+
+def stored_response(doc: dict, filename: str) -> dict:
+    """Upload response for content that is already indexed (nothing was re-processed)."""
+    return dict(doc, status="success", file=filename, deduplicated=True, timings_ms={})
+
+
+def has_points(client, collection_name: str, origin: str, filename: str, file_hash: str) -> bool:
+    """Whether the store still holds chunks of this file version (cheap, approximate count)."""
+    return client.count(collection_name=collection_name, count_filter=Filter(must=[
+        FieldCondition(key="origin", match=MatchValue(value=origin)),
+        FieldCondition(key="file", match=MatchValue(value=filename)),
+        FieldCondition(key="file_hash", match=MatchValue(value=file_hash)),
+    ]), exact=False).count > 0
+
+
+class DocumentRegistry:
+    def __init__(self, path: str = DOCUMENTS_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " origin TEXT NOT NULL, filename TEXT NOT NULL, file_hash TEXT NOT NULL,"
+            " chunks INTEGER NOT NULL, response TEXT NOT NULL, updated_at REAL NOT NULL,"
+            " PRIMARY KEY (origin, filename))"
+        )
+        self.conn.commit()
+
+    def find(self, origin: str, filename: str, file_hash: str) -> Optional[dict]:
+        """Stored upload of this filename with this content, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT chunks, response FROM documents WHERE origin = ? AND filename = ? AND file_hash = ?",
+                (origin, filename, file_hash)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"chunks": row[0], **json.loads(row[1])}
+
+    def find_indexed(self, client, collection_name: str, origin: str, filename: str,
+                     file_hash: str) -> Optional[dict]:
+        """find(), but only if the store still has the points (it may have been cleared or rebuilt)."""
+        doc = self.find(origin, filename, file_hash)
+        if doc is None or not has_points(client, collection_name, origin, filename, file_hash):
+            return None
+        return doc
+
+    def put(self, origin: str, filename: str, file_hash: str, chunks: int, response: dict):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (origin, filename, file_hash, chunks, response, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (origin, filename, file_hash, chunks, json.dumps(response, ensure_ascii=False), time.time())
+            )
+            self.conn.commit()
+
+    def forget(self, origin: str, filename: str):
+        """Drop a file's entry (its upload failed part-way; the next one re-indexes it)."""
+        with self.lock:
+            self.conn.execute("DELETE FROM documents WHERE origin = ? AND filename = ?", (origin, filename))
+            self.conn.commit()
+
+    def clear(self, origin: str) -> int:
+        with self.lock:
+            n = self.conn.execute("DELETE FROM documents WHERE origin = ?", (origin,)).rowcount
+            self.conn.commit()
+        return n
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+_REGISTRY = None
+
+
+def get_document_registry() -> DocumentRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = DocumentRegistry()
+    return _REGISTRY
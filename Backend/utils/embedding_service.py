@@ -0,0 +1,139 @@
+# backend/utils/embedding_service.py
+"""
+Process-wide embedding service.
+
+One fastembed model is loaded once and owned by a dedicated worker thread.
+Callers (sync or async) enqueue texts and get futures back; the worker
+coalesces whatever is queued into micro-batches of up to EMBED_MAX_BATCH
+texts, waiting at most EMBED_MAX_WAIT_MS for a batch to fill.  Async
+handlers await the future, so the event loop is never blocked by ONNX.
+
+Whole-document jobs go through embed_bulk() instead, which runs on a
+separate thread with large batches so uploads don't stall query batches.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Union
+
+from fastembed import TextEmbedding
+
+EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+# bulk (document upload) jobs: bigger ONNX batches, optional fastembed data-parallel workers
+EMBED_BULK_BATCH = int(os.getenv("EMBED_BULK_BATCH", "256"))
+EMBED_BULK_PARALLEL = int(os.getenv("EMBED_BULK_PARALLEL")) if os.getenv("EMBED_BULK_PARALLEL") else None
+
+
+class EmbeddingService:
+    def __init__(self, model_name: str = EMBEDDING_MODEL, max_batch: int = EMBED_MAX_BATCH,
+                 max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.model = TextEmbedding(model_name=model_name)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.texts = 0
+        self.worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+        self.worker.start()
+        self.bulk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-bulk")
+
+    # ---------- public API ----------
+    def submit(self, texts: Union[str, List[str]]) -> List[Future]:
+        if isinstance(texts, str):
+            texts = [texts]
+        futures = []
+        for text in texts:
+            fut = Future()
+            self.requests.put((text, fut))
+            futures.append(fut)
+        return futures
+
+    def embed(self, texts: Union[str, List[str]]):
+        """Blocking: returns one numpy vector per text (drop-in for TextEmbedding.embed)."""
+        return [f.result() for f in self.submit(texts)]
+
+    def embed_one(self, text: str):
+        return self.embed([text])[0]
+
+    async def aembed(self, texts: Union[str, List[str]]):
+        futures = self.submit(texts)
+        return list(await asyncio.gather(*(asyncio.wrap_future(f) for f in futures)))
+
+    async def aembed_one(self, text: str):
+        return (await self.aembed([text]))[0]
+
+    def embed_bulk(self, texts: List[str], batch_size: int = EMBED_BULK_BATCH,
+                   parallel: int = EMBED_BULK_PARALLEL):
+        """Blocking: embed a whole document's chunks in large batches."""
+        return self.bulk_executor.submit(self._embed_bulk, texts, batch_size, parallel).result()
+
+    async def aembed_bulk(self, texts: List[str], batch_size: int = EMBED_BULK_BATCH,
+                          parallel: int = EMBED_BULK_PARALLEL):
+        fut = self.bulk_executor.submit(self._embed_bulk, texts, batch_size, parallel)
+        return await asyncio.wrap_future(fut)
+
+    def _embed_bulk(self, texts, batch_size, parallel):
+        return list(self.model.embed(texts, batch_size=batch_size, parallel=parallel))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "queued": self.requests.qsize(),
+        }
+
+    # ---------- worker ----------
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                # take whatever is already queued, then wait briefly for stragglers
+                batch.append(self.requests.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [(t, f) for t, f in self._collect() if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                vectors = list(self.model.embed([t for t, _ in batch], batch_size=len(batch)))
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(batch)
+            for (_, fut), vec in zip(batch, vectors):
+                fut.set_result(vec)
+
+
+_SERVICE = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the shared service, loading the model on first use."""
+    global _SERVICE
+    if _SERVICE is None:
+        with _SERVICE_LOCK:
+            if _SERVICE is None:
+                _SERVICE = EmbeddingService()
+    return _SERVICE
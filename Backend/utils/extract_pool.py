@@ -0,0 +1,202 @@
+# backend/utils/extract_pool.py
+"""
+CPU-bound document parsing in a process pool.
+
+PyPDF2 / python-docx / python-pptx / pandas hold the GIL, so parsing on the
+request thread stalls every other request on the worker.  Here parsing runs
+in separate processes:
+  * PDFs are spooled to a temp file once and split into page ranges that
+    are extracted in parallel, then reassembled in page order.
+  * Every file gets a wall-clock budget (EXTRACT_TIMEOUT_S); a worker that
+    blows it is killed and the pool is rebuilt.
+  * Workers run under an address-space cap (EXTRACT_MEM_MB) so a malformed
+    document raises MemoryError instead of taking the host down.
+
+This module must stay free of Gemini / FastAPI imports: it is imported by
+freshly spawned worker processes.
+"""
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+from utils.metrics import timed  # stdlib only, safe in workers
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+EXTRACT_TIMEOUT_S = float(os.getenv("EXTRACT_TIMEOUT_S", "120"))
+EXTRACT_MEM_MB = int(os.getenv("EXTRACT_MEM_MB", "2048"))      # 0 disables the cap
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+EXTRACT_START_METHOD = os.getenv("EXTRACT_START_METHOD", "spawn")  # fork is unsafe with ONNX threads
+
+POOL_EXTS = {"pdf", "docx", "pptx", "ppt", "xlsx", "xls", "csv", "txt", "json"}
+
+
+class ExtractionError(RuntimeError):
+    pass
+
+
+# ---------- worker-side parsers ----------
+def _limit_memory(mem_mb):
+    if mem_mb <= 0:
+        return
+    try:
+        import resource
+        cap = mem_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+    except (ImportError, ValueError, OSError):
+        pass  # not supported on this platform
+
+
+def parse_bytes(file_bytes: bytes, ext: str) -> str:
+    """Parse a non-PDF document (also used in-process when the pool is disabled)."""
+    if ext == "pdf":
+        import PyPDF2
+        reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
+        return "\n".join(p.extract_text() or "" for p in reader.pages)
+    if ext == "docx":
+        from docx import Document
+        doc = Document(io.BytesIO(file_bytes))
+        return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
+    if ext in ["pptx", "ppt"]:
+        from pptx import Presentation
+        prs = Presentation(io.BytesIO(file_bytes))
+        text = ""
+        for slide in prs.slides:
+            for shape in slide.shapes:
+                if hasattr(shape, "text"):
+                    text += shape.text + "\n"
+        return text
+    if ext in ["xlsx", "xls"]:
+        import pandas as pd
+        return pd.read_excel(io.BytesIO(file_bytes)).to_string()
+    if ext == "csv":
+        import pandas as pd
+        return pd.read_csv(io.BytesIO(file_bytes)).to_string()
+    if ext == "txt":
+        return file_bytes.decode("utf-8", errors="ignore")
+    if ext == "json":
+        return json.dumps(json.loads(file_bytes.decode("utf-8", errors="ignore")), indent=2)
+    return ""
+
+
+def pdf_page_count(path: str) -> int:
+    import PyPDF2
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def pdf_pages_text(path: str, start: int, end: int) -> str:
+    import PyPDF2
+    reader = PyPDF2.PdfReader(path)
+    return "\n".join((reader.pages[i].extract_text() or "") for i in range(start, end))
+
+
+# ---------- parent-side pool ----------
+class ExtractionPool:
+    def __init__(self, workers: int = EXTRACT_WORKERS, timeout: float = EXTRACT_TIMEOUT_S,
+                 mem_mb: int = EXTRACT_MEM_MB, pages_per_task: int = PDF_PAGES_PER_TASK):
+        self.workers = workers
+        self.timeout = timeout
+        self.mem_mb = mem_mb
+        self.pages_per_task = pages_per_task
+        self.lock = threading.Lock()
+        self._pool = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(EXTRACT_START_METHOD),
+                    initializer=_limit_memory,
+                    initargs=(self.mem_mb,),
+                )
+            return self._pool
+
+    def _reset(self, pool):
+        """Kill a wedged/broken pool so the next call starts fresh workers."""
+        with self.lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        for proc in list(getattr(pool, "_processes", {}).values()):
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _gather(self, pool, futures, deadline):
+        try:
+            return [f.result(timeout=max(0.0, deadline - time.monotonic())) for f in futures]
+        except FutureTimeout:
+            self._reset(pool)
+            raise ExtractionError(f"extraction exceeded {self.timeout:.0f}s")
+        except BrokenProcessPool:
+            self._reset(pool)
+            raise ExtractionError("extraction worker crashed (memory cap or malformed file)")
+        except MemoryError:
+            raise ExtractionError(f"extraction exceeded {self.mem_mb} MB")
+
+    def iter_pdf(self, path: str, window: int = None):
+        """
+        Yield page-range texts of a PDF already on disk, in page order, with
+        at most `window` ranges in flight (streaming uploads).  The timeout
+        applies per range, since the consumer embeds between yields.
+        """
+        pool = self.pool
+        window = window or self.workers
+        n_pages = self._gather(pool, [pool.submit(pdf_page_count, path)], time.monotonic() + self.timeout)[0]
+        step = self.pages_per_task
+        in_flight = []
+        for start in range(0, n_pages, step):
+            in_flight.append(pool.submit(pdf_pages_text, path, start, min(start + step, n_pages)))
+            if len(in_flight) >= window:
+                yield self._gather(pool, [in_flight.pop(0)], time.monotonic() + self.timeout)[0] + "\n"
+        for fut in in_flight:
+            yield self._gather(pool, [fut], time.monotonic() + self.timeout)[0] + "\n"
+
+    def extract(self, file_bytes: bytes, ext: str) -> str:
+        deadline = time.monotonic() + self.timeout
+        pool = self.pool
+        if ext != "pdf":
+            return self._gather(pool, [pool.submit(parse_bytes, file_bytes, ext)], deadline)[0]
+
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(file_bytes)
+            n_pages = self._gather(pool, [pool.submit(pdf_page_count, path)], deadline)[0]
+            step = self.pages_per_task
+            futures = [pool.submit(pdf_pages_text, path, i, min(i + step, n_pages))
+                       for i in range(0, n_pages, step)]
+            return "\n".join(self._gather(pool, futures, deadline))
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_POOL = None
+
+
+def get_extraction_pool() -> ExtractionPool:
+    global _POOL
+    if _POOL is None:
+        _POOL = ExtractionPool()
+    return _POOL
+
+
+def extract_document(file_bytes: bytes, ext: str) -> str:
+    """Parse a document in the process pool (EXTRACT_WORKERS=0 parses in-process)."""
+    ext = ext.lower()
+    with timed("extract"):
+        if EXTRACT_WORKERS <= 0:
+            return parse_bytes(file_bytes, ext)
+        return get_extraction_pool().extract(file_bytes, ext)
@@ -3,65 +3,188 @@ import os
 import tempfile
 import requests
 import google.generativeai as genai
+from typing import AsyncIterator
+from utils.llm_providers import LLM_PROVIDER, LLMError, get_provider
+from utils.llm_scheduler import SCHEDULER, prompt_key
+from utils.metrics import count_llm_call, timed
 
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY", "")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
 
-if not GOOGLE_API_KEY:
-    raise RuntimeError("Set GOOGLE_API_KEY environment variable")
+_GEMINI = None
 
-genai.configure(api_key=GOOGLE_API_KEY)
-GEMINI = genai.GenerativeModel("gemini-2.5-flash")
+def get_gemini():
+    """Gemini SDK model for media calls, configured on first use (importing needs no key)."""
+    global _GEMINI
+    if _GEMINI is None:
+        if not GOOGLE_API_KEY:
+            raise RuntimeError("Set GOOGLE_API_KEY environment variable")
+        genai.configure(api_key=GOOGLE_API_KEY)
+        _GEMINI = genai.GenerativeModel("gemini-2.5-flash")
+    return _GEMINI
+
+def gemini_sdk_text(prompt_and_inputs: list) -> str:
+    """
+    One blocking Gemini SDK call through the LLM scheduler (slots, rate limit,
+    retries; identical text-only prompts in flight are coalesced).  Raises
+    LLMError when Gemini stays unavailable.  With LLM_PROVIDER=fake the text
+    parts go to the fake provider instead (media is ignored).
+    """
+    text_parts = "\n\n".join(p for p in prompt_and_inputs if isinstance(p, str))
+    text_only = all(isinstance(p, str) for p in prompt_and_inputs)
+
+    def call():
+        try:
+            with timed("llm_gemini_sdk"):
+                if LLM_PROVIDER == "fake":
+                    text = get_provider("gemini").generate_sync(text_parts)
+                else:
+                    resp = get_gemini().generate_content(prompt_and_inputs)
+                    text = resp.text.strip() if resp and getattr(resp, "text", None) else ""
+        except Exception:
+            count_llm_call("gemini_sdk", "error", text_parts)
+            raise
+        count_llm_call("gemini_sdk", "ok", text_parts, text)
+        return text
+
+    try:
+        return SCHEDULER.run_sync("gemini", call, key=prompt_key("sdk", text_parts) if text_only else None)
+    except LLMError:
+        raise
+    except Exception as e:
+        raise LLMError(f"Gemini: {e}") from e
+
+# keep-alive session so sync callers reuse the Perplexity connection
+HTTP = requests.Session()
 
 def ask_perplexity(prompt: str) -> str:
+    def call():
+        try:
+            with timed("llm_perplexity"):
+                if LLM_PROVIDER == "fake":
+                    answer = get_provider("perplexity").generate_sync(prompt)
+                else:
+                    r = HTTP.post(
+                        "https://api.perplexity.ai/chat/completions",
+                        json={"model": "sonar", "messages": [{"role": "user", "content": prompt}], "temperature": 0.3},
+                        headers={"Authorization": f"Bearer {PERPLEXITY_API_KEY}"},
+                        timeout=30,
+                    )
+                    r.raise_for_status()  # 429 / 5xx are retried by the scheduler
+                    answer = r.json()["choices"][0]["message"]["content"].strip()
+        except Exception:
+            count_llm_call("perplexity", "error", prompt)
+            raise
+        count_llm_call("perplexity", "ok", prompt, answer)
+        return answer
+
     try:
-        r = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            json={"model": "sonar", "messages": [{"role": "user", "content": prompt}], "temperature": 0.3},
-            headers={"Authorization": f"Bearer {PERPLEXITY_API_KEY}"},
-            timeout=30,
-        )
-        return r.json()["choices"][0]["message"]["content"].strip()
+        return SCHEDULER.run_sync("perplexity", call, key=prompt_key("perplexity", prompt))
     except Exception:
         return "Answer generation failed."
 
+async def _agenerate(provider: str, prompt) -> str:
+    """Pooled provider call through the scheduler; identical prompts in flight share one call."""
+    joined = prompt if isinstance(prompt, str) else "\n\n".join(prompt)
+
+    async def call():
+        try:
+            with timed(f"llm_{provider}"):
+                text = await get_provider(provider).generate(prompt)
+        except LLMError:
+            count_llm_call(provider, "error", joined)
+            raise
+        count_llm_call(provider, "ok", joined, text)
+        return text
+
+    return await SCHEDULER.run(provider, call, key=prompt_key(provider, prompt))
+
+async def aask_perplexity(prompt: str) -> str:
+    """Async Perplexity call over the pooled provider client."""
+    try:
+        return await _agenerate("perplexity", prompt)
+    except LLMError:
+        return "Answer generation failed."
+
+async def agemini_generate_text(prompt_parts: list, fallback: str = "") -> str:
+    """
+    Async text-only Gemini call over the pooled provider client.
+    prompt_parts: list of prompt strings (use gemini_generate_text for media).
+    Returns `fallback` when Gemini stays unavailable (never an error string).
+    """
+    try:
+        return await _agenerate("gemini", prompt_parts) or fallback
+    except LLMError:
+        return fallback
+
+async def _astream(provider: str, prompt, fallback: str) -> AsyncIterator[str]:
+    # before the first token an error sends the fallback instead; after it the LLMError is
+    # re-raised, so the SSE route emits `error` and doesn't cache the cut-short answer
+    parts, error = [], None
+    async with SCHEDULER.slot(provider):
+        with timed(f"llm_{provider}_stream"):
+            try:
+                async for delta in get_provider(provider).stream(prompt):
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            except LLMError as e:
+                error = e
+    count_llm_call(provider, "error" if error else "ok",
+                   prompt if isinstance(prompt, str) else "\n\n".join(prompt), "".join(parts))
+    if error is not None and parts:
+        raise error
+    if not parts and fallback:
+        yield fallback
+
+def astream_perplexity(prompt: str) -> AsyncIterator[str]:
+    """Perplexity answer as a stream of text deltas (SSE endpoints); raises LLMError if cut short."""
+    return _astream("perplexity", prompt, "Answer generation failed.")
+
+def astream_gemini_text(prompt_parts: list, fallback: str = "") -> AsyncIterator[str]:
+    """Text-only Gemini answer as a stream of text deltas (SSE endpoints); raises LLMError if cut short."""
+    return _astream("gemini", prompt_parts, fallback)
+
 def gemini_generate_text(prompt_and_inputs: list):
     """
     prompt_and_inputs: list with prompt strings and optionally media (image object or genai.upload_file)
+    Returns "" when Gemini is unavailable, so callers fall back to their defaults.
     """
     try:
-        resp = GEMINI.generate_content(prompt_and_inputs)
-        return resp.text.strip() if resp and resp.text else ""
-    except Exception as e:
-        return f"[Gemini error: {str(e)}]"
+        return gemini_sdk_text(prompt_and_inputs)
+    except LLMError:
+        return ""
 
 def genai_generate_text(prompt_and_inputs: list) -> str:
     """
-    Generic wrapper for GEMINI.generate_content.
+    Generic wrapper for the Gemini SDK's generate_content.
     prompt_and_inputs: list mixing prompt strings and optionally uploaded file refs.
+    Returns "" when Gemini is unavailable.
     """
     try:
-        resp = GEMINI.generate_content(prompt_and_inputs)
-        return resp.text.strip() if resp and getattr(resp, "text", None) else ""
-    except Exception as e:
-        return f"[Gemini error: {str(e)}]"
+        return gemini_sdk_text(prompt_and_inputs)
+    except LLMError:
+        return ""
 
 def upload_file_and_generate(file_path: str, prompt: str) -> str:
     """
     Upload a local file and call Gemini with the uploaded reference.
-    Returns Gemini text or error string.
+    Returns Gemini text; raises LLMError when Gemini is unavailable.
     """
+    if LLM_PROVIDER == "fake":
+        return gemini_sdk_text([prompt])
     try:
-        uploaded = genai.upload_file(file_path)
-        resp = GEMINI.generate_content([prompt, uploaded])
-        return resp.text.strip() if resp and getattr(resp, "text", None) else ""
+        # upload and generate take separate slots (never nested, so a cap of 1 can't deadlock)
+        uploaded = SCHEDULER.run_sync("gemini", lambda: genai.upload_file(file_path))
     except Exception as e:
-        return f"[Gemini upload/generate error: {str(e)}]"
+        raise LLMError(f"Gemini upload: {e}") from e
+    return gemini_sdk_text([prompt, uploaded])
 
 def transcribe_audio_bytes(audio_bytes: bytes, filename: str) -> str:
     """
     Writes audio bytes to a temp file, uploads it to Gemini, requests transcription,
-    then deletes the temp file. Returns transcript text or error string.
+    then deletes the temp file. Returns transcript text or error string; raises
+    LLMError when Gemini is unavailable (so no error text gets indexed).
     """
     tmp_path = None
     try:
@@ -72,6 +195,8 @@ def transcribe_audio_bytes(audio_bytes: bytes, filename: str) -> str:
         prompt = "Transcribe this audio file completely and accurately. Include timestamps if possible. Return only the transcript."
         result = upload_file_and_generate(tmp_path, prompt)
         return result or "[No transcript returned]"
+    except LLMError:
+        raise
     except Exception as e:
         return f"[Audio error: {str(e)}]"
     finally:
@@ -79,4 +204,4 @@ def transcribe_audio_bytes(audio_bytes: bytes, filename: str) -> str:
             if tmp_path and os.path.exists(tmp_path):
                 os.remove(tmp_path)
         except Exception:
-            pass
\ No newline at end of file
+            pass
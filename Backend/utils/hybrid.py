@@ -0,0 +1,149 @@
+# backend/utils/hybrid.py
+"""
+Hybrid dense + sparse retrieval.
+
+Collections created with QDRANT_HYBRID=1 (default) carry two named vectors
+per point:
+  * "dense"  – bge-small (384-d, cosine), as before
+  * "sparse" – fastembed sparse embedding (SPARSE_MODEL, BM25 by default),
+               which matches exact drug names, lab codes and abbreviations
+
+A query runs the dense and the sparse search in one `search_batch`
+round-trip and fuses them with Reciprocal Rank Fusion.  (The server-side
+Query API with prefetch + FusionQuery needs qdrant-client >= 1.10; the
+pinned 1.7.3 has search_batch, so the fusion itself happens here.)
+
+The fused list is ordered by RRF, but each hit's `score` stays a cosine
+similarity so existing relevance thresholds keep working: hits found only
+by the sparse search get the lowest dense score of the round, an upper
+bound on their true similarity.
+
+Collections created before this change have a single unnamed vector; they
+are detected per collection and keep the dense-only path.
+
+Known degradation: the sparse side is BM25 without IDF.  fastembed's bm25
+stores saturated term frequencies and expects the server to weight query
+terms by IDF (SparseVectorParams(modifier=Modifier.IDF)), which needs
+qdrant-client / server >= 1.10; on 1.7.3 every query term weighs the same,
+so a frequent word ("pain") counts as much as a rare drug name.  Stopwords
+are dropped by the model and RRF only uses ranks, which limits the damage.
+SPARSE_MODEL=prithivida/Splade_PP_en_v1 carries learned weights and needs
+no IDF; after an upgrade, set the modifier in sparse_vectors_config.
+"""
+import os
+import threading
+
+from qdrant_client.http.models import (
+    NamedSparseVector, NamedVector, SearchRequest, SparseIndexParams, SparseVector, SparseVectorParams,
+)
+
+HYBRID = os.getenv("QDRANT_HYBRID", "1") == "1"
+SPARSE_MODEL = os.getenv("SPARSE_MODEL", "Qdrant/bm25")   # or prithivida/Splade_PP_en_v1
+HYBRID_PREFETCH = int(os.getenv("HYBRID_PREFETCH", "4"))   # each side fetches limit * HYBRID_PREFETCH
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+DENSE = "dense"
+SPARSE = "sparse"
+
+_model = None
+_model_lock = threading.Lock()
+_layouts = {}
+
+
+# ---------- collection layout ----------
+def dense_vectors_config(params):
+    """`params` is the dense VectorParams; hybrid collections name it."""
+    return {DENSE: params} if HYBRID else params
+
+
+def sparse_vectors_config(on_disk: bool = False):
+    return {SPARSE: SparseVectorParams(index=SparseIndexParams(on_disk=on_disk))} if HYBRID else None
+
+
+def is_hybrid(client, collection_name: str) -> bool:
+    """True if the collection has the named dense + sparse vectors (cached per client/collection)."""
+    key = (id(client), collection_name)
+    if key not in _layouts:
+        params = client.get_collection(collection_name).config.params
+        _layouts[key] = isinstance(params.vectors, dict) and DENSE in params.vectors \
+            and SPARSE in (params.sparse_vectors or {})
+    return _layouts[key]
+
+
+def forget_layout(client, collection_name: str):
+    _layouts.pop((id(client), collection_name), None)
+
+
+# ---------- sparse embeddings ----------
+def get_sparse_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            from fastembed import SparseTextEmbedding
+            _model = SparseTextEmbedding(model_name=SPARSE_MODEL)
+        return _model
+
+
+def _to_sparse(embedding) -> SparseVector:
+    return SparseVector(indices=embedding.indices.tolist(), values=embedding.values.tolist())
+
+
+def sparse_embed(texts, batch_size: int = 256):
+    return [_to_sparse(e) for e in get_sparse_model().embed(list(texts), batch_size=batch_size)]
+
+
+def sparse_query_vector(text: str) -> SparseVector:
+    model = get_sparse_model()
+    embed = getattr(model, "query_embed", model.embed)  # BM25 weights queries differently from documents
+    return _to_sparse(next(iter(embed([text]))))
+
+
+def point_vectors(dense, sparse=None):
+    """Batch vectors for upsert: a plain list for legacy collections, named lists for hybrid ones."""
+    dense = [v.tolist() if hasattr(v, "tolist") else v for v in dense]
+    if sparse is None:
+        return dense
+    return {DENSE: dense, SPARSE: list(sparse)}
+
+
+# ---------- search ----------
+def rrf_fuse(dense_hits, sparse_hits, limit: int, k: int = RRF_K):
+    """Reciprocal Rank Fusion of two ranked lists; keeps a cosine score on every hit."""
+    fused, by_id = {}, {}
+    for hits in (dense_hits, sparse_hits):
+        for rank, hit in enumerate(hits):
+            fused[hit.id] = fused.get(hit.id, 0.0) + 1.0 / (k + rank + 1)
+            by_id.setdefault(hit.id, hit)
+
+    dense_scores = {h.id: h.score for h in dense_hits}
+    floor = min(dense_scores.values()) if dense_scores else 0.0
+    ranked = sorted(fused, key=fused.get, reverse=True)[:limit]
+    return [by_id[pid].copy(update={"score": dense_scores.get(pid, floor)}) for pid in ranked]
+
+
+def search(client, collection_name: str, vector, limit: int, query_filter=None, query_text=None,
+           sparse_vector=None, **search_kwargs):
+    """
+    Dense search on legacy collections; on hybrid ones, dense-only when no
+    query text is given, otherwise dense + sparse fused with RRF.
+    """
+    if not is_hybrid(client, collection_name):
+        return client.search(collection_name=collection_name, query_vector=vector, limit=limit,
+                             query_filter=query_filter, **search_kwargs)
+
+    dense = NamedVector(name=DENSE, vector=list(map(float, vector)))
+    if not query_text:
+        return client.search(collection_name=collection_name, query_vector=dense, limit=limit,
+                             query_filter=query_filter, **search_kwargs)
+
+    sparse = sparse_vector or sparse_query_vector(query_text)
+    prefetch = max(limit * HYBRID_PREFETCH, limit)
+    params = search_kwargs.get("search_params")
+    with_payload = search_kwargs.get("with_payload", True)
+    dense_hits, sparse_hits = client.search_batch(collection_name=collection_name, requests=[
+        SearchRequest(vector=dense, filter=query_filter, limit=prefetch, params=params,
+                      with_payload=with_payload),
+        SearchRequest(vector=NamedSparseVector(name=SPARSE, vector=sparse), filter=query_filter,
+                      limit=prefetch, with_payload=with_payload),
+    ])
+    return rrf_fuse(dense_hits, sparse_hits, limit)
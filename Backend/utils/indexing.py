@@ -0,0 +1,97 @@
+# backend/utils/indexing.py
+"""
+Embed-and-upsert for uploaded documents.
+
+All chunks of a document are embedded in one bulk job (large batches,
+optional fastembed data-parallel) and written with batched upserts,
+optionally several batches in flight at once.  Hybrid collections also get
+a sparse vector per chunk, computed from the payload text.
+"""
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from qdrant_client.models import Batch
+
+from utils.cache import invalidate_collection
+from utils.embedding_service import get_embedding_service
+from utils.hybrid import is_hybrid, point_vectors, sparse_embed
+from utils.metrics import CHUNKS, timed
+
+UPSERT_BATCH = int(os.getenv("UPSERT_BATCH", "256"))
+UPSERT_PARALLEL = int(os.getenv("UPSERT_PARALLEL", "1"))
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def upsert_batches(client, collection_name: str, ids: List[str], vectors, payloads: List[dict],
+                   batch_size: int = UPSERT_BATCH, parallel: int = UPSERT_PARALLEL, sparse=None):
+    batches = [
+        Batch(ids=ids[i:i + batch_size],
+              vectors=point_vectors(vectors[i:i + batch_size], sparse and sparse[i:i + batch_size]),
+              payloads=payloads[i:i + batch_size])
+        for i in range(0, len(ids), batch_size)
+    ]
+
+    def send(batch):
+        with timed("upsert"):
+            client.upsert(collection_name=collection_name, points=batch)
+
+    if parallel > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            list(pool.map(send, batches))
+    else:
+        for batch in batches:
+            send(batch)
+
+
+def embed_chunks(chunks: List[str], timings: Optional[Dict[str, float]] = None,
+                 known: Optional[Dict[int, object]] = None):
+    """
+    Embed a whole document's chunks in one bulk job; records embed_ms.
+    known: chunk index -> vector already computed (e.g. by the medical gate), not embedded again.
+    """
+    known = known or {}
+    missing = [i for i in range(len(chunks)) if i not in known]
+    start = time.perf_counter()
+    with timed("embed"):
+        fresh = get_embedding_service().embed_bulk([chunks[i] for i in missing]) if missing else []
+    if timings is not None:
+        timings["embed_ms"] = _ms(start)
+    vectors = dict(known)
+    vectors.update(zip(missing, fresh))
+    return [vectors[i] for i in range(len(chunks))]
+
+
+def write_chunks(client, collection_name: str, ids: List[str], vectors, payloads: List[dict],
+                 timings: Optional[Dict[str, float]] = None) -> int:
+    """Upsert already-embedded chunks and invalidate cached searches; records sparse_ms / upsert_ms."""
+    sparse = None
+    if is_hybrid(client, collection_name):
+        start = time.perf_counter()
+        with timed("sparse_embed"):
+            sparse = sparse_embed(p.get("text", "") for p in payloads)
+        if timings is not None:
+            timings["sparse_ms"] = _ms(start)
+    start = time.perf_counter()
+    upsert_batches(client, collection_name, ids, vectors, payloads, sparse=sparse)
+    if timings is not None:
+        timings["upsert_ms"] = _ms(start)
+    invalidate_collection(client, collection_name)
+    CHUNKS.inc(len(ids), collection=collection_name)
+    return len(ids)
+
+
+def index_chunks(client, collection_name: str, chunks: List[str], payloads: List[dict],
+                 ids: Optional[List[str]] = None, timings: Optional[Dict[str, float]] = None,
+                 known: Optional[Dict[int, object]] = None) -> int:
+    """Embed `chunks` in bulk and upsert them with `payloads`; fills embed_ms / upsert_ms into `timings`."""
+    if not chunks:
+        return 0
+    ids = ids or [str(uuid.uuid4()) for _ in chunks]
+    vectors = embed_chunks(chunks, timings, known)
+    return write_chunks(client, collection_name, ids, vectors, payloads, timings)
@@ -0,0 +1,142 @@
+# backend/utils/jobs.py
+"""
+Background ingestion jobs.
+
+An upload is turned into a Job and handed to a bounded worker pool; the
+caller gets the job id back immediately and polls for per-stage progress.
+Stages are recorded with status + duration so the status endpoint can show
+exactly where a job is (and how long each step took).
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "2"))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "32"))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "500"))
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class Job:
+    def __init__(self, filename: str, stages):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.status = "queued"
+        self.created_at = time.time()
+        self.searchable = False
+        self.error = None
+        self.result = {}
+        self.content = None  # raw upload bytes, released once extracted
+        self.stages = OrderedDict((name, {"status": "pending", "ms": None}) for name in stages)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mark a stage running → done/failed and record its duration."""
+        with self.lock:
+            self.status = "running"
+            self.stages[name]["status"] = "running"
+        start = time.perf_counter()
+        try:
+            yield self.stages[name]
+        except Exception as e:
+            with self.lock:
+                self.stages[name]["status"] = "failed"
+                self.stages[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+                self.status = "failed"
+                self.error = f"{name}: {e}"
+            raise
+        with self.lock:
+            self.stages[name]["status"] = "done"
+            self.stages[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    def finish(self, **result):
+        with self.lock:
+            self.result.update(result)
+            if self.status != "failed":
+                self.status = "done"
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "job_id": self.id,
+                "file": self.filename,
+                "status": self.status,
+                "searchable": self.searchable,
+                "stages": {k: dict(v) for k, v in self.stages.items()},
+                "error": self.error,
+                "result": dict(self.result),
+                "age_s": round(time.time() - self.created_at, 1),
+            }
+
+
+class JobQueue:
+    """
+    Bounded ingestion pool plus a separate pool for slow, non-blocking follow-up work (summaries).
+    Queued follow-ups hold the extracted text, so they count against `max_pending` too.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, summary_workers: int = SUMMARY_WORKERS,
+                 max_pending: int = INGEST_MAX_PENDING, history: int = INGEST_JOB_HISTORY):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self.followup = ThreadPoolExecutor(max_workers=summary_workers, thread_name_prefix="ingest-summary")
+        self.max_pending = max_pending
+        self.history = history
+        self.jobs = OrderedDict()
+        self.pending = 0
+        self.followups = 0
+        self.lock = threading.Lock()
+
+    def submit(self, job: Job, fn, *args):
+        with self.lock:
+            if self.pending + self.followups >= self.max_pending:
+                raise QueueFull(f"{self.pending} uploads and {self.followups} summaries already queued")
+            self.pending += 1
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.history:
+                self.jobs.popitem(last=False)
+        self.executor.submit(self._run, job, fn, *args)
+        return job
+
+    def _run(self, job, fn, *args):
+        try:
+            fn(job, *args)
+        except Exception as e:
+            print(f"Ingestion job {job.id} failed: {e}")
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def run_followup(self, job: Job, fn, *args):
+        """Schedule work that must not hold an ingestion worker (e.g. the LLM summary)."""
+        def run():
+            try:
+                fn(job, *args)
+            except Exception as e:
+                print(f"Ingestion job {job.id} follow-up failed: {e}")
+            finally:
+                with self.lock:
+                    self.followups -= 1
+        with self.lock:
+            self.followups += 1
+        self.followup.submit(run)
+
+    def get(self, job_id: str):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def stats(self):
+        with self.lock:
+            return {"pending": self.pending, "followups": self.followups, "max_pending": self.max_pending,
+                    "tracked": len(self.jobs)}
+
+
+JOBS = JobQueue()
@@ -0,0 +1,90 @@
+# backend/utils/json_stream.py
+"""
+Constant-memory JSON reader for the ingestion scripts.
+
+Handles a top-level JSON array, JSONL / NDJSON (one value per line, trailing
+commas tolerated) and either of those gzip-compressed. Values are decoded
+one at a time from a sliding buffer, so peak memory is roughly
+CHUNK_SIZE + the largest single entry, independent of file size.
+"""
+import gzip
+import json
+import re
+
+CHUNK_SIZE = 1 << 20        # characters read per refill
+MAX_VALUE_CHARS = 64 << 20  # a single value larger than this is treated as malformed
+_SKIP = " \t\r\n,"
+# an error on a token that runs to the end of the buffer may just be a cut-off value
+_OPEN_TAIL = re.compile(r"[^\s,:\[\]{}]*\Z")
+
+
+def open_text(file_path: str):
+    """Open a (possibly gzip-compressed) UTF-8 file in text mode."""
+    with open(file_path, "rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(file_path, "rt", encoding="utf-8")
+    return open(file_path, "r", encoding="utf-8")
+
+
+def _may_be_truncated(e: json.JSONDecodeError, buf: str) -> bool:
+    """Whether more input could still make the value decode (else it's malformed already)."""
+    return e.pos >= len(buf) or e.msg.startswith("Unterminated string") or bool(_OPEN_TAIL.match(buf, e.pos))
+
+
+def iter_json_values(stream, chunk_size: int = CHUNK_SIZE):
+    """
+    Yield top-level values from a text stream: the elements of a top-level
+    array, or every value of a JSONL / concatenated-JSON stream.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    started = False
+
+    while True:
+        # skip whitespace / separators, refilling as needed
+        while True:
+            while pos < len(buf) and buf[pos] in _SKIP:
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = stream.read(chunk_size)
+            buf, pos, eof = chunk, 0, not chunk
+
+        if pos >= len(buf):
+            return
+
+        ch = buf[pos]
+        if not started:
+            started = True
+            if ch == "[":  # top-level array → stream its elements
+                pos += 1
+                continue
+        if ch == "]":
+            pos += 1
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+            # a number/literal touching the buffer edge may continue in the next chunk
+            if end < len(buf) or eof:
+                yield value
+                pos = end
+                continue
+        except json.JSONDecodeError as e:
+            if eof or len(buf) - pos > MAX_VALUE_CHARS or not _may_be_truncated(e, buf):
+                # genuinely malformed: report and resync at the next line
+                print(f"Skipping invalid value: {e}")
+                nl = buf.find("\n", pos)
+                pos = len(buf) if nl < 0 else nl + 1
+                continue
+
+        # incomplete value → keep the unread tail and read more
+        chunk = stream.read(chunk_size)
+        buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+
+
+def streaming_json(file_path: str):
+    """Yield dataset entries from a .json / .jsonl / .ndjson file, optionally gzip-compressed."""
+    with open_text(file_path) as f:
+        yield from iter_json_values(f)
@@ -0,0 +1,257 @@
+# backend/utils/llm_providers.py
+"""
+Async LLM providers over pooled keep-alive HTTP clients.
+
+Perplexity and Gemini are both called through their REST APIs with one
+shared httpx.AsyncClient each, so concurrent requests reuse connections
+instead of opening a fresh TLS session per call.  Base URLs can be pointed
+at a local stub (see scripts/stub_llm_server.py) for testing.
+
+`stream()` yields text deltas as the provider produces them (both APIs
+answer with server-sent events when asked to stream).
+"""
+import abc
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, List, Union
+
+import httpx
+
+PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY", "")
+PERPLEXITY_BASE_URL = os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai")
+PERPLEXITY_MODEL = os.getenv("PERPLEXITY_MODEL", "sonar")
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+# LLM_PROVIDER=fake routes every provider name to the in-process FakeProvider (tests, benchmarks)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "").lower()
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "400"))   # time to first token
+FAKE_LLM_TOKEN_MS = float(os.getenv("FAKE_LLM_TOKEN_MS", "20"))        # per streamed token
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+Prompt = Union[str, List[str]]
+
+
+class LLMError(RuntimeError):
+    def __init__(self, message: str, status: int = None, retry_after: float = None):
+        super().__init__(message)
+        self.status = status            # HTTP status of the failed call, if any
+        self.retry_after = retry_after  # seconds, from a Retry-After header
+
+
+def _llm_error(prefix: str, e: Exception) -> LLMError:
+    response = getattr(e, "response", None) if isinstance(e, httpx.HTTPStatusError) else None
+    retry_after = None
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("retry-after", ""))
+        except ValueError:
+            pass
+    return LLMError(f"{prefix}: {e}", status=response.status_code if response is not None else None,
+                    retry_after=retry_after)
+
+
+class LLMProvider(abc.ABC):
+    name = "base"
+
+    def __init__(self, base_url: str, timeout: float = LLM_TIMEOUT,
+                 max_connections: int = LLM_MAX_CONNECTIONS):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    @abc.abstractmethod
+    async def generate(self, prompt: Prompt) -> str:
+        """Whole answer text; raises LLMError on failure."""
+
+    async def stream(self, prompt: Prompt) -> AsyncIterator[str]:
+        """Text deltas; providers without streaming yield the whole answer once."""
+        yield await self.generate(prompt)
+
+    async def _sse(self, path: str, body: dict, headers: dict) -> AsyncIterator[dict]:
+        """POST and decode a server-sent-events response into its JSON `data:` payloads."""
+        async with self.client.stream("POST", path, json=body, headers=headers) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                if data:
+                    yield json.loads(data)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class PerplexityProvider(LLMProvider):
+    name = "perplexity"
+
+    def __init__(self, api_key: str = PERPLEXITY_API_KEY, model: str = PERPLEXITY_MODEL,
+                 base_url: str = PERPLEXITY_BASE_URL, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self.api_key = api_key
+        self.model = model
+
+    async def generate(self, prompt: Prompt) -> str:
+        content = prompt if isinstance(prompt, str) else "\n\n".join(prompt)
+        try:
+            r = await self.client.post(
+                "/chat/completions",
+                json={"model": self.model, "messages": [{"role": "user", "content": content}],
+                      "temperature": 0.3},
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+            r.raise_for_status()
+            return r.json()["choices"][0]["message"]["content"].strip()
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            raise _llm_error("Perplexity", e) from e
+
+    async def stream(self, prompt: Prompt) -> AsyncIterator[str]:
+        content = prompt if isinstance(prompt, str) else "\n\n".join(prompt)
+        try:
+            async for event in self._sse(
+                "/chat/completions",
+                {"model": self.model, "messages": [{"role": "user", "content": content}],
+                 "temperature": 0.3, "stream": True},
+                {"Authorization": f"Bearer {self.api_key}"},
+            ):
+                delta = event["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            raise _llm_error("Perplexity", e) from e
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str = GOOGLE_API_KEY, model: str = GEMINI_MODEL,
+                 base_url: str = GEMINI_BASE_URL, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self.api_key = api_key
+        self.model = model
+
+    @staticmethod
+    def _body(prompt: Prompt):
+        parts = [prompt] if isinstance(prompt, str) else prompt
+        return {"contents": [{"role": "user", "parts": [{"text": p} for p in parts]}]}
+
+    @staticmethod
+    def _text(data) -> str:
+        candidates = data.get("candidates") or [{}]  # stream chunks may carry only usage metadata
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(p.get("text", "") for p in parts)
+
+    async def generate(self, prompt: Prompt) -> str:
+        try:
+            r = await self.client.post(
+                f"/v1beta/models/{self.model}:generateContent",
+                json=self._body(prompt),
+                headers={"x-goog-api-key": self.api_key},
+            )
+            r.raise_for_status()
+            return self._text(r.json()).strip()
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            raise _llm_error("Gemini", e) from e
+
+    async def stream(self, prompt: Prompt) -> AsyncIterator[str]:
+        try:
+            async for event in self._sse(
+                f"/v1beta/models/{self.model}:streamGenerateContent?alt=sse",
+                self._body(prompt),
+                {"x-goog-api-key": self.api_key},
+            ):
+                text = self._text(event)
+                if text:
+                    yield text
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            raise _llm_error("Gemini", e) from e
+
+
+def fake_reply(prompt: str) -> str:
+    """Deterministic canned answer; follow-up prompts get three numbered questions."""
+    if "follow-up" in prompt.lower():
+        return "1. What are the common causes?\n2. Which tests confirm it?\n3. When should I see a doctor?"
+    return (f"Stub answer ({len(prompt)} prompt chars). This response is generated locally "
+            "so that latency and streaming behaviour can be measured without a real model.")
+
+
+class FakeProvider(LLMProvider):
+    """In-process stand-in with first-token latency and per-token streaming delay."""
+    name = "fake"
+
+    def __init__(self, latency_ms: float = FAKE_LLM_LATENCY_MS, token_ms: float = FAKE_LLM_TOKEN_MS):
+        super().__init__(base_url="")
+        self.latency = latency_ms / 1000.0
+        self.token_delay = token_ms / 1000.0
+        self.calls = 0
+
+    @staticmethod
+    def _content(prompt: Prompt) -> str:
+        return prompt if isinstance(prompt, str) else "\n\n".join(prompt)
+
+    async def generate(self, prompt: Prompt) -> str:
+        self.calls += 1
+        reply = fake_reply(self._content(prompt))
+        await asyncio.sleep(self.latency + self.token_delay * len(reply.split()))
+        return reply
+
+    def generate_sync(self, prompt: Prompt) -> str:
+        """Blocking variant for the SDK / requests call sites."""
+        self.calls += 1
+        reply = fake_reply(self._content(prompt))
+        time.sleep(self.latency + self.token_delay * len(reply.split()))
+        return reply
+
+    async def stream(self, prompt: Prompt) -> AsyncIterator[str]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for i, word in enumerate(fake_reply(self._content(prompt)).split(" ")):
+            yield word if i == 0 else " " + word
+            await asyncio.sleep(self.token_delay)
+
+
+_PROVIDERS = {}
+
+
+def get_provider(name: str) -> LLMProvider:
+    """Shared provider instance (one connection pool per provider per process)."""
+    if LLM_PROVIDER == "fake":
+        name = "fake"
+    if name not in _PROVIDERS:
+        if name == "fake":
+            _PROVIDERS[name] = FakeProvider()
+        elif name == "perplexity":
+            _PROVIDERS[name] = PerplexityProvider()
+        elif name == "gemini":
+            _PROVIDERS[name] = GeminiProvider()
+        else:
+            raise ValueError(f"Unknown LLM provider: {name}")
+    return _PROVIDERS[name]
+
+
+async def close_providers():
+    for provider in _PROVIDERS.values():
+        await provider.aclose()
@@ -0,0 +1,331 @@
+# backend/utils/llm_scheduler.py
+"""
+Central gate for every LLM call (REST providers, Gemini SDK, DSPy).
+
+Per provider:
+  * at most LLM_CONCURRENCY_<PROVIDER> calls in flight (default LLM_CONCURRENCY)
+  * a token bucket of LLM_RPS_<PROVIDER> calls per second with bursts of
+    LLM_BURST_<PROVIDER> (0 disables rate limiting)
+  * retries on 429 / 5xx / timeouts / connection errors with full-jitter
+    exponential backoff (LLM_MAX_RETRIES, LLM_BACKOFF_BASE_S, LLM_BACKOFF_MAX_S);
+    a Retry-After header is honoured as the minimum delay
+  * single-flight: callers passing the same key while a call is in flight
+    share its result instead of issuing another request
+
+Async callers (the pooled REST providers) and sync callers (SDK, DSPy on
+worker threads) share the same slots and bucket and wait in one FIFO queue
+per provider: a release hands the slot straight to the oldest waiter
+(an Event for threads, a future resolved thread-safely for coroutines),
+and while the bucket is empty one timer wakes the queue when the next token
+is due.  Streams take a slot and a bucket token but are neither retried
+nor coalesced.
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Awaitable, Callable, Optional
+
+from utils.metrics import (
+    LLM_COALESCED, LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT, LLM_RETRIES, record_stage
+)
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_RPS = float(os.getenv("LLM_RPS", "0"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "0.5"))
+LLM_BACKOFF_MAX_S = float(os.getenv("LLM_BACKOFF_MAX_S", "8"))
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# google.api_core exceptions raised by the Gemini SDK (matched by name, no import needed)
+RETRY_EXCEPTIONS = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+                    "DeadlineExceeded", "RateLimitError", "Timeout", "APIConnectionError",
+                    "TimeoutException", "TransportError", "ConnectError", "ConnectionError", "ReadTimeout"}
+
+
+def _env(name: str, provider: str, default):
+    value = os.getenv(f"{name}_{provider.upper()}", "")
+    return type(default)(value) if value.strip() else default
+
+
+def prompt_key(*parts) -> str:
+    """Single-flight key for a text-only prompt (plus anything else that changes the answer)."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def retry_reason(exc: BaseException) -> Optional[str]:
+    """Why `exc` is worth retrying ("429", "503", "timeout", ...), or None."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        statuses = [getattr(exc, attr, None) for attr in ("status", "status_code", "code")]
+        statuses.append(getattr(getattr(exc, "response", None), "status_code", None))  # requests / httpx
+        for status in statuses:
+            if isinstance(status, int) and status in RETRY_STATUSES:
+                return str(status)
+        if any(cls.__name__ in RETRY_EXCEPTIONS for cls in type(exc).__mro__):
+            return type(exc).__name__
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def backoff_delay(attempt: int, exc: BaseException = None) -> float:
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX_S, LLM_BACKOFF_BASE_S * 2 ** attempt))
+    return max(delay, getattr(exc, "retry_after", None) or 0.0)
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake        # thread-safe: sets an Event or resolves an asyncio future
+        self.granted = False
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ProviderGate:
+    """
+    Concurrency slots + token bucket for one provider (thread-safe, usable from async code).
+
+    Callers that can't start at once queue FIFO; a released slot (or a
+    refilled token) goes to the oldest waiter, sync or async alike.
+    """
+
+    def __init__(self, name: str, concurrency: int, rps: float, burst: float = None):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.rps = rps
+        self.burst = burst or max(1.0, rps)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.active = 0
+        self.queue = deque()   # _Waiter, oldest first
+        self.timer = None      # pending token refill while waiters are rate-limited
+        self.lock = threading.Lock()
+
+    def _take(self) -> bool:
+        """Take a slot (and token) if both are free.  Lock held."""
+        if self.rps > 0:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rps)
+            self.updated = now
+        if self.active >= self.concurrency or (self.rps > 0 and self.tokens < 1):
+            return False
+        if self.rps > 0:
+            self.tokens -= 1
+        self.active += 1
+        return True
+
+    def _grant(self):
+        """Hand free slots to waiters in arrival order.  Lock held."""
+        while self.queue and self._take():
+            waiter = self.queue.popleft()
+            waiter.granted = True
+            waiter.wake()
+        if self.queue and self.active < self.concurrency and self.rps > 0 and self.timer is None:
+            # blocked on the bucket only: wake up once the next token is due
+            self.timer = threading.Timer((1 - self.tokens) / self.rps, self._refilled)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _refilled(self):
+        with self.lock:
+            self.timer = None
+            self._grant()
+
+    def _enqueue(self, wake: Callable[[], None]) -> Optional[_Waiter]:
+        """None if a slot was taken right away, else the queued waiter."""
+        with self.lock:
+            if not self.queue and self._take():
+                return None
+            waiter = _Waiter(wake)
+            self.queue.append(waiter)
+            self._grant()
+        LLM_QUEUE_DEPTH.inc(provider=self.name)
+        return waiter
+
+    def _abandon(self, waiter: _Waiter):
+        """The waiter gave up (cancelled / interrupted): leave the queue or pass its slot on."""
+        with self.lock:
+            if waiter.granted:
+                self.active -= 1
+                self._grant()
+            else:
+                self.queue.remove(waiter)
+
+    def _acquired(self, start: float, waiter: Optional[_Waiter]):
+        if waiter is not None:
+            LLM_QUEUE_DEPTH.dec(provider=self.name)
+        LLM_IN_FLIGHT.inc(provider=self.name)
+        waited = time.perf_counter() - start
+        LLM_QUEUE_WAIT.observe(waited, provider=self.name)
+        if waiter is not None:
+            record_stage("llm_queue", waited)  # shows up in the request's Server-Timing
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+            self._grant()
+        LLM_IN_FLIGHT.dec(provider=self.name)
+
+    async def acquire(self):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = self._enqueue(lambda: loop.call_soon_threadsafe(_resolve, future))
+        if waiter is not None:
+            try:
+                await future
+            except BaseException:
+                LLM_QUEUE_DEPTH.dec(provider=self.name)
+                self._abandon(waiter)
+                raise
+        self._acquired(start, waiter)
+
+    def acquire_sync(self):
+        start = time.perf_counter()
+        event = threading.Event()
+        waiter = self._enqueue(event.set)
+        if waiter is not None:
+            try:
+                event.wait()
+            except BaseException:
+                LLM_QUEUE_DEPTH.dec(provider=self.name)
+                self._abandon(waiter)
+                raise
+        self._acquired(start, waiter)
+
+    def stats(self):
+        with self.lock:
+            return {"in_flight": self.active, "waiting": len(self.queue), "concurrency": self.concurrency,
+                    "rps": self.rps, "tokens": round(self.tokens, 2) if self.rps > 0 else None}
+
+
+class LLMScheduler:
+    def __init__(self):
+        self.gates = {}
+        self.lock = threading.Lock()
+        self.inflight_async = {}  # (provider, key) -> asyncio.Task
+        self.inflight_sync = {}   # (provider, key) -> concurrent.futures.Future
+
+    def gate(self, provider: str) -> ProviderGate:
+        with self.lock:
+            if provider not in self.gates:
+                self.gates[provider] = ProviderGate(
+                    provider,
+                    concurrency=_env("LLM_CONCURRENCY", provider, LLM_CONCURRENCY),
+                    rps=_env("LLM_RPS", provider, LLM_RPS),
+                    burst=_env("LLM_BURST", provider, 0.0) or None,
+                )
+            return self.gates[provider]
+
+    # ---------- async ----------
+    async def _attempts(self, provider: str, call: Callable[[], Awaitable]):
+        gate = self.gate(provider)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await gate.acquire()
+            try:
+                return await call()
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None or attempt == LLM_MAX_RETRIES:
+                    raise
+                LLM_RETRIES.inc(provider=provider, reason=reason)
+                delay = backoff_delay(attempt, e)
+            finally:
+                gate.release()
+            await asyncio.sleep(delay)
+
+    async def run(self, provider: str, call: Callable[[], Awaitable], key: str = None):
+        """Await `call()` under the provider's limits, retrying transient failures."""
+        if key is None:
+            return await self._attempts(provider, call)
+        flight = (provider, key)
+        task = self.inflight_async.get(flight)
+        if task is None:
+            task = asyncio.ensure_future(self._attempts(provider, call))
+            self.inflight_async[flight] = task
+            task.add_done_callback(lambda _: self.inflight_async.pop(flight, None))
+        else:
+            LLM_COALESCED.inc(provider=provider)
+        # shield: one caller going away must not cancel the call the others wait for
+        return await asyncio.shield(task)
+
+    @asynccontextmanager
+    async def slot(self, provider: str):
+        """Hold one slot for a streamed call."""
+        gate = self.gate(provider)
+        await gate.acquire()
+        try:
+            yield
+        finally:
+            gate.release()
+
+    # ---------- sync (worker threads) ----------
+    def _attempts_sync(self, provider: str, call: Callable[[], object]):
+        gate = self.gate(provider)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            gate.acquire_sync()
+            try:
+                return call()
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None or attempt == LLM_MAX_RETRIES:
+                    raise
+                LLM_RETRIES.inc(provider=provider, reason=reason)
+                delay = backoff_delay(attempt, e)
+            finally:
+                gate.release()
+            time.sleep(delay)
+
+    def run_sync(self, provider: str, call: Callable[[], object], key: str = None):
+        """Blocking counterpart of run() for SDK / DSPy calls on worker threads."""
+        if key is None:
+            return self._attempts_sync(provider, call)
+        flight = (provider, key)
+        with self.lock:
+            future = self.inflight_sync.get(flight)
+            leader = future is None
+            if leader:
+                future = self.inflight_sync[flight] = concurrent.futures.Future()
+        if not leader:
+            LLM_COALESCED.inc(provider=provider)
+            return future.result()
+        try:
+            result = self._attempts_sync(provider, call)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.inflight_sync.pop(flight, None)
+
+    @contextmanager
+    def slot_sync(self, provider: str):
+        gate = self.gate(provider)
+        gate.acquire_sync()
+        try:
+            yield
+        finally:
+            gate.release()
+
+    def stats(self):
+        with self.lock:
+            gates = dict(self.gates)
+        return {name: gate.stats() for name, gate in gates.items()}
+
+
+SCHEDULER = LLMScheduler()
@@ -0,0 +1,117 @@
+# backend/utils/medical_gate.py
+"""
+Medical-content gate for /api/medical/upload.
+
+Two stages:
+  * keyword pre-filter: one compiled alternation of clinical terms, a
+    single pass over the text that stops as soon as GATE_MIN_TERMS
+    distinct terms are seen.  Text below that is rejected without
+    embedding anything.  Generic words ("test", "report") aren't terms.
+  * embedding gate: up to GATE_SAMPLE chunks, spread evenly over the
+    document, are embedded and scored against medical vs non-medical
+    prototype centroids (utils/centroids.py); the document passes when the
+    mean margin is >= GATE_MARGIN.
+
+The sampled vectors are returned with the verdict and reused by
+indexing.embed_chunks, so an accepted document embeds every chunk exactly
+once and a rejected one only ever embeds the sample.
+"""
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from utils.centroids import Centroids
+from utils.metrics import timed
+
+GATE_MIN_TERMS = int(os.getenv("GATE_MIN_TERMS", "2"))
+GATE_SAMPLE = int(os.getenv("GATE_SAMPLE", "16"))
+GATE_MARGIN = float(os.getenv("GATE_MARGIN", "0.0"))
+
+MEDICAL_TERMS = [
+    "patient", "diagnos[ie]s", "diagnosed", "symptoms?", "treatment", "therapy", "medications?", "prescri(?:ption|bed)",
+    "dosage", "dose", "mg", "ml", "tablets?", "physician", "doctor", "nurse", "clinic(?:al)?", "hospital",
+    "admitted", "discharge", "blood", "haemoglobin", "hemoglobin", "glucose", "cholesterol", "platelets?",
+    "wbc", "rbc", "serum", "urine", "biopsy", "patholog(?:y|ical)", "radiolog(?:y|ical)", "mri", "ct scan",
+    "x-?ray", "ultrasound", "ecg", "ekg", "blood pressure", "pulse", "bp", "allerg(?:y|ies|ic)", "infection",
+    "fever", "pain", "chronic", "acute", "surgery", "surgical", "vaccin(?:e|ation)", "antibiotics?",
+    "insulin", "diabetes", "hypertension", "cardiac", "oncology", "tumou?r", "lesion", "prognosis",
+    "medical history", "vital signs", "lab(?:oratory)? results?",
+]
+_TERMS = re.compile(r"\b(?:" + "|".join(MEDICAL_TERMS) + r")\b", re.IGNORECASE)
+
+MEDICAL_PROTOTYPES = {
+    "clinical_note": ["Patient presents with fever and productive cough for five days; chest examination reveals crackles.",
+                      "History of present illness: 54-year-old with type 2 diabetes and hypertension, on metformin."],
+    "lab_report": ["Complete blood count: haemoglobin 11.2 g/dL, WBC 12,400/uL, platelets 210,000/uL.",
+                   "Fasting glucose 126 mg/dL, HbA1c 7.1 %, serum creatinine within normal limits."],
+    "imaging": ["MRI of the lumbar spine shows a disc herniation at L4-L5 compressing the nerve root.",
+                "Chest X-ray: no consolidation, no pleural effusion, heart size normal."],
+    "prescription": ["Amoxicillin 500 mg three times daily for seven days, take after meals.",
+                     "Discharge medications: aspirin 75 mg once daily, atorvastatin 20 mg at night."],
+    "health_education": ["Asthma is a chronic condition of the airways; inhalers relieve wheezing and breathlessness.",
+                         "Symptoms of dehydration include thirst, dark urine and dizziness."],
+}
+NON_MEDICAL_PROTOTYPES = {
+    "business": ["Quarterly revenue grew 12 percent year over year, driven by strong sales in the retail segment.",
+                 "Invoice number 4471: consulting services, total amount due within 30 days."],
+    "legal": ["This agreement is entered into by and between the parties and is governed by the laws of the state.",
+              "The tenant shall pay rent on the first day of each month."],
+    "technical": ["Install the package with pip and configure the API key in the environment variables.",
+                  "The function returns a list of records sorted by timestamp."],
+    "education": ["Chapter 3 covers the French Revolution and the rise of Napoleon.",
+                  "Students must submit the assignment before the exam deadline."],
+    "everyday": ["Preheat the oven to 180 degrees and mix the flour with sugar and butter.",
+                 "The team won the match 3-1 after a late goal in the second half.",
+                 "Our flight departs at 9 am; the hotel is close to the beach."],
+}
+
+CENTROIDS = Centroids(MEDICAL_PROTOTYPES, NON_MEDICAL_PROTOTYPES)
+
+
+class GateVerdict(NamedTuple):
+    accepted: bool
+    stage: str                            # "keywords" or "embedding"
+    score: Optional[float] = None         # mean centroid margin of the sample
+    vectors: Dict[int, object] = {}       # chunk index -> vector, for indexing.embed_chunks
+
+
+def medical_terms(text: str, enough: int = GATE_MIN_TERMS) -> int:
+    """Distinct medical terms in `text`, counting stops at `enough`."""
+    seen = set()
+    for m in _TERMS.finditer(text or ""):
+        seen.add(m.group(0).lower())
+        if len(seen) >= enough:
+            break
+    return len(seen)
+
+
+def has_medical_terms(text: str) -> bool:
+    return medical_terms(text) >= GATE_MIN_TERMS
+
+
+def sample_indices(n: int, k: int = GATE_SAMPLE) -> List[int]:
+    """Up to k indices spread evenly over range(n), first and last included."""
+    if n <= k:
+        return list(range(n))
+    return sorted(set(int(round(x)) for x in np.linspace(0, n - 1, k)))
+
+
+def gate_chunks(chunks: List[str], text: str = None, sample: int = GATE_SAMPLE, margin: float = None,
+                embed=None, centroids: Centroids = CENTROIDS) -> GateVerdict:
+    """
+    Verdict for a chunked document.  The keyword pre-filter runs over `text`
+    (the whole extracted text) or, without it, over the chunks.
+    """
+    with timed("medical_gate"):
+        if not has_medical_terms(text if text is not None else "\n".join(chunks)):
+            return GateVerdict(False, "keywords")
+        if embed is None:
+            from utils.embedding_service import get_embedding_service
+            embed = get_embedding_service().embed_bulk
+        picked = sample_indices(len(chunks), sample)
+        vectors = list(embed([chunks[i] for i in picked]))
+        score = float(np.mean(centroids.margins(vectors)))
+        accepted = score >= (GATE_MARGIN if margin is None else margin)
+        return GateVerdict(accepted, "embedding", score, dict(zip(picked, vectors)))
@@ -0,0 +1,239 @@
+# backend/utils/metrics.py
+"""
+Lightweight instrumentation: Prometheus counters / histograms plus a
+per-request stage breakdown for the Server-Timing header.
+
+    with timed("search"):
+        hits = client.search(...)
+
+records the duration in `medsage_stage_seconds{stage="search"}` and, when
+called while serving a request, adds it to that request's Server-Timing
+entry (repeated stages are summed, e.g. three LLM calls).  The request
+context travels with contextvars, so code run through run_in_threadpool is
+attributed to the request that started it.
+
+The registry is in-process and exported as Prometheus text format at
+GET /metrics (see main.py); with several workers each one is a separate
+scrape target.
+"""
+import contextvars
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+# seconds; covers cached lookups (sub-ms) up to slow LLM / OCR calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.series = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        with self.lock:
+            items = sorted((k, list(v)) for k, v in self.series.items())
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self.metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(line for m in metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------- the app's metrics ----------
+HTTP_SECONDS = Histogram("medsage_http_request_seconds", "Request latency by route (until response headers)",
+                         ["method", "route", "status"])
+STAGE_SECONDS = Histogram("medsage_stage_seconds", "Time spent per pipeline stage", ["stage"])
+STAGE_ERRORS = Counter("medsage_stage_errors_total", "Stages that raised", ["stage"])
+LLM_CALLS = Counter("medsage_llm_calls_total", "LLM calls by provider and outcome", ["provider", "outcome"])
+LLM_TOKENS = Counter("medsage_llm_tokens_total",
+                     "Approximate LLM tokens (embedding tokenizer count) by direction", ["provider", "direction"])
+CHUNKS = Counter("medsage_chunks_indexed_total", "Chunks embedded and upserted", ["collection"])
+CACHE_REQUESTS = Counter("medsage_cache_requests_total", "Cache lookups by cache and outcome", ["cache", "outcome"])
+# utils/llm_scheduler.py
+LLM_QUEUE_DEPTH = Gauge("medsage_llm_queue_depth", "LLM calls waiting for a slot", ["provider"])
+LLM_IN_FLIGHT = Gauge("medsage_llm_in_flight", "LLM calls holding a slot", ["provider"])
+LLM_QUEUE_WAIT = Histogram("medsage_llm_queue_wait_seconds", "Time from submit to slot acquired", ["provider"])
+LLM_RETRIES = Counter("medsage_llm_retries_total", "Retried LLM calls by reason", ["provider", "reason"])
+LLM_COALESCED = Counter("medsage_llm_coalesced_total", "Calls served by an identical in-flight call", ["provider"])
+# utils/triage.py + models/escalation_detector.py
+TRIAGE_DECISIONS = Counter("medsage_triage_decisions_total", "Escalation decisions by deciding stage",
+                           ["stage", "emergency"])
+
+
+# ---------- per-request stage timings ----------
+_REQUEST_TIMINGS: contextvars.ContextVar[Optional[Dict[str, list]]] = contextvars.ContextVar(
+    "request_timings", default=None)
+
+
+def start_request() -> Tuple[Dict[str, list], contextvars.Token]:
+    """Begin collecting stage timings for the current request (middleware)."""
+    timings = {}
+    return timings, _REQUEST_TIMINGS.set(timings)
+
+
+def end_request(token: contextvars.Token):
+    _REQUEST_TIMINGS.reset(token)
+
+
+def record_stage(stage: str, seconds: float, failed: bool = False):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if failed:
+        STAGE_ERRORS.inc(stage=stage)
+    timings = _REQUEST_TIMINGS.get()
+    if timings is not None:
+        entry = timings.setdefault(stage, [0.0, 0])  # mutated in place, visible across threads of the request
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def timed(stage: str):
+    """Time the block as `stage` (histogram + current request's Server-Timing)."""
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except GeneratorExit:  # a stream closed early by its consumer isn't a failure
+        raise
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        record_stage(stage, time.perf_counter() - start, failed)
+
+
+_TOKEN = re.compile(r"[^A-Za-z0-9_\-]")
+
+
+def server_timing_header(timings: Dict[str, list], total_s: float = None) -> str:
+    """`embed;dur=12.3, search;dur=4.1;desc="x2", total;dur=20.0` (durations in ms)."""
+    parts = []
+    for stage, (seconds, count) in timings.items():
+        part = f"{_TOKEN.sub('_', stage)};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="x{count}"'
+        parts.append(part)
+    if total_s is not None:
+        parts.append(f"total;dur={total_s * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def count_llm_call(provider: str, outcome: str, prompt: str = None, completion: str = None):
+    LLM_CALLS.inc(provider=provider, outcome=outcome)
+    texts = [(d, t) for d, t in (("prompt", prompt), ("completion", completion)) if t]
+    if texts:
+        from utils.chunking import count_tokens
+        for (direction, _), n in zip(texts, count_tokens([t for _, t in texts])):
+            LLM_TOKENS.inc(n, provider=provider, direction=direction)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -1,12 +1,30 @@
+import os
+from dotenv import load_dotenv
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
-from fastembed import TextEmbedding
+from qdrant_client.models import (
+    Distance, VectorParams, Filter, FieldCondition, MatchValue, FilterSelector
+)
+from utils.embedding_service import get_embedding_service
+from utils.quantization import originals_on_disk, quantization_config
+from utils.hybrid import dense_vectors_config, sparse_vectors_config
 
+load_dotenv()
+
+# ---------- Store selection ----------
+# QDRANT_MODE=local  (default) embedded store persisted under QDRANT_PATH, survives restarts;
+#                    it takes a file lock, so only one process can open it (uvicorn --workers 1)
+# QDRANT_MODE=remote  Qdrant server / cloud at QDRANT_URL (mmap'd on-disk vectors + payloads)
+# QDRANT_MODE=memory  old behaviour: lost on restart
+QDRANT_MODE = os.getenv("QDRANT_MODE", "local").lower()
+QDRANT_PATH = os.getenv("QDRANT_PATH", "./qdrant_storage")
+QDRANT_URL = os.getenv("QDRANT_URL")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+QDRANT_ON_DISK = os.getenv("QDRANT_ON_DISK", "1") == "1"
 
-CLIENT = QdrantClient(":memory:")
 COLLECTION_NAME = "Health_QA_CoT"
 DIM = 384
 
+
 def collection_exists(client, name):
     try:
         client.get_collection(name)
@@ -14,16 +32,59 @@ def collection_exists(client, name):
     except Exception:
         return False
 
-if not collection_exists(CLIENT, COLLECTION_NAME):
-    CLIENT.create_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config=VectorParams(size=DIM, distance=Distance.COSINE),
+
+def create_client(mode=QDRANT_MODE):
+    if mode == "remote":
+        return QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, timeout=120)
+    if mode == "memory":
+        return QdrantClient(":memory:")
+    try:
+        return QdrantClient(path=QDRANT_PATH)
+    except RuntimeError as e:
+        raise RuntimeError(f"{e}\nQDRANT_MODE=local allows one process per QDRANT_PATH; "
+                           f"run a single worker or use QDRANT_MODE=remote") from e
+
+
+def ensure_collection(client, name=COLLECTION_NAME, dim=DIM):
+    """
+    Create `name` if missing; on a server, vectors and payloads live in mmap'd on-disk
+    segments, and with QDRANT_QUANTIZATION only the quantized vectors stay in RAM.
+    With QDRANT_HYBRID the collection gets named "dense" + "sparse" vectors.
+    """
+    if collection_exists(client, name):
+        return
+    client.create_collection(
+        collection_name=name,
+        vectors_config=dense_vectors_config(VectorParams(size=dim, distance=Distance.COSINE,
+                                                         on_disk=QDRANT_ON_DISK or originals_on_disk())),
+        sparse_vectors_config=sparse_vectors_config(on_disk=QDRANT_ON_DISK),
+        on_disk_payload=QDRANT_ON_DISK,
+        quantization_config=quantization_config(),
     )
+    for field in ("origin", "file", "file_hash", "domain"):
+        try:
+            client.create_payload_index(collection_name=name, field_name=field, field_schema="keyword")
+        except Exception:
+            pass  # local mode has no payload indexes
+
+
+def origin_filter(origin):
+    """Uploads are tagged with the router that ingested them."""
+    return Filter(must=[FieldCondition(key="origin", match=MatchValue(value=origin))])
+
+
+def clear_origin(client, origin, name=COLLECTION_NAME):
+    """Delete one router's uploads without touching anything else in the shared collection."""
+    client.delete(collection_name=name, points_selector=FilterSelector(filter=origin_filter(origin)))
+
+
+# One client for every router (the local store takes a file lock, so it must be shared)
+CLIENT = create_client()
+ensure_collection(CLIENT)
 
 
 def get_qdrant_client():
-    client = QdrantClient(":memory:")
-    return client
+    return CLIENT
 
-# Embedding model (fastembed by Qdrant)
-EMBEDDING = TextEmbedding(model_name="BAAI/bge-small-en-v1.5")
+# Shared embedding service (one fastembed model, micro-batched across requests)
+EMBEDDING = get_embedding_service()
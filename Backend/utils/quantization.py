@@ -0,0 +1,71 @@
+# backend/utils/quantization.py
+"""
+Vector quantization settings for Health_QA_CoT (qdrant-client 1.7.3 models).
+
+QDRANT_QUANTIZATION=scalar  int8 codes in RAM (4x smaller), float32 originals on disk
+QDRANT_QUANTIZATION=binary  1 bit per dimension (32x smaller), needs oversampling + rescoring
+QDRANT_QUANTIZATION=none    plain float32 vectors (default)
+
+At search time Qdrant scores candidates with the quantized vectors, takes
+`limit * oversampling` of them and (with rescore) re-ranks those against the
+on-disk originals.  Kept free of client / model imports so qdrant.py and the
+setup scripts can use it without side effects.
+"""
+import os
+
+from qdrant_client.http.models import (
+    BinaryQuantization, BinaryQuantizationConfig, QuantizationSearchParams,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, SearchParams, VectorParamsDiff,
+)
+
+QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none").lower()
+QUANTIZATION_QUANTILE = float(os.getenv("QDRANT_QUANTILE", "0.99"))          # scalar: clip outliers
+QUANTIZATION_RESCORE = os.getenv("QDRANT_RESCORE", "1") == "1"
+# binary loses much more precision on 384-dim vectors, so it needs a wider candidate pool
+DEFAULT_OVERSAMPLING = {"scalar": 2.0, "binary": 4.0}
+QUANTIZATION_OVERSAMPLING = float(os.getenv("QDRANT_OVERSAMPLING", "0") or 0) or None
+
+
+def quantization_config(kind: str = QUANTIZATION):
+    """Collection-level config; quantized vectors are pinned in RAM (always_ram)."""
+    if kind == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(
+            type=ScalarType.INT8, quantile=QUANTIZATION_QUANTILE, always_ram=True))
+    if kind == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    if kind in ("", "none"):
+        return None
+    raise ValueError(f"Unknown QDRANT_QUANTIZATION '{kind}' (expected none, scalar or binary)")
+
+
+def originals_on_disk(kind: str = QUANTIZATION) -> bool:
+    """With quantization the float32 originals are only read for rescoring, so they can live on disk."""
+    return quantization_config(kind) is not None
+
+
+def apply_quantization(client, collection_name: str, kind: str = QUANTIZATION):
+    """Switch an existing collection to `kind` (Qdrant rebuilds the quantized index in the background)."""
+    config = quantization_config(kind)
+    if config is None:
+        return False
+    vectors = client.get_collection(collection_name).config.params.vectors
+    names = list(vectors) if isinstance(vectors, dict) else [""]  # "" = the unnamed default vector
+    client.update_collection(
+        collection_name=collection_name,
+        vectors_config={name: VectorParamsDiff(on_disk=True) for name in names},
+        quantization_config=config,
+    )
+    return True
+
+
+def search_params(hnsw_ef: int = None, rescore: bool = None, oversampling: float = None,
+                  ignore: bool = False, exact: bool = False, kind: str = QUANTIZATION) -> SearchParams:
+    """Search-time params; quantization params are only sent when the collection is quantized."""
+    quantization = None
+    if kind not in ("", "none") or ignore:
+        quantization = QuantizationSearchParams(
+            ignore=ignore,
+            rescore=QUANTIZATION_RESCORE if rescore is None else rescore,
+            oversampling=oversampling or QUANTIZATION_OVERSAMPLING or DEFAULT_OVERSAMPLING.get(kind),
+        )
+    return SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
@@ -0,0 +1,95 @@
+# backend/utils/record_store.py
+"""
+Side store for full dataset records (question / response / chain-of-thought).
+
+Chunk payloads in Qdrant only carry the chunk text plus an entry id
+(`entry_hash`); the long fields live here once per entry, zlib-compressed
+in SQLite, and are fetched only for the final top hits of a search.
+Entry ids are content hashes, so a record never changes once written.
+"""
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+RECORD_STORE_PATH = os.getenv("RECORD_STORE", "./records.sqlite3")
+RECORD_FIELDS = ("question", "response", "complex_cot")
+
+
+class MissingRecords(RuntimeError):
+    """Slimmed points whose entry has no record: the store wasn't deployed with the collection."""
+
+
+class RecordStore:
+    def __init__(self, path: str = RECORD_STORE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS records (entry_id TEXT PRIMARY KEY, data BLOB NOT NULL)")
+        self.conn.commit()
+
+    @staticmethod
+    def _pack(record: dict) -> bytes:
+        return zlib.compress(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    @staticmethod
+    def _unpack(blob: bytes) -> dict:
+        return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    def put_many(self, records):
+        """records: iterable of (entry_id, {"question", "response", "complex_cot"}); existing ids are kept."""
+        rows = [(entry_id, self._pack(record)) for entry_id, record in records]
+        if not rows:
+            return 0
+        with self.lock:
+            self.conn.executemany("INSERT OR IGNORE INTO records (entry_id, data) VALUES (?, ?)", rows)
+            self.conn.commit()
+        return len(rows)
+
+    def get_many(self, entry_ids) -> dict:
+        ids = list(dict.fromkeys(i for i in entry_ids if i))
+        if not ids:
+            return {}
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT entry_id, data FROM records WHERE entry_id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        return {entry_id: self._unpack(blob) for entry_id, blob in rows}
+
+    def prune(self, keep_prefixes) -> int:
+        """Drop records whose id (first 32 hex chars) is not in `keep_prefixes`."""
+        with self.lock:
+            stale = [(entry_id,) for (entry_id,) in self.conn.execute("SELECT entry_id FROM records")
+                     if entry_id[:32] not in keep_prefixes]
+            self.conn.executemany("DELETE FROM records WHERE entry_id = ?", stale)
+            self.conn.commit()
+        return len(stale)
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def entry_record(entry: dict) -> dict:
+    """Full (untruncated) record of a dataset entry."""
+    return {
+        "question": entry.get("Question", ""),
+        "response": entry.get("Response", ""),
+        "complex_cot": entry.get("Complex_Cot", ""),
+    }
+
+
+_STORE = None
+
+
+def get_record_store() -> RecordStore:
+    global _STORE
+    if _STORE is None:
+        _STORE = RecordStore()
+    return _STORE
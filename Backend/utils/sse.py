@@ -0,0 +1,36 @@
+# backend/utils/sse.py
+"""
+Server-sent events for the streaming ask / consult endpoints.
+
+Every event carries a JSON payload:
+
+    event: sources
+    data: {"sources": [...]}
+
+Clients read `sources` first, then any number of `token` events (answer
+deltas, concatenate them), then `suggestions` and finally `done`; an
+`error` event replaces the rest if the pipeline fails mid-stream.
+"""
+import json
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",   # nginx: don't buffer the stream
+}
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    async def guarded():
+        try:
+            async for chunk in events:
+                yield chunk
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+    return StreamingResponse(guarded(), media_type="text/event-stream", headers=SSE_HEADERS)
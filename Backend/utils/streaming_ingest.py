@@ -0,0 +1,181 @@
+# backend/utils/streaming_ingest.py
+"""
+Streaming upload → index pipeline (mode=stream on the upload routes).
+
+The upload is spooled to disk, text is extracted page by page / slide by
+slide, chunks are produced incrementally and every STREAM_WINDOW chunks are
+embedded and upserted.  Peak memory is bounded by the window rather than
+the file, and the first windows are searchable while the rest of a large
+document is still being processed.
+"""
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from qdrant_client.models import Filter, FilterSelector, HasIdCondition
+
+from utils.cache import invalidate_collection
+from utils.extract_pool import EXTRACT_WORKERS, get_extraction_pool
+from utils.chunking import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, iter_chunks
+from utils.indexing import index_chunks
+
+STREAM_WINDOW = int(os.getenv("STREAM_WINDOW", "64"))              # chunks per embed + upsert
+STREAM_MAX_UNGATED = int(os.getenv("STREAM_MAX_UNGATED", "256"))   # chunks held while waiting for the gate
+SPOOL_BLOCK = 1 << 20
+
+
+class StreamRejected(Exception):
+    """Document was empty or failed the content gate; nothing was indexed."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def spool_to_disk(fileobj, suffix: str = "") -> str:
+    """Copy an upload stream to a temp file in fixed-size blocks; returns the path."""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(fileobj, out, SPOOL_BLOCK)
+    return path
+
+
+def iter_document_text(path: str, ext: str, fallback):
+    """
+    Yield text pieces of a spooled document.  Formats that can be read
+    incrementally are; anything else goes through `fallback(path) -> str`.
+    """
+    ext = ext.lower()
+    if ext == "pdf":
+        if EXTRACT_WORKERS > 0:
+            yield from get_extraction_pool().iter_pdf(path)
+            return
+        import PyPDF2
+        for page in PyPDF2.PdfReader(path).pages:
+            yield (page.extract_text() or "") + "\n"
+        return
+    if ext == "docx":
+        from docx import Document
+        for p in Document(path).paragraphs:
+            if p.text.strip():
+                yield p.text + "\n"
+        return
+    if ext in ["pptx", "ppt"]:
+        from pptx import Presentation
+        for slide in Presentation(path).slides:
+            yield "".join(shape.text + "\n" for shape in slide.shapes if hasattr(shape, "text"))
+        return
+    if ext == "txt":
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            while True:
+                block = f.read(SPOOL_BLOCK)
+                if not block:
+                    return
+                yield block
+    if ext == "csv":
+        import pandas as pd
+        for frame in pd.read_csv(path, chunksize=5000):
+            yield frame.to_string() + "\n"
+        return
+    yield fallback(path)
+
+
+def stream_index(client, collection_name: str, pieces, make_payload, max_tokens: int = CHUNK_MAX_TOKENS,
+                 overlap: int = CHUNK_OVERLAP_TOKENS, window: int = STREAM_WINDOW, gate=None, max_ungated: int = STREAM_MAX_UNGATED,
+                 head_chars: int = 9000, vector_gate=None, make_id=None):
+    """
+    Chunk `pieces` incrementally and index every `window` chunks.
+
+    gate(text_piece) -> bool, if given, must accept some piece before anything is
+    indexed; chunks seen before that are held (at most `max_ungated`).
+    vector_gate(chunks) -> verdict with .accepted / .vectors, if given, then runs
+    once on the first window; its vectors are reused when that window is indexed.
+    make_id(chunk) -> point id, called once per chunk in order (default: random ids).
+    Returns (stats, head) where head is the first `head_chars` of text (for summaries).
+    If anything fails after a window was written, the points this call created are
+    deleted before the error propagates; ids that already existed (another upload
+    of the same content) are left alone.
+    """
+    state = {"gated": gate is None, "checked": vector_gate is None, "head": [], "head_len": 0, "extract_ms": 0.0}
+
+    def tap():
+        it = iter(pieces)
+        while True:
+            start = time.perf_counter()
+            try:
+                piece = next(it)
+            except StopIteration:
+                return
+            finally:
+                state["extract_ms"] += (time.perf_counter() - start) * 1000
+            if state["head_len"] < head_chars:
+                state["head"].append(piece[:head_chars - state["head_len"]])
+                state["head_len"] += len(state["head"][-1])
+            if not state["gated"] and gate(piece):
+                state["gated"] = True
+            yield piece
+
+    stats = {"chunks": 0, "windows": 0, "embed_ms": 0.0, "sparse_ms": 0.0, "upsert_ms": 0.0,
+             "first_searchable_ms": None}
+    started = time.perf_counter()
+    pending, written = [], []
+
+    def flush():
+        known = None
+        if not state["checked"]:
+            state["checked"] = True
+            verdict = vector_gate(pending)
+            if not verdict.accepted:
+                raise StreamRejected("gate")
+            known = verdict.vectors
+        timings = {}
+        if make_id:
+            ids = [make_id(c) for c in pending]
+            existing = {str(p.id) for p in client.retrieve(collection_name=collection_name, ids=ids,
+                                                             with_payload=False, with_vectors=False)}
+        else:
+            ids, existing = [str(uuid.uuid4()) for _ in pending], set()
+        # recorded before the write: a window that fails half-way is rolled back too
+        written.extend(i for i in ids if i not in existing)
+        index_chunks(client, collection_name, pending, [make_payload(c) for c in pending],
+                     ids=ids, timings=timings, known=known)
+        stats["chunks"] += len(pending)
+        stats["windows"] += 1
+        stats["embed_ms"] += timings.get("embed_ms", 0.0)
+        stats["sparse_ms"] += timings.get("sparse_ms", 0.0)
+        stats["upsert_ms"] += timings.get("upsert_ms", 0.0)
+        if stats["first_searchable_ms"] is None:
+            stats["first_searchable_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        pending.clear()
+
+    try:
+        for chunk in iter_chunks(tap(), max_tokens, overlap):
+            pending.append(chunk)
+            if state["gated"] and len(pending) >= window:
+                flush()
+            elif not state["gated"] and len(pending) >= max_ungated:
+                raise StreamRejected("gate")
+
+        head = "".join(state["head"])
+        if not head.strip():
+            raise StreamRejected("empty")
+        if not state["gated"]:
+            raise StreamRejected("gate")
+        if pending:
+            flush()
+    except BaseException:
+        if written:
+            # by filter: a window that failed before its upsert left ids that don't exist (local mode
+            # raises on unknown ids in a PointIdsList)
+            client.delete(collection_name=collection_name, points_selector=FilterSelector(
+                filter=Filter(must=[HasIdCondition(has_id=written)])))
+            invalidate_collection(client, collection_name)
+        raise
+
+    stats["extract_ms"] = round(state["extract_ms"], 1)
+    stats["embed_ms"] = round(stats["embed_ms"], 1)
+    stats["sparse_ms"] = round(stats["sparse_ms"], 1)
+    stats["upsert_ms"] = round(stats["upsert_ms"], 1)
+    return stats, head
@@ -0,0 +1,137 @@
+# backend/utils/triage.py
+"""
+Local escalation triage, run before the EscalationDetector's LLM call.
+
+Two signals, both cheap:
+  * red-flag phrases ("crushing chest pain", "can't breathe", "face
+    drooping", ...) compiled into one case-insensitive alternation; a match
+    that isn't negated within its clause ("no chest pain", "denies ...";
+    but not "no fever, crushing chest pain") is an emergency.
+  * the query embedding (already computed for retrieval, so free) scored
+    against per-category centroids of emergency and routine prototype
+    sentences: margin = best emergency cosine - best routine cosine.
+
+A phrase hit or margin >= TRIAGE_EMERGENCY_MARGIN decides "emergency",
+no hit and margin <= TRIAGE_ROUTINE_MARGIN decides "routine"; anything in
+between is ambiguous and goes to the LLM.  Thresholds are tunable from
+scripts/bench_escalation.py --sweep.
+"""
+import os
+import re
+from typing import NamedTuple, Optional
+
+from utils.centroids import Centroids
+from utils.metrics import timed
+
+TRIAGE_EMERGENCY_MARGIN = float(os.getenv("TRIAGE_EMERGENCY_MARGIN", "0.04"))
+TRIAGE_ROUTINE_MARGIN = float(os.getenv("TRIAGE_ROUTINE_MARGIN", "-0.02"))
+
+RED_FLAG_PHRASES = [
+    # cardiac
+    r"(crushing|severe|sudden|heavy|squeezing) (chest|central chest) (pain|pressure|tightness)",
+    r"chest pain (spreading|radiating|going) (to|into|down) (my |the )?(left )?(arm|jaw|neck|back)",
+    r"heart attack", r"cardiac arrest", r"no pulse",
+    # breathing
+    # ... but not "can't breathe through my nose" (a blocked nose)
+    r"(can'?t|cannot|can not|unable to|struggling to|hard to) breathe?\b(?!\s+(through|out of|via) (my |the |his |her |their )?nose)",
+    r"not breathing",
+    r"gasping for (air|breath)", r"choking", r"(lips|face|skin) (turning|turned|are|is) (blue|grey|gray)",
+    r"severe (shortness of breath|breathlessness|difficulty breathing)",
+    # neurological
+    r"face (is )?droop(ing|s|ed)?", r"slurred speech", r"sudden (weakness|numbness|confusion|vision loss)",
+    r"(one|left|right) side of (my |the |his |her )?(body|face) (is )?(numb|weak|paralys|paralyz)\w*",
+    r"worst headache of (my|his|her|their) life", r"thunderclap headache",
+    r"(having|is having|think (i'?m|he'?s|she'?s) having) a stroke", r"signs of (a )?stroke", r"heat ?stroke",
+    r"seizures?(?![- ]?free)", r"convuls\w+", r"(passed|passing) out", r"unconscious", r"unresponsive",
+    r"(won'?t|will not|can'?t) wake (up)?", r"stiff neck (and|with) (a )?(high )?fever",
+    # bleeding / trauma
+    r"(heavy|severe|uncontrolled|uncontrollable|profuse) bleeding", r"won'?t stop bleeding",
+    r"(vomiting|coughing( up)?|throwing up) blood", r"black tarry stools?", r"head (injury|trauma)",
+    r"(car|road|motorbike) (accident|crash)", r"(stab|gunshot) wound", r"(fell|fall) from (a )?height",
+    # allergy / poisoning
+    r"anaphyla\w+", r"(throat|tongue|lips?) (is |are )?(swelling|swollen|closing)", r"overdose",
+    r"swallowed (poison|bleach|pills)", r"carbon monoxide",
+    # mental health
+    r"suicid\w+", r"kill (myself|himself|herself|themselves)", r"end (my|his|her|their) life",
+    r"self[- ]harm",
+    # other
+    r"severe (abdominal|stomach|belly) pain", r"high fever (and|with) (a )?rash that doesn'?t fade",
+    r"(pregnant|pregnancy) (and|with) (heavy )?bleeding", r"severe burns?",
+]
+_RED_FLAGS = re.compile(r"\b(?:" + "|".join(f"(?:{p})" for p in RED_FLAG_PHRASES) + r")", re.IGNORECASE)
+# "no chest pain", "I don't have chest pain", "denies any seizures", "history of seizures" (not acute)
+_NEGATION = re.compile(r"\b(no|not|never|without|denies|denied|negative for|history of"
+                       r"|(do|does|did|have|has|had|is|are|was|were)n'?t)\b(\W+\w+){0,2}\W*$", re.IGNORECASE)
+# a negation only reaches to the end of its clause: "no fever but crushing chest pain"
+_CLAUSE = re.compile(r"[,.;:!?]|\b(?:but|now|then|and)\b", re.IGNORECASE)
+
+# prototype sentences per category (utils/centroids.py)
+EMERGENCY_PROTOTYPES = {
+    "cardiac": ["sudden severe chest pain spreading to the left arm with sweating",
+                "pressure in the chest, nausea and cold sweat, feels like a heart attack",
+                "chest tightness at rest with fainting and a racing irregular heartbeat"],
+    "respiratory": ["cannot breathe properly, lips turning blue",
+                    "severe shortness of breath at rest, unable to speak in full sentences",
+                    "wheezing that is getting worse and the inhaler is not helping"],
+    "neurological": ["face drooping on one side, arm weakness and slurred speech",
+                     "sudden worst headache of my life with vomiting",
+                     "collapsed and had a seizure, now confused and hard to wake"],
+    "bleeding": ["bleeding heavily from a deep wound that will not stop",
+                 "vomiting blood and feeling faint",
+                 "hit my head in a fall and now drowsy and vomiting"],
+    "allergy": ["throat swelling and hives after eating peanuts, hard to breathe",
+                "took too many pills, feeling drowsy"],
+    "mental_health": ["I want to end my life and have a plan",
+                      "thinking about hurting myself tonight"],
+}
+ROUTINE_PROTOTYPES = {
+    "respiratory": ["runny nose, sneezing and a mild sore throat for two days",
+                    "dry cough for a week but otherwise feeling fine"],
+    "pain": ["mild headache after a long day at the computer",
+             "lower back ache after lifting boxes, can still walk normally",
+             "sore knee after running"],
+    "digestive": ["mild stomach upset and loose stools after eating out",
+                  "heartburn after spicy food", "constipated for three days"],
+    "skin": ["itchy rash on my arm, no other symptoms", "acne on my face", "dry skin in winter"],
+    "general": ["feeling tired lately and sleeping poorly", "low grade fever and body aches, drinking fluids",
+                "seasonal allergies with itchy eyes", "question about my vitamin D levels"],
+}
+
+
+class Triage(NamedTuple):
+    emergency: Optional[bool]  # None = ambiguous, ask the LLM
+    stage: str                 # "phrase", "embedding" or "ambiguous"
+    margin: Optional[float] = None
+    phrase: Optional[str] = None
+
+
+def red_flag(text: str) -> Optional[str]:
+    """First non-negated red-flag phrase in `text`, or None."""
+    for m in _RED_FLAGS.finditer(text or ""):
+        before = text[max(0, m.start() - 40):m.start()]
+        clauses = list(_CLAUSE.finditer(before))
+        if clauses:
+            before = before[clauses[-1].end():]
+        if not _NEGATION.search(before):
+            return m.group(0)
+    return None
+
+
+CENTROIDS = Centroids(EMERGENCY_PROTOTYPES, ROUTINE_PROTOTYPES)
+
+
+def triage(text: str, vector=None, emergency_margin: float = None, routine_margin: float = None,
+           centroids: Centroids = CENTROIDS) -> Triage:
+    """Local escalation decision; `vector` is the query embedding (None skips the embedding stage)."""
+    with timed("triage"):
+        phrase = red_flag(text)
+        if phrase:
+            return Triage(True, "phrase", phrase=phrase)
+        if vector is None:
+            return Triage(None, "ambiguous")
+        margin = centroids.margin(vector)
+        if margin >= (TRIAGE_EMERGENCY_MARGIN if emergency_margin is None else emergency_margin):
+            return Triage(True, "embedding", margin)
+        if margin <= (TRIAGE_ROUTINE_MARGIN if routine_margin is None else routine_margin):
+            return Triage(False, "embedding", margin)
+        return Triage(None, "ambiguous", margin)